@@ -0,0 +1,405 @@
+"""
+Local stand-in for the Google Apps Script web app, for offline load tests.
+
+Implements the actions the backend sends (see APPS-SCRIPT-API.md) on top of
+in-memory tabs, with configurable slowness and failures:
+
+    python apps_script_simulator.py --port 8765 --orders 500
+    APPS_SCRIPT_URL=http://127.0.0.1:8765/exec python backend/app.py
+
+    # Google on a bad day: slow, long-tailed, some 5xx, and throttled
+    python apps_script_simulator.py --latency lognormal:1.2,0.6 --http-error-rate 0.02 \\
+        --script-error-rate 0.01 --max-concurrent 30 --quota-rps 5 --quota-burst 10
+
+Latency specs: fixed:S, uniform:LOW,HIGH, normal:MEAN,STDEV, lognormal:MEDIAN,SIGMA
+and exponential:MEAN (seconds). A bare number means fixed. --write-latency
+applies to syncToSheets/updateOrderStatusAndMove instead of --latency, and
+--batch-entry-latency is added for each action inside a batch.
+
+GET /stats returns per-action counts, failures and throttling; POST /reset
+restores the seeded tabs and clears the counters.
+"""
+import argparse
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+HEADER = ['ID', 'Client Name', 'Specifications', 'Sizes', 'Quantity', 'Status', 'Notes', 'Created At', 'Updated At']
+ORDER_KEYS = ['id', 'clientName', 'specifications', 'sizes', 'quantity', 'status', 'notes', 'createdAt', 'updatedAt']
+DEFAULT_TABS = ['Pending', 'Ready', 'Delivered', 'Completed']
+WRITE_ACTIONS = {'syncToSheets', 'updateOrderStatusAndMove'}
+STATUS_COL = ORDER_KEYS.index('status')
+UPDATED_COL = ORDER_KEYS.index('updatedAt')
+
+class ScriptError(Exception):
+    """Answered as {"success": false, "message": ...}, like an exception thrown in the script"""
+
+def parse_latency(spec):
+    """A function returning one latency sample in seconds, from a spec such as 'lognormal:0.8,0.5'"""
+    if spec is None or spec == '':
+        return lambda rng: 0.0
+    kind, _, values = str(spec).partition(':')
+    if not values:
+        kind, values = 'fixed', kind
+    params = [float(value) for value in values.split(',')]
+    samplers = {
+        'fixed': lambda rng: params[0],
+        'uniform': lambda rng: rng.uniform(params[0], params[1]),
+        'normal': lambda rng: max(0.0, rng.gauss(params[0], params[1])),
+        'lognormal': lambda rng: rng.lognormvariate(math.log(params[0]), params[1]),
+        'exponential': lambda rng: rng.expovariate(1 / params[0]) if params[0] > 0 else 0.0,
+    }
+    if kind not in samplers:
+        raise ValueError(f'unknown latency distribution {kind!r} (use one of {", ".join(samplers)})')
+    return samplers[kind]
+
+def synthetic_tabs(orders_per_tab, sizes_per_order=2, tabs=DEFAULT_TABS, seed=1):
+    """Tabs of generated orders: an ID row per order and continuation rows with further sizes"""
+    rng = random.Random(seed)
+    data = {}
+    next_id = 100000
+    for tab in tabs:
+        rows = [list(HEADER)]
+        for _ in range(orders_per_tab):
+            next_id += 1
+            created = f'2025-06-{rng.randint(1, 28):02d} 10:00:00'
+            rows.append([str(next_id), f'Client {rng.randint(1, 200)}', rng.choice(['10mm clear', '6mm frosted', '8mm tinted']),
+                         f'{rng.randint(10, 400)}x{rng.randint(10, 400)}', str(rng.randint(1, 9)), tab, '', created, created])
+            for _ in range(sizes_per_order - 1):
+                rows.append(['', '', '', f'{rng.randint(10, 400)}x{rng.randint(10, 400)}', str(rng.randint(1, 9)),
+                             '', '', '', ''])
+        data[tab] = rows
+    return data
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.capacity = max(burst, 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def take(self):
+        """True if a token was available; otherwise the seconds until one will be"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return (1 - self.tokens) / self.rate
+
+class AppsScriptSimulator:
+    """The script's actions over in-memory tabs, plus the injected latency, errors and throttling"""
+
+    def __init__(self, tabs=None, latency=None, write_latency=None, batch_entry_latency=None,
+                 http_error_rate=0.0, script_error_rate=0.0, max_concurrent=0, quota_rps=0.0, quota_burst=10,
+                 batch=True, discard_writes=False, redirect=False, seed=None):
+        self.seed_tabs = tabs if tabs is not None else synthetic_tabs(50)
+        self.latency = parse_latency(latency)
+        self.write_latency = parse_latency(write_latency) if write_latency is not None else self.latency
+        self.batch_entry_latency = parse_latency(batch_entry_latency)
+        self.http_error_rate = http_error_rate
+        self.script_error_rate = script_error_rate
+        self.max_concurrent = max_concurrent
+        self.quota = TokenBucket(quota_rps, quota_burst) if quota_rps > 0 else None
+        self.batch = batch
+        self.discard_writes = discard_writes
+        self.redirect = redirect
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.redirects = {}
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.tabs = {tab: [list(row) for row in rows] for tab, rows in self.seed_tabs.items()}
+            self.stats = {'requests': 0, 'actions': {}, 'http_errors': 0, 'script_errors': 0, 'throttled': 0,
+                          'max_in_flight': 0, 'latency_total': 0.0}
+
+    def _count(self, key, amount=1):
+        with self.lock:
+            self.stats[key] += amount
+
+    def _sample(self, sampler):
+        with self.lock:
+            return sampler(self.rng)
+
+    def _chance(self, rate):
+        if rate <= 0:
+            return False
+        with self.lock:
+            return self.rng.random() < rate
+
+    # ------------------------------------------------------------ admission
+
+    def admit(self):
+        """None if the request may run, else (status, headers, body) for a throttled answer"""
+        with self.lock:
+            self.stats['requests'] += 1
+            retry_after = None
+            if self.max_concurrent and self.in_flight >= self.max_concurrent:
+                retry_after = 1
+            elif self.quota:
+                taken = self.quota.take()
+                if taken is not True:
+                    retry_after = max(1, math.ceil(taken))
+            if retry_after is not None:
+                self.stats['throttled'] += 1
+                return 429, {'Retry-After': str(retry_after)}, b'Too many simultaneous invocations: Spreadsheets'
+            self.in_flight += 1
+            self.stats['max_in_flight'] = max(self.stats['max_in_flight'], self.in_flight)
+            return None
+
+    def release(self):
+        with self.lock:
+            self.in_flight -= 1
+
+    # ------------------------------------------------------------ request handling
+
+    def handle(self, body):
+        """(status, headers, body bytes) for one POST body, after the simulated latency"""
+        action = body.get('action')
+        data = body.get('data') or {}
+        delay = self._sample(self.write_latency if action in WRITE_ACTIONS else self.latency)
+        if action == 'batch' and self.batch:
+            for _ in data.get('requests', []):
+                delay += self._sample(self.batch_entry_latency)
+        time.sleep(delay)
+        self._count('latency_total', delay)
+
+        if self._chance(self.http_error_rate):
+            self._count('http_errors')
+            status = self._sample(lambda rng: rng.choice([500, 502, 503]))
+            return status, {'Content-Type': 'text/html'}, b'<html><body>Service unavailable. Please try again.</body></html>'
+        return 200, {'Content-Type': 'application/json'}, json.dumps(self.answer(action, data)).encode()
+
+    def answer(self, action, data):
+        """The script's JSON answer for one action"""
+        self._count_action(action)
+        try:
+            if self._chance(self.script_error_rate):
+                raise ScriptError('Exception: Service Spreadsheets timed out while accessing document')
+            if action == 'batch' and self.batch:
+                return {'success': True, 'data': [self.answer(req.get('action'), req.get('data') or {})
+                                                  for req in data.get('requests', [])]}
+            handler = ACTIONS.get(action)
+            if handler is None:
+                raise ScriptError(f'Unknown action: {action}')
+            return {'success': True, 'data': handler(self, data)}
+        except ScriptError as e:
+            self._count('script_errors')
+            return {'success': False, 'message': str(e)}
+
+    def _count_action(self, action):
+        with self.lock:
+            self.stats['actions'][action] = self.stats['actions'].get(action, 0) + 1
+
+    # ------------------------------------------------------------ actions
+
+    def _tab(self, name):
+        if name not in self.tabs:
+            raise ScriptError(f'Sheet not found: {name}')
+        return self.tabs[name]
+
+    def get_orders_from_sheet(self, data):
+        with self.lock:
+            rows = self._tab(data.get('sheetName', 'Pending'))
+            return [dict(zip(ORDER_KEYS, row)) for row in rows[1:] if row and row[0]]
+
+    def get_orders(self, data):
+        return self.get_orders_from_sheet({'sheetName': 'Pending'})
+
+    def get_raw_sheet_data(self, data):
+        # Always the full tab, which is what deployed scripts answer to updatedSince too
+        with self.lock:
+            return [list(row) for row in self._tab(data.get('sheetName', 'Pending'))]
+
+    def sync_to_sheets(self, data):
+        orders = data.get('orders') or []
+        tab = data.get('targetSheetName') or 'Pending'
+        rows = [[order.get(key, '') for key in ORDER_KEYS] for order in orders]
+        with self.lock:
+            target = self._tab(tab)
+            if not self.discard_writes:
+                target.extend(rows)
+        return {'sheetName': tab, 'rowsWritten': len(rows)}
+
+    def update_order_status_and_move(self, data):
+        order_id = str(data.get('orderId', '')).strip()
+        status = str(data.get('newStatus', '')).strip()
+        now = time.strftime('%Y-%m-%d %H:%M:%S')
+        with self.lock:
+            self._tab(status)
+            moved, remaining = [], {}
+            for name, rows in self.tabs.items():
+                kept, current = rows[:1], None
+                for row in rows[1:]:
+                    if row and row[0]:
+                        current = str(row[0]).strip()
+                    (moved if current == order_id else kept).append(row)
+                remaining[name] = kept
+            if not moved:
+                raise ScriptError(f'Order {order_id} not found')
+            if not self.discard_writes:
+                for row in moved:
+                    if row[0]:
+                        row[STATUS_COL] = status
+                        row[UPDATED_COL] = now
+                remaining[status].extend(moved)
+                self.tabs = remaining
+        return {'orderId': order_id, 'newStatus': status, 'rowsMoved': len(moved)}
+
+    def get_available_sheets(self, data):
+        with self.lock:
+            return list(self.tabs)
+
+    # ------------------------------------------------------------ redirect hop
+
+    def park(self, status, headers, payload):
+        """Keep an answer for the googleusercontent-style GET that follows the redirect"""
+        token = uuid.uuid4().hex
+        with self.lock:
+            self.redirects[token] = (status, headers, payload)
+        return token
+
+    def collect(self, token):
+        with self.lock:
+            return self.redirects.pop(token, None)
+
+    def snapshot(self):
+        with self.lock:
+            stats = json.loads(json.dumps(self.stats))
+            stats['in_flight'] = self.in_flight
+            stats['rows'] = {tab: len(rows) - 1 for tab, rows in self.tabs.items()}
+        return stats
+
+ACTIONS = {
+    'getOrders': AppsScriptSimulator.get_orders,
+    'getOrdersFromSheet': AppsScriptSimulator.get_orders_from_sheet,
+    'getRawSheetData': AppsScriptSimulator.get_raw_sheet_data,
+    'getrawsheetdata': AppsScriptSimulator.get_raw_sheet_data,
+    'syncToSheets': AppsScriptSimulator.sync_to_sheets,
+    'updateOrderStatusAndMove': AppsScriptSimulator.update_order_status_and_move,
+    'getAvailableSheets': AppsScriptSimulator.get_available_sheets,
+}
+
+def make_handler(simulator):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def _send(self, status, headers, payload):
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            raw = self.rfile.read(length) if length else b''
+            if urlparse(self.path).path == '/reset':
+                simulator.reset()
+                return self._send(200, {'Content-Type': 'application/json'}, b'{"success": true}')
+            try:
+                body = json.loads(raw or b'{}')
+            except ValueError:
+                return self._send(200, {'Content-Type': 'application/json'},
+                                  b'{"success": false, "message": "Invalid JSON"}')
+            throttled = simulator.admit()
+            if throttled:
+                return self._send(*throttled)
+            try:
+                status, headers, payload = simulator.handle(body)
+            finally:
+                simulator.release()
+            if simulator.redirect:
+                token = simulator.park(status, headers, payload)
+                return self._send(302, {'Location': f'/echo?token={token}'}, b'')
+            self._send(status, headers, payload)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == '/stats':
+                return self._send(200, {'Content-Type': 'application/json'}, json.dumps(simulator.snapshot()).encode())
+            if url.path == '/echo':
+                parked = simulator.collect(parse_qs(url.query).get('token', [''])[0])
+                if parked:
+                    return self._send(*parked)
+            self._send(404, {'Content-Type': 'text/plain'}, b'Not found')
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+def start_simulator(simulator=None, host='127.0.0.1', port=0):
+    """Serve simulator in a background thread; the URL to use as APPS_SCRIPT_URL is server.url"""
+    simulator = simulator or AppsScriptSimulator()
+    server = ThreadingHTTPServer((host, port), make_handler(simulator))
+    server.daemon_threads = True
+    server.simulator = simulator
+    server.url = f'http://{host}:{server.server_port}/exec'
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def add_simulator_arguments(parser):
+    """The simulator's options, shared with loadtest_server.py"""
+    parser.add_argument('--latency', default='lognormal:0.8,0.4',
+                        help='latency of each Apps Script request (default: lognormal, median 0.8s)')
+    parser.add_argument('--write-latency', help='latency of writes, if different from --latency')
+    parser.add_argument('--batch-entry-latency', default='fixed:0.05', help='extra latency per action in a batch')
+    parser.add_argument('--http-error-rate', type=float, default=0.0, help='fraction of requests answered with a 5xx')
+    parser.add_argument('--script-error-rate', type=float, default=0.0,
+                        help='fraction of actions answered with success: false')
+    parser.add_argument('--max-concurrent', type=int, default=30,
+                        help='simultaneous executions before 429 (Apps Script allows 30; 0 = unlimited)')
+    parser.add_argument('--quota-rps', type=float, default=0.0, help='sustained requests per second before 429 (0 = off)')
+    parser.add_argument('--quota-burst', type=int, default=10, help='requests allowed in a burst above --quota-rps')
+    parser.add_argument('--no-batch', action='store_true', help='answer the batch action like an older deployment')
+    parser.add_argument('--redirect', action='store_true',
+                        help='answer each POST with a 302 to a GET holding the result, like script.google.com')
+    parser.add_argument('--seed', type=int, help='random seed for latency and error injection')
+
+def simulator_from_args(args, tabs=None, discard_writes=False):
+    return AppsScriptSimulator(
+        tabs=tabs, latency=args.latency, write_latency=args.write_latency,
+        batch_entry_latency=args.batch_entry_latency, http_error_rate=args.http_error_rate,
+        script_error_rate=args.script_error_rate, max_concurrent=args.max_concurrent, quota_rps=args.quota_rps,
+        quota_burst=args.quota_burst, batch=not args.no_batch, discard_writes=discard_writes,
+        redirect=args.redirect, seed=args.seed,
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--orders', type=int, default=50, help='generated orders per tab')
+    parser.add_argument('--sizes-per-order', type=int, default=2)
+    parser.add_argument('--data', help='JSON file {"Pending": [[header...], [row...]], ...} to serve instead')
+    parser.add_argument('--discard-writes', action='store_true', help='acknowledge writes without changing the tabs')
+    add_simulator_arguments(parser)
+    args = parser.parse_args()
+
+    if args.data:
+        with open(args.data) as f:
+            tabs = json.load(f)
+    else:
+        tabs = synthetic_tabs(args.orders, args.sizes_per_order)
+    server = start_simulator(simulator_from_args(args, tabs, args.discard_writes), args.host, args.port)
+    print(f'Apps Script simulator on {server.url} ({sum(len(rows) - 1 for rows in tabs.values())} rows, '
+          f'latency {args.latency}). Stats: http://{args.host}:{server.server_port}/stats')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == '__main__':
+    main()
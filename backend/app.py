@@ -1,11 +1,24 @@
-from flask import Flask, request, jsonify
+from warmup import BootWarmup  # first, so the startup timing covers every import below
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
-from extraction import extract_order_info, parse_command
-from sheets import add_order, query_orders, update_order_status, get_tab_data, get_all_tabs_data, search_all_tabs, show_help, show_update_help, show_search_help
+from extraction import extract_order_info, extract_orders, parse_command, get_pattern_hits, ExtractionLimitError
+from sheets import add_orders, query_orders, query_orders_with_version, update_order_status, get_tab_data, get_all_tabs_data, search_all_tabs, show_help, show_update_help, show_search_help, get_apps_script_stats, build_orders_rows, sync_order_rows, orders_added_reply, probe_apps_script, readiness_reply, warm_up_steps
+from order_queue import ORDER_QUEUE_ENABLED, ORDER_QUEUE_DIR, WriteBehindQueue
+from bulk_import import import_orders, ndjson_line, shutdown_pool, upload_format
+from message_dedupe import DEDUPE_ENABLED, DUPLICATE_IN_PROGRESS_REPLY, MessageDedupe, WriteFailed, message_key
+from rate_limit import RATE_LIMITED_ACTIONS, SenderRateLimiter, slow_down_reply
+from werkzeug.exceptions import RequestEntityTooLarge
+from logs import configure_logging, get_logger, new_request_id, request_id_var
+from timing import PROFILE_HEADER, REQUEST_TIMING_HEADER, finish_profile, header_flag, stage, start_profile, start_request_timing
+from metrics import CONTENT_TYPE, COMMAND_ERRORS, COMMAND_LATENCY, MESSAGE_DUPLICATES, RATE_LIMITED, REQUESTS_IN_FLIGHT, app_samples, register_collector, render_metrics
 import logging
 import os
+import time
 from datetime import datetime, timezone
 
+configure_logging()
+logger = get_logger('app')
+
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
@@ -13,6 +26,64 @@ GOOGLE_CREDS = os.environ.get('GOOGLE_CREDS', 'google-credentials.json')
 SHEET_NAME = os.environ.get('SHEET_NAME', 'WhatsApp Glass Bot Orders')
 PORT = int(os.environ.get('BACKEND_PORT', 5000))
 
+# Largest request body accepted on /api/whatsapp_in (a WhatsApp text is at most 65536 characters)
+WHATSAPP_IN_MAX_BYTES = int(os.environ.get('WHATSAPP_IN_MAX_BYTES', 256 * 1024))
+TOO_LARGE_REPLY = '❌ This message is too large to process. Please split it into smaller messages.'
+
+# Opt-in write-behind intake: new orders are journaled and synced in the background
+order_queue = WriteBehindQueue(ORDER_QUEUE_DIR, sync_order_rows) if ORDER_QUEUE_ENABLED else None
+
+# Replies to messages that wrote to the sheet, so retried or redelivered messages are not applied twice
+message_dedupe = MessageDedupe() if DEDUPE_ENABLED else None
+sender_limiter = SenderRateLimiter()
+
+# Opens the Apps Script connection and prefetches the tabs in each worker; /api/ready waits for it
+boot_warmup = BootWarmup()
+
+register_collector('app', lambda: app_samples(get_pattern_hits(), order_queue.status() if order_queue else None))
+
+def start_background_workers():
+    """Start per-process background threads (called in each worker after the fork)"""
+    configure_logging()
+    if order_queue:
+        order_queue.start()
+    boot_warmup.start(warm_up_steps())
+
+def stop_background_workers():
+    """Drain queued sheet writes and stop the bulk import pool before the process exits"""
+    if order_queue:
+        order_queue.stop()
+    shutdown_pool()
+
+@app.before_request
+def bind_request_id():
+    # Log lines for this request (including those from sheets.py) carry the same ID
+    new_request_id(request.headers.get('X-Request-ID'))
+    g.route = request.url_rule.rule if request.url_rule else 'other'
+    g.started = time.perf_counter()
+    REQUESTS_IN_FLIGHT.inc(route=g.route)
+    g.timings = start_request_timing(header_flag(request.headers.get(REQUEST_TIMING_HEADER)))
+    g.profile = start_profile(header_flag(request.headers.get(PROFILE_HEADER)))
+
+@app.after_request
+def add_request_id_header(response):
+    response.headers['X-Request-ID'] = request_id_var.get() or ''
+    if g.get('timings'):
+        response.headers['Server-Timing'] = g.timings.server_timing()
+        logger.info("Request timing", route=g.route, action=g.get('command_action'), stages=g.timings.summary())
+    return response
+
+@app.teardown_request
+def record_request_metrics(error=None):
+    if 'route' not in g:
+        return
+    REQUESTS_IN_FLIGHT.dec(route=g.route)
+    if 'command_action' in g:
+        COMMAND_LATENCY.observe(time.perf_counter() - g.started, action=g.command_action)
+    if g.get('profile'):
+        path = finish_profile(g.profile, f"{request_id_var.get()}-{g.get('command_action') or g.route}")
+        logger.info("Request profile written", route=g.route, path=path)
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     return jsonify({'status': 'healthy', 'message': 'WhatsApp Glass Bot Backend is running'})
@@ -21,32 +92,123 @@ def health_check():
 def text_health():
     return jsonify({'status': 'OK', 'message': 'Text processing is active'})
 
+@app.route('/api/ready', methods=['GET'])
+def readiness_check():
+    """Deep readiness: a measured round trip to Apps Script (503 while warming up or when it cannot be reached)"""
+    if boot_warmup.warming():
+        return jsonify(boot_warmup.warming_reply()), 503
+    body = readiness_reply(probe_apps_script(), order_queue.status() if order_queue else None, boot_warmup.timings)
+    return jsonify(body), 200 if body['ready'] else 503
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    """Prometheus text exposition of this worker's metrics"""
+    return Response(render_metrics(), content_type=CONTENT_TYPE)
+
+@app.route('/api/apps_script_stats', methods=['GET'])
+def apps_script_stats():
+    """Connection reuse and retry counters for the Apps Script client, and the mirror's sync state"""
+    return jsonify(get_apps_script_stats())
+
+def handle_once(message, handle):
+    """Run handle() for a message that writes to the sheet unless it was already handled; returns the reply.
+
+    message is (key, window) from message_key, or None to always run
+    handle(). A repeat gets the first copy's reply; if handle() raises, the
+    key is released so a retry runs (for WriteFailed, its reply is returned).
+    """
+    key = None
+    if message_dedupe and message:
+        key, window = message
+        claimed, reply = message_dedupe.claim(key, window)
+        if not claimed:
+            MESSAGE_DUPLICATES.inc(kind=key.split(':', 1)[0])
+            logger.info("Duplicate message answered from dedupe store", action=g.get('command_action'))
+            return reply if reply is not None else DUPLICATE_IN_PROGRESS_REPLY
+    try:
+        reply = handle()
+    except WriteFailed as e:
+        if key:
+            message_dedupe.release(key)
+        return e.reply
+    except Exception:
+        if key:
+            message_dedupe.release(key)
+        raise
+    if key:
+        message_dedupe.complete(key, reply)
+    return reply
+
+def update_reply(order_id, status):
+    """Move an order to a new status tab and describe the result (raises WriteFailed if it was not moved)"""
+    success = update_order_status({'order_id': order_id, 'status': status})
+    if success:
+        return f'✅ Order {order_id} status updated to {status} and moved to {status} tab.'
+    else:
+        raise WriteFailed(f'❌ Failed to update order {order_id}. Please check the order ID and try again.')
+
+def add_message_orders(user_msg):
+    """Extract the orders in a message and add them to the sheet; returns the reply"""
+    try:
+        with stage('extract'):
+            orders = extract_orders(user_msg)
+    except ExtractionLimitError as e:
+        logger.warning("Rejected order message", error=str(e), chars=len(user_msg))
+        return '❌ This message is too long to read as one order. Please split it into smaller messages.'
+    logger.debug("Extracted order info", order_info=orders, orders=len(orders),
+                 sizes_found=sum(len(order_info.get('sizes', [])) for order_info in orders))
+    
+    # Add the message's orders to Google Sheets in one write (or to the local journal in write-behind mode)
+    if order_queue:
+        built = build_orders_rows(orders)
+        with stage('journal'):
+            order_queue.enqueue_many(built)
+        order_ids = [order_id for order_id, _ in built]
+        logger.info("Orders queued for sheet sync", order_ids=order_ids)
+    else:
+        order_ids = add_orders(orders)
+        logger.info("Orders added to sheet", order_ids=order_ids)
+    
+    return orders_added_reply(list(zip(orders, order_ids)))
+
 @app.route('/api/whatsapp_in', methods=['POST'])
 def whatsapp_in():
     """Handle WhatsApp text input - Core functionality for order processing"""
+    if request.content_length is not None and request.content_length > WHATSAPP_IN_MAX_BYTES:
+        logger.warning("Rejected oversized request", route='/api/whatsapp_in', bytes=request.content_length)
+        return jsonify({'reply': TOO_LARGE_REPLY}), 413
+    # Also bounds chunked bodies, which carry no Content-Length
+    request.max_content_length = WHATSAPP_IN_MAX_BYTES
     try:
         # Parse request data
         data = request.json or {}
         user_msg = data.get('body', '').strip()
         from_user = data.get('from', 'unknown')
         
-        print(f"=== TEXT MESSAGE RECEIVED ===")
-        print(f"From: {from_user}")
-        print(f"Message: {user_msg}")
-        print(f"================================")
+        logger.info("Text message received", sender=from_user, body=user_msg, chars=len(user_msg))
         
         if not user_msg:
             return jsonify({'reply': 'Please send your order details as text.'})
+        # The bot sends the WhatsApp message ID; retries and redeliveries carry the same one
+        message_id = data.get('messageId') or request.headers.get('Idempotency-Key')
         
         # Check if it's a command (starts with /)
-        command = parse_command(user_msg)
+        with stage('parse'):
+            command = parse_command(user_msg)
         if command:
-            print(f"Processing command: {command['action']}")
+            g.command_action = command['action']
+            logger.info("Processing command", action=command['action'])
+            if command['action'] in RATE_LIMITED_ACTIONS:
+                allowed, retry_after = sender_limiter.allow(from_user)
+                if not allowed:
+                    RATE_LIMITED.inc(action=command['action'])
+                    logger.info("Sender rate limited", sender=from_user, action=command['action'], retry_after=round(retry_after, 1))
+                    return jsonify({'reply': slow_down_reply(retry_after)})
             
             # Handle different command actions
             if command['action'] == 'get_tab_data':
                 tab_name = command['params']['tab']
-                result = get_tab_data(tab_name)
+                result = get_tab_data(tab_name, command['params'].get('page'), from_user)
                 return jsonify({'reply': result})
                 
             elif command['action'] == 'get_all_tabs_data':
@@ -54,8 +216,8 @@ def whatsapp_in():
                 return jsonify({'reply': result})
                 
             elif command['action'] == 'search_all_tabs':
-                search_term = command['params']['search_term']
-                result = search_all_tabs(search_term)
+                params = command['params']
+                result = search_all_tabs(params['search_term'], params.get('filters'), params.get('terms'))
                 return jsonify({'reply': result})
                 
             elif command['action'] == 'show_help':
@@ -80,53 +242,78 @@ def whatsapp_in():
                 status = command['params'].get('status')
                 
                 if order_id and status:
-                    success = update_order_status({'order_id': order_id, 'status': status})
-                    if success:
-                        return jsonify({'reply': f'✅ Order {order_id} status updated to {status} and moved to {status} tab.'})
-                    else:
-                        return jsonify({'reply': f'❌ Failed to update order {order_id}. Please check the order ID and try again.'})
+                    # Without an ID, the same /update sent again is meant to run again
+                    message = message_key(from_user, user_msg, message_id, by_content=False)
+                    return jsonify({'reply': handle_once(message, lambda: update_reply(order_id, status))})
                 else:
                     return jsonify({'reply': '❌ Invalid update command. Use: /update [order_id] [status]'})
             else:
                 return jsonify({'reply': 'Unknown command. Type /help for available commands.'})
         else:
             # Process as order data
-            print("Processing as order data...")
-            order_info = extract_order_info(user_msg)
-            print(f"Extracted order info: {order_info}")
-            
-            # Add order to Google Sheets
-            order_id_used = add_order(order_info)
-            print("Order added to sheet successfully")
-            
-            # Create success message
-            client_name = order_info.get('client_name', 'UNKNOWN')
-            
-            success_msg = f"✅ Order added successfully!\n\n"
-            success_msg += f"Client: {client_name}\n"
-            success_msg += f"Order ID: {order_id_used}\n"
-            
-            # Add extracted details if available
-            if order_info.get('product'):
-                success_msg += f"Product: {order_info['product']}\n"
-            if order_info.get('quantity'):
-                success_msg += f"Quantity: {order_info['quantity']}\n"
-            if order_info.get('price'):
-                success_msg += f"Price: {order_info['price']}\n"
-            
-            return jsonify({'reply': success_msg})
+            g.command_action = 'order'
+            logger.debug("Processing as order data")
+            return jsonify({'reply': handle_once(message_key(from_user, user_msg, message_id),
+                                                 lambda: add_message_orders(user_msg))})
             
+    except RequestEntityTooLarge:
+        logger.warning("Rejected oversized chunked request", route='/api/whatsapp_in')
+        return jsonify({'reply': TOO_LARGE_REPLY}), 413
     except Exception as e:
-        error_msg = f"Error processing your order: {str(e)}"
-        print(f"Error in whatsapp_in: {error_msg}")
+        COMMAND_ERRORS.inc(action=g.get('command_action', 'unparsed'))
+        logger.exception("Error in whatsapp_in", error=str(e))
         return jsonify({'reply': 'Sorry, there was an error processing your order. Please try again or contact support.'})
 
+@app.route('/api/orders/bulk', methods=['POST'])
+def bulk_import_orders():
+    """Import many orders from a CSV or NDJSON upload; streams back one NDJSON result line per record"""
+    try:
+        fmt = upload_format(request.content_type, request.args.get('format'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    def body_chunks():
+        while True:
+            chunk = request.stream.read(64 * 1024)
+            if not chunk:
+                return
+            yield chunk
+
+    def report():
+        for result in import_orders(body_chunks(), fmt, extract_order_info, build_orders_rows, sync_order_rows):
+            if 'summary' in result:
+                logger.info("Bulk import finished", format=fmt, **result['summary'])
+            yield ndjson_line(result)
+
+    return Response(stream_with_context(report()), mimetype='application/x-ndjson')
+
 @app.route('/api/orders', methods=['GET'])
 def get_orders():
-    """Simple endpoint to get all orders - for debugging/testing"""
-    return jsonify(query_orders({}))
+    """Simple endpoint to get all orders - for debugging/testing
+
+    The ETag is the content version of the sheet, so pollers sending
+    If-None-Match get a 304 while nothing has changed.
+    """
+    reply, version = query_orders_with_version({})
+    response = jsonify(reply)
+    if version:
+        response.set_etag(version)
+    return response.make_conditional(request)
+
+@app.route('/api/queue', methods=['GET'])
+def queue_status():
+    """Backlog of the write-behind order queue"""
+    if not order_queue:
+        return jsonify({'enabled': False, 'backlog': 0, 'oldest_unsynced_age': 0})
+    return jsonify(order_queue.status())
+
+boot_warmup.imported()
 
 if __name__ == '__main__':
-    print(f"Starting WhatsApp Glass Bot Backend on port {PORT}")
-    print(f"Google Sheets integration active")
-    app.run(host='0.0.0.0', port=PORT, debug=False) 
\ No newline at end of file
+    # Development server; production runs `gunicorn -c gunicorn.conf.py app:app`
+    logger.info("Starting WhatsApp Glass Bot Backend", port=PORT)
+    start_background_workers()
+    try:
+        app.run(host='0.0.0.0', port=PORT, debug=False)
+    finally:
+        stop_background_workers() 
\ No newline at end of file
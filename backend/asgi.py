@@ -0,0 +1,353 @@
+"""Asyncio entry point with the same routes and replies as app.py.
+
+Apps Script calls are awaited instead of holding a worker thread, so a few
+workers can keep hundreds of slow sheet calls in flight. Run with:
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5000 --workers 2
+"""
+from warmup import BootWarmup  # first, so the startup timing covers every import below
+import asyncio
+import contextlib
+import json
+import os
+import time
+
+import anyio.from_thread
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.concurrency import iterate_in_threadpool
+from starlette.responses import JSONResponse, PlainTextResponse, Response
+from starlette.routing import Route
+
+from extraction import extract_order_info, extract_orders, parse_command, get_pattern_hits, ExtractionLimitError
+from sheets import show_help, show_update_help, show_search_help, get_apps_script_stats, build_orders_rows, sync_order_rows, orders_added_reply, readiness_reply
+from sheets_async import (
+    add_orders_async, query_orders_async, query_orders_with_version_async, update_order_status_async, get_tab_data_async,
+    get_all_tabs_data_async, search_all_tabs_async, probe_apps_script_async, close_async_client, warm_up_steps_async,
+)
+from order_queue import ORDER_QUEUE_ENABLED, ORDER_QUEUE_DIR, WriteBehindQueue
+from bulk_import import import_orders, ndjson_line, shutdown_pool, upload_format
+from message_dedupe import DEDUPE_ENABLED, DUPLICATE_IN_PROGRESS_REPLY, MessageDedupe, WriteFailed, message_key
+from rate_limit import RATE_LIMITED_ACTIONS, SenderRateLimiter, slow_down_reply
+from logs import configure_logging, get_logger, new_request_id
+from timing import PROFILE_HEADER, REQUEST_TIMING_HEADER, finish_profile, header_flag, stage, start_profile, start_request_timing
+from metrics import (
+    CONTENT_TYPE, COMMAND_ERRORS, COMMAND_LATENCY, MESSAGE_DUPLICATES, RATE_LIMITED, REQUESTS_IN_FLIGHT, app_samples,
+    register_collector, render_metrics, route_label,
+)
+
+PORT = int(os.environ.get('BACKEND_PORT', 5000))
+WHATSAPP_IN_MAX_BYTES = int(os.environ.get('WHATSAPP_IN_MAX_BYTES', 256 * 1024))
+TOO_LARGE_REPLY = '❌ This message is too large to process. Please split it into smaller messages.'
+
+configure_logging()
+logger = get_logger('asgi')
+
+order_queue = WriteBehindQueue(ORDER_QUEUE_DIR, sync_order_rows) if ORDER_QUEUE_ENABLED else None
+message_dedupe = MessageDedupe() if DEDUPE_ENABLED else None
+sender_limiter = SenderRateLimiter()
+# Opens the Apps Script connection and prefetches the tabs in each worker; /api/ready waits for it
+boot_warmup = BootWarmup()
+register_collector('app', lambda: app_samples(get_pattern_hits(), order_queue.status() if order_queue else None))
+
+class RequestIdMiddleware:
+    """Binds a request ID for log lines and echoes it in the X-Request-ID response header.
+
+    Also counts the request in the per-route in-flight gauge and, when asked
+    for, adds a Server-Timing header and profiles the request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        headers = dict(scope['headers'])
+        request_id = new_request_id(headers.get(b'x-request-id', b'').decode('latin-1'))
+        route = route_label(scope['path'], ROUTE_PATHS)
+        timings = start_request_timing(header_flag(headers.get(REQUEST_TIMING_HEADER.lower().encode(), b'').decode('latin-1')))
+        # Profiles the event loop thread while this request runs, so concurrent requests show up too
+        profile = start_profile(header_flag(headers.get(PROFILE_HEADER.lower().encode(), b'').decode('latin-1')))
+
+        async def send_with_id(message):
+            if message['type'] == 'http.response.start':
+                extra = [(b'x-request-id', request_id.encode())]
+                if timings:
+                    extra.append((b'server-timing', timings.server_timing().encode('latin-1')))
+                    logger.info("Request timing", route=route, stages=timings.summary())
+                message['headers'] = list(message.get('headers', [])) + extra
+            await send(message)
+
+        try:
+            with REQUESTS_IN_FLIGHT.track_in_progress(route=route):
+                await self.app(scope, receive, send_with_id)
+        finally:
+            if profile:
+                path = finish_profile(profile, f'{request_id}-{route}')
+                logger.info("Request profile written", route=route, path=path)
+
+async def health_check(request):
+    return JSONResponse({'status': 'healthy', 'message': 'WhatsApp Glass Bot Backend is running'})
+
+async def text_health(request):
+    return JSONResponse({'status': 'OK', 'message': 'Text processing is active'})
+
+async def readiness_check(request):
+    """Deep readiness: a measured round trip to Apps Script (503 while warming up or when it cannot be reached)"""
+    if boot_warmup.warming():
+        return JSONResponse(boot_warmup.warming_reply(), status_code=503)
+    body = readiness_reply(await probe_apps_script_async(), order_queue.status() if order_queue else None,
+                           boot_warmup.timings)
+    return JSONResponse(body, status_code=200 if body['ready'] else 503)
+
+async def metrics(request):
+    """Prometheus text exposition of this worker's metrics"""
+    return PlainTextResponse(render_metrics(), media_type=CONTENT_TYPE)
+
+async def apps_script_stats(request):
+    """Connection reuse and retry counters for the Apps Script client, and the mirror's sync state"""
+    # The mirror's sync state is read from SQLite
+    return JSONResponse(await asyncio.to_thread(get_apps_script_stats))
+
+def reply(text, status_code=200):
+    return JSONResponse({'reply': text}, status_code=status_code)
+
+async def read_limited_body(request, limit):
+    """Request body, or None once it grows past limit bytes"""
+    declared = request.headers.get('content-length')
+    if declared and declared.isdigit() and int(declared) > limit:
+        return None
+    body = b''
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > limit:
+            return None
+    return body
+
+async def run_command(command, sender):
+    """Reply text for a parsed slash command (a failed /update raises WriteFailed)"""
+    action = command['action']
+    params = command['params']
+    if action == 'get_tab_data':
+        return await get_tab_data_async(params['tab'], params.get('page'), sender)
+    if action == 'get_all_tabs_data':
+        return await get_all_tabs_data_async()
+    if action == 'search_all_tabs':
+        return await search_all_tabs_async(params['search_term'], params.get('filters'), params.get('terms'))
+    if action == 'show_help':
+        return show_help()
+    if action == 'show_update_help':
+        return show_update_help()
+    if action == 'show_search_help':
+        return show_search_help()
+    if action == 'query':
+        return await query_orders_async(params)
+    if action == 'update':
+        order_id = params.get('order_id')
+        status = params.get('status')
+        if not (order_id and status):
+            return '❌ Invalid update command. Use: /update [order_id] [status]'
+        if await update_order_status_async({'order_id': order_id, 'status': status}):
+            return f'✅ Order {order_id} status updated to {status} and moved to {status} tab.'
+        raise WriteFailed(f'❌ Failed to update order {order_id}. Please check the order ID and try again.')
+    return 'Unknown command. Type /help for available commands.'
+
+async def handle_once(message, handle, action):
+    """await handle() unless the message was already handled, as in app.py; the dedupe store is used from a thread"""
+    key = None
+    if message_dedupe and message:
+        key, window = message
+        claimed, cached = await asyncio.to_thread(message_dedupe.claim, key, window)
+        if not claimed:
+            MESSAGE_DUPLICATES.inc(kind=key.split(':', 1)[0])
+            logger.info("Duplicate message answered from dedupe store", action=action)
+            return cached if cached is not None else DUPLICATE_IN_PROGRESS_REPLY
+    try:
+        text = await handle()
+    except WriteFailed as e:
+        if key:
+            await asyncio.to_thread(message_dedupe.release, key)
+        return e.reply
+    except Exception:
+        if key:
+            await asyncio.to_thread(message_dedupe.release, key)
+        raise
+    if key:
+        await asyncio.to_thread(message_dedupe.complete, key, text)
+    return text
+
+async def add_message_orders(user_msg):
+    """Extract the orders in a message and add them to the sheet; returns the reply"""
+    try:
+        # Scanning is CPU work; keep it off the event loop
+        with stage('extract'):
+            orders = await asyncio.to_thread(extract_orders, user_msg)
+    except ExtractionLimitError as e:
+        logger.warning("Rejected order message", error=str(e), chars=len(user_msg))
+        return '❌ This message is too long to read as one order. Please split it into smaller messages.'
+    logger.debug("Extracted order info", order_info=orders, orders=len(orders),
+                 sizes_found=sum(len(order_info.get('sizes', [])) for order_info in orders))
+
+    if order_queue:
+        # Allocating the IDs and the journal append both fsync, so they run in threads too
+        built = await asyncio.to_thread(build_orders_rows, orders)
+        with stage('journal'):
+            await asyncio.to_thread(order_queue.enqueue_many, built)
+        order_ids = [order_id for order_id, _ in built]
+        logger.info("Orders queued for sheet sync", order_ids=order_ids)
+    else:
+        order_ids = await add_orders_async(orders)
+        logger.info("Orders added to sheet", order_ids=order_ids)
+
+    return orders_added_reply(list(zip(orders, order_ids)))
+
+async def whatsapp_in(request):
+    """Handle WhatsApp text input - same contract as app.py"""
+    body = await read_limited_body(request, WHATSAPP_IN_MAX_BYTES)
+    if body is None:
+        logger.warning("Rejected oversized request", route='/api/whatsapp_in')
+        return reply(TOO_LARGE_REPLY, 413)
+    started = time.perf_counter()
+    action = None
+    try:
+        try:
+            data = json.loads(body) or {}
+        except ValueError:
+            data = {}
+        user_msg = data.get('body', '').strip()
+        from_user = data.get('from', 'unknown')
+
+        logger.info("Text message received", sender=from_user, body=user_msg, chars=len(user_msg))
+
+        if not user_msg:
+            return reply('Please send your order details as text.')
+        message_id = data.get('messageId') or request.headers.get('idempotency-key')
+
+        with stage('parse'):
+            command = parse_command(user_msg)
+        if command:
+            action = command['action']
+            logger.info("Processing command", action=action)
+            if action in RATE_LIMITED_ACTIONS:
+                allowed, retry_after = sender_limiter.allow(from_user)
+                if not allowed:
+                    RATE_LIMITED.inc(action=action)
+                    logger.info("Sender rate limited", sender=from_user, action=action, retry_after=round(retry_after, 1))
+                    return reply(slow_down_reply(retry_after))
+            if action == 'update':
+                # Without an ID, the same /update sent again is meant to run again
+                message = message_key(from_user, user_msg, message_id, by_content=False)
+                return reply(await handle_once(message, lambda: run_command(command, from_user), action))
+            return reply(await run_command(command, from_user))
+
+        action = 'order'
+        logger.debug("Processing as order data")
+        return reply(await handle_once(message_key(from_user, user_msg, message_id),
+                                       lambda: add_message_orders(user_msg), action))
+
+    except Exception as e:
+        COMMAND_ERRORS.inc(action=action or 'unparsed')
+        logger.exception("Error in whatsapp_in", error=str(e))
+        return reply('Sorry, there was an error processing your order. Please try again or contact support.')
+    finally:
+        if action:
+            COMMAND_LATENCY.observe(time.perf_counter() - started, action=action)
+
+class NDJSONStream:
+    """Response streaming the lines of a sync iterator, which runs on the threadpool.
+
+    Unlike StreamingResponse it does not listen for a disconnect while
+    streaming, since that would read (and drop) the request body the
+    iterator is still consuming.
+    """
+
+    def __init__(self, lines):
+        self.lines = lines
+
+    async def __call__(self, scope, receive, send):
+        await send({'type': 'http.response.start', 'status': 200,
+                    'headers': [(b'content-type', b'application/x-ndjson; charset=utf-8')]})
+        async for line in iterate_in_threadpool(self.lines):
+            await send({'type': 'http.response.body', 'body': line.encode('utf-8'), 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+
+async def bulk_import_orders(request):
+    """Bulk import as in app.py; the import pulls the upload from the event loop a chunk at a time"""
+    try:
+        fmt = upload_format(request.headers.get('content-type'), request.query_params.get('format'))
+    except ValueError as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+    stream = request.stream()
+
+    def body_chunks():
+        while True:
+            try:
+                yield anyio.from_thread.run(stream.__anext__)
+            except StopAsyncIteration:
+                return
+
+    def report():
+        for result in import_orders(body_chunks(), fmt, extract_order_info, build_orders_rows, sync_order_rows):
+            if 'summary' in result:
+                logger.info("Bulk import finished", format=fmt, **result['summary'])
+            yield ndjson_line(result)
+
+    return NDJSONStream(report())
+
+async def get_orders(request):
+    """Simple endpoint to get all orders - for debugging/testing (ETag / 304 as in app.py)"""
+    reply, version = await query_orders_with_version_async({})
+    if not version:
+        return JSONResponse(reply)
+    etag = f'"{version}"'
+    if etag in [tag.strip() for tag in request.headers.get('if-none-match', '').split(',')]:
+        return Response(status_code=304, headers={'ETag': etag})
+    return JSONResponse(reply, headers={'ETag': etag})
+
+async def queue_status(request):
+    """Backlog of the write-behind order queue"""
+    if not order_queue:
+        return JSONResponse({'enabled': False, 'backlog': 0, 'oldest_unsynced_age': 0})
+    return JSONResponse(order_queue.status())
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    if order_queue:
+        order_queue.start()
+    warmup_task = asyncio.create_task(boot_warmup.run_async(warm_up_steps_async()))
+    yield
+    warmup_task.cancel()
+    if order_queue:
+        await asyncio.to_thread(order_queue.stop)
+    shutdown_pool()
+    await close_async_client()
+
+app = Starlette(
+    routes=[
+        Route('/api/health', health_check, methods=['GET']),
+        Route('/api/text_health', text_health, methods=['GET']),
+        Route('/api/ready', readiness_check, methods=['GET']),
+        Route('/api/metrics', metrics, methods=['GET']),
+        Route('/api/apps_script_stats', apps_script_stats, methods=['GET']),
+        Route('/api/whatsapp_in', whatsapp_in, methods=['POST']),
+        Route('/api/orders/bulk', bulk_import_orders, methods=['POST']),
+        Route('/api/orders', get_orders, methods=['GET']),
+        Route('/api/queue', queue_status, methods=['GET']),
+    ],
+    middleware=[
+        Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*']),
+        Middleware(RequestIdMiddleware),
+    ],
+    lifespan=lifespan,
+)
+
+ROUTE_PATHS = {route.path for route in app.routes}
+
+boot_warmup.imported()
+
+if __name__ == '__main__':
+    import uvicorn
+    logger.info("Starting WhatsApp Glass Bot Backend (asyncio)", port=PORT)
+    uvicorn.run(app, host='0.0.0.0', port=PORT)
@@ -0,0 +1,247 @@
+import codecs
+import csv
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+# Bulk order import for /api/orders/bulk: records are read from the upload as
+# it streams in, extracted on a worker pool and written to the sheet in chunks,
+# and a result line per record is streamed back. Only a window of records and
+# one chunk of rows are held at a time.
+BULK_IMPORT_WORKERS = int(os.environ.get('BULK_IMPORT_WORKERS', min(4, os.cpu_count() or 1)))
+BULK_IMPORT_CHUNK_SIZE = int(os.environ.get('BULK_IMPORT_CHUNK_SIZE', 50))
+BULK_IMPORT_MAX_RECORDS = int(os.environ.get('BULK_IMPORT_MAX_RECORDS', 10000))
+
+# Raw WhatsApp text goes in one of these fields; anything else is read as an already structured order
+MESSAGE_FIELDS = ('message', 'text', 'body')
+FIELD_ALIASES = {
+    'order_id': ('order_id', 'id', 'invoice_number'),
+    'client_name': ('client_name', 'clientName', 'client'),
+    'glass_specs': ('glass_specs', 'specifications', 'specs'),
+    'sizes': ('sizes', 'size'),
+    'quantities': ('quantities', 'quantity', 'qty'),
+}
+
+class RecordError(ValueError):
+    """A record that cannot be imported; reported for that record only"""
+
+def upload_format(content_type, requested=None):
+    """'csv' or 'ndjson' from ?format= or the Content-Type header (NDJSON by default)"""
+    if requested:
+        if requested.lower() not in ('csv', 'ndjson', 'jsonl'):
+            raise ValueError(f'Unknown format {requested!r}; use csv or ndjson')
+        return 'csv' if requested.lower() == 'csv' else 'ndjson'
+    return 'csv' if 'csv' in (content_type or '').lower() else 'ndjson'
+
+def iter_lines(chunks):
+    """Text lines (with their line endings) from an iterable of byte chunks"""
+    decoder = codecs.getincrementaldecoder('utf-8')('replace')
+    buffer = ''
+    first = True
+    for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        if first and buffer:
+            buffer = buffer.lstrip('﻿')
+            first = False
+        *lines, buffer = buffer.split('\n')
+        for line in lines:
+            yield line + '\n'
+    buffer += decoder.decode(b'', final=True)
+    if buffer:
+        yield buffer
+
+def _split_list(value):
+    if isinstance(value, list):
+        return [str(item).strip() for item in value]
+    if value in (None, ''):
+        return []
+    return [item.strip() for item in str(value).split(';')]
+
+def structured_order_info(record):
+    """extract_order_info-shaped dict from a structured record; sizes/quantities are lists or ';'-separated"""
+    def field(name):
+        for alias in FIELD_ALIASES[name]:
+            if record.get(alias) not in (None, ''):
+                return record[alias]
+        return None
+
+    sizes = _split_list(field('sizes'))
+    quantities = _split_list(field('quantities'))
+    client_name = field('client_name')
+    if not (client_name or sizes):
+        raise RecordError('Record has no message and no order fields')
+    info = {
+        'client_name': str(client_name or 'UNKNOWN').strip(),
+        'glass_specs': str(field('glass_specs') or '').strip(),
+        'sizes': sizes,
+        'quantities': quantities,
+        'order_id': None,
+    }
+    if field('order_id'):
+        # build_order_rows takes the order ID from invoice_number
+        info['invoice_number'] = str(field('order_id')).strip()
+    return info
+
+def record_message(record):
+    """The raw order message of a record, or None if it is a structured record"""
+    for name in MESSAGE_FIELDS:
+        value = record.get(name)
+        if value is None:
+            continue
+        if not isinstance(value, str):
+            raise RecordError(f"'{name}' must be a string")
+        if value.strip():
+            return value
+    return None
+
+def iter_records(lines, fmt):
+    """(record number, record dict or RecordError) for each non-blank record of the upload"""
+    if fmt == 'csv':
+        reader = csv.DictReader(lines)
+        for number, row in enumerate(reader, 1):
+            if None in row:
+                yield number, RecordError('Row has more columns than the header')
+            elif any((value or '').strip() for value in row.values()):
+                yield number, row
+        return
+    number = 0
+    for line in lines:
+        if not line.strip():
+            continue
+        number += 1
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield number, RecordError(f'Invalid JSON: {e}')
+            continue
+        if isinstance(record, str):
+            record = {'message': record}
+        if not isinstance(record, dict):
+            yield number, RecordError('Each line must be a JSON object or string')
+            continue
+        yield number, record
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+def _get_pool():
+    """Process pool for extraction (the scanner is CPU-bound), one per worker process"""
+    global _pool, _pool_pid
+    # Imported here so servers that never get a bulk upload do not load multiprocessing at boot
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            # spawn rather than fork: the server process has threads running
+            _pool = ProcessPoolExecutor(BULK_IMPORT_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+            _pool_pid = os.getpid()
+        return _pool
+
+def shutdown_pool():
+    """Stop this process's extraction pool, if one was started"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.shutdown(cancel_futures=True)
+        _pool = None
+
+def _done(func, *args):
+    """A finished Future holding func(*args) or its exception"""
+    future = Future()
+    try:
+        future.set_result(func(*args))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+def import_orders(chunks, fmt, extract, build_rows, sync_rows, workers=None, chunk_size=None,
+                  max_records=None):
+    """Import an upload; yields one report dict per record, then a summary.
+
+    extract(text) reads a raw message (extract_order_info), build_rows(infos)
+    returns (order ID, sheet rows) for each order of a chunk (so its new
+    order IDs can be taken at once) and sync_rows(rows) writes rows to the
+    sheet. Records are numbered by non-blank line (CSV: data row) and
+    reported as 'error' as soon as they fail, or as 'ok' with their order
+    ID once their chunk is written. A failed sheet write fails only the
+    records in that chunk.
+    """
+    workers = BULK_IMPORT_WORKERS if workers is None else workers
+    chunk_size = max(1, BULK_IMPORT_CHUNK_SIZE if chunk_size is None else chunk_size)
+    max_records = BULK_IMPORT_MAX_RECORDS if max_records is None else max_records
+    pool = _get_pool() if workers > 1 else None
+    window = max(1, workers) * 8
+    started = time.perf_counter()
+    totals = {'records': 0, 'imported': 0, 'failed': 0, 'sheet_rows': 0, 'chunks': 0, 'truncated': False}
+    pending = deque()
+    chunk = []
+
+    def submit(record):
+        if isinstance(record, Exception):
+            future = Future()
+            future.set_exception(record)
+            return future
+        try:
+            message = record_message(record)
+        except RecordError as e:
+            return submit(e)
+        if message is None:
+            return _done(structured_order_info, record)
+        return pool.submit(extract, message) if pool else _done(extract, message)
+
+    def failed(number, error):
+        totals['failed'] += 1
+        return {'record': number, 'status': 'error', 'error': str(error)}
+
+    def write_chunk():
+        numbers = [number for number, _ in chunk]
+        try:
+            built = build_rows([info for _, info in chunk])
+        except Exception as e:
+            return [failed(number, e) for number in numbers]
+        rows = [row for _, order_rows in built for row in order_rows]
+        try:
+            sync_rows(rows)
+        except Exception as e:
+            return [failed(number, f'Sheet write failed: {e}') for number in numbers]
+        totals['imported'] += len(numbers)
+        totals['sheet_rows'] += len(rows)
+        return [{'record': number, 'status': 'ok', 'order_id': order_id, 'rows': len(order_rows)}
+                for number, (order_id, order_rows) in zip(numbers, built)]
+
+    def flush():
+        totals['chunks'] += 1
+        reports = write_chunk()
+        chunk.clear()
+        return reports
+
+    def settle(number, future):
+        try:
+            info = future.result()
+        except Exception as e:
+            return [failed(number, e)]
+        chunk.append((number, info))
+        return flush() if len(chunk) >= chunk_size else []
+
+    for number, record in iter_records(iter_lines(chunks), fmt):
+        if totals['records'] >= max_records:
+            totals['truncated'] = True
+            break
+        totals['records'] += 1
+        pending.append((number, submit(record)))
+        if len(pending) >= window:
+            yield from settle(*pending.popleft())
+    while pending:
+        yield from settle(*pending.popleft())
+    if chunk:
+        yield from flush()
+    totals['seconds'] = round(time.perf_counter() - started, 3)
+    yield {'summary': totals}
+
+def ndjson_line(result):
+    """One result as an NDJSON line of the streamed response"""
+    return json.dumps(result, ensure_ascii=False) + '\n'
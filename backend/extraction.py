@@ -1,79 +1,226 @@
+import logging
+import os
 import re
+import threading
+import time
+
+# Stdlib logger so this module stays importable on its own; logs.py formats and redacts the fields
+logger = logging.getLogger('glassbot.extraction')
+
+# Limits that keep a single message from tying up a worker
+MAX_MESSAGE_CHARS = int(os.environ.get('EXTRACTION_MAX_CHARS', 20000))
+EXTRACTION_TIME_BUDGET = float(os.environ.get('EXTRACTION_TIME_BUDGET', 0.5))
+
+# Label patterns, compiled once
+CLIENT_NAME_RE = re.compile(r'Client Name[:\-]?\s*(.+)', re.IGNORECASE)
+GLASS_SPECS_RE = re.compile(r'Glass Specifications[:\-]?\s*(.+)', re.IGNORECASE)
+ORDER_ID_RE = re.compile(r'Proforma Invoice No\.?[:\-]?\s*([A-Za-z0-9\-/]+)', re.IGNORECASE)
+SIZES_SECTION_RE = re.compile(r'Sizes[:\-]?\s*(.+?)(?=Quantities|\Z)', re.IGNORECASE | re.DOTALL)
+QUANTITIES_SECTION_RE = re.compile(r'Quantities[:\-]?\s*(.+)', re.IGNORECASE | re.DOTALL)
+SIZES_LABEL_RE = re.compile(r'Sizes[:\-]?', re.IGNORECASE)
+QUANTITIES_LABEL_RE = re.compile(r'Quantities[:\-]?', re.IGNORECASE)
+QUANTITY_RE = re.compile(r'Quantity[:\-]?\s*(\d+)', re.IGNORECASE)
+# Labels that open an order; a second one of the same kind starts the next order in the message
+ORDER_MARKER_RE = re.compile(r'(Client Name|Proforma Invoice No)', re.IGNORECASE)
+
+# Tokens for the size/quantity scanner: runs of size characters (digits,
+# whitespace, '.', '/', 'x'), digit runs, and whitespace
+SIZE_RUN_RE = re.compile(r'[\d\s\./x]+')
+DIGITS_RE = re.compile(r'\d+')
+SPACES_RE = re.compile(r'\s*')
+
+# How often each size/quantity format matched (served on /api/metrics)
+PATTERNS = ('numbered', 'bare', 'sections', 'glass_specs', 'none')
+_pattern_hits = dict.fromkeys(PATTERNS, 0)
+_pattern_hits_lock = threading.Lock()
+
+def count_pattern_hit(pattern):
+    with _pattern_hits_lock:
+        _pattern_hits[pattern] += 1
+
+def get_pattern_hits():
+    with _pattern_hits_lock:
+        return dict(_pattern_hits)
+
+class ExtractionLimitError(ValueError):
+    """The message is too long or took too long to scan"""
+
+class _SizeScanner:
+    """Linear-time matcher for 'size - qty' lines.
+
+    Produces exactly what re.findall gave for the numbered ('1. 83 x 72 - 1')
+    and bare ('83 x 72 - 1') list patterns, without their backtracking. A
+    size is always a maximal run of size characters that ends right before
+    '-', so the text is tokenized into those runs once and each run, '-' and
+    digit run is visited a bounded number of times.
+    """
+
+    def __init__(self, text, deadline):
+        self.text = text
+        self.deadline = deadline
+        self.runs = [(m.start(), m.end()) for m in SIZE_RUN_RE.finditer(text)]
+        self._qty_after = {}
+        self._steps = 0
+
+    def _tick(self):
+        self._steps += 1
+        if self._steps % 1024 == 0 and time.monotonic() > self.deadline:
+            raise ExtractionLimitError('Order message took too long to read')
+
+    def _quantity_after(self, run_end):
+        """(qty, end) if run_end is '-' followed by optional whitespace and digits"""
+        if run_end not in self._qty_after:
+            text = self.text
+            result = None
+            if run_end < len(text) and text[run_end] == '-':
+                digits = DIGITS_RE.match(text, SPACES_RE.match(text, run_end + 1).end())
+                if digits:
+                    result = (digits.group(0), digits.end())
+            self._qty_after[run_end] = result
+        return self._qty_after[run_end]
+
+    def bare(self):
+        pairs = []
+        pos = 0
+        for run_start, run_end in self.runs:
+            self._tick()
+            if run_end <= pos:
+                continue
+            start = max(run_start, pos)
+            found = self._quantity_after(run_end)
+            if found:
+                pairs.append((self.text[start:run_end], found[0]))
+                pos = found[1]
+        return pairs
+
+    def numbered(self):
+        pairs = []
+        pos = 0
+        runs = self.runs
+        run_index = 0
+        text = self.text
+        for number in DIGITS_RE.finditer(text):
+            self._tick()
+            if number.start() < pos or number.end() >= len(text) or text[number.end()] != '.':
+                continue
+            size_start = number.end() + 1
+            while run_index < len(runs) and runs[run_index][1] <= size_start:
+                run_index += 1
+            if run_index == len(runs) or runs[run_index][0] > size_start:
+                continue
+            run_end = runs[run_index][1]
+            found = self._quantity_after(run_end)
+            if found:
+                pairs.append((text[size_start:run_end], found[0]))
+                pos = found[1]
+        return pairs
+
+def _section_pairs(text):
+    """Pairs from separate 'Sizes:' and 'Quantities:' sections"""
+    sizes_section = SIZES_SECTION_RE.search(text)
+    quantities_section = QUANTITIES_SECTION_RE.search(text)
+    if not (sizes_section and quantities_section):
+        return []
+    
+    # Split by newlines and filter out empty lines and any lines containing "Sizes:" or "Quantities:"
+    sizes_list = [s.strip() for s in sizes_section.group(1).strip().split('\n')
+                  if s.strip() and not SIZES_LABEL_RE.search(s)]
+    quantities_list = [q.strip() for q in quantities_section.group(1).strip().split('\n')
+                       if q.strip() and not QUANTITIES_LABEL_RE.search(q)]
+    
+    logger.debug("Sizes/Quantities sections", extra={'fields': {'sizes': sizes_list, 'quantities': quantities_list}})
+    
+    # Create pairs from the two lists
+    return list(zip(sizes_list, quantities_list))
 
 def extract_order_info(text):
+    if len(text) > MAX_MESSAGE_CHARS:
+        raise ExtractionLimitError(f'Order message is longer than {MAX_MESSAGE_CHARS} characters')
+    return _extract(text, time.monotonic() + EXTRACTION_TIME_BUDGET)
+
+def split_orders(text):
+    """Split a message holding several pasted orders into one text per order.
+
+    An order starts at the line of a 'Client Name' or 'Proforma Invoice No'
+    label when the current order already has that label, so an invoice that
+    gives both (in either order) stays together. Text before the first label
+    belongs to the first order.
+    """
+    starts = [0]
+    seen = set()
+    for match in ORDER_MARKER_RE.finditer(text):
+        kind = match.group(1).lower()
+        if kind in seen:
+            line_start = text.rfind('\n', 0, match.start()) + 1
+            if line_start > starts[-1]:
+                starts.append(line_start)
+                seen = set()
+        seen.add(kind)
+    return [text[start:end] for start, end in zip(starts, starts[1:] + [len(text)])]
+
+def extract_orders(text):
+    """extract_order_info for each order in a message (see split_orders).
+
+    An order without its own client name keeps the previous order's, as when
+    one client sends several invoices. The whole message shares one time
+    budget.
+    """
+    if len(text) > MAX_MESSAGE_CHARS:
+        raise ExtractionLimitError(f'Order message is longer than {MAX_MESSAGE_CHARS} characters')
+    deadline = time.monotonic() + EXTRACTION_TIME_BUDGET
+    orders = []
+    for part in split_orders(text):
+        order_info = _extract(part, deadline)
+        if orders and order_info['client_name'] == 'UNKNOWN':
+            order_info['client_name'] = orders[-1]['client_name']
+        orders.append(order_info)
+    return orders
+
+def _extract(text, deadline):
     # Extract client name
-    client_match = re.search(r'Client Name[:\-]?\s*(.+)', text, re.IGNORECASE)
+    client_match = CLIENT_NAME_RE.search(text)
     client_name = client_match.group(1).strip() if client_match else 'UNKNOWN'
 
     # Extract glass specifications
-    specs_match = re.search(r'Glass Specifications[:\-]?\s*(.+)', text, re.IGNORECASE)
+    specs_match = GLASS_SPECS_RE.search(text)
     glass_specs = specs_match.group(1).strip() if specs_match else ''
 
     # Extract proforma invoice/order id if present
-    order_id_match = re.search(r'Proforma Invoice No\.?[:\-]?\s*([A-Za-z0-9\-/]+)', text, re.IGNORECASE)
+    order_id_match = ORDER_ID_RE.search(text)
     order_id = order_id_match.group(1).strip() if order_id_match else None
 
-    # Extract all size/quantity lines with multiple patterns
-    size_qty_lines = []
-    
-    # Pattern 1: Numbered list (e.g., 1. 83 x 72 1/8 - 1)
-    size_qty_lines = re.findall(r'\d+\.\s*([\d\s\./x]+)\s*-\s*(\d+)', text)
+    # Size/quantity formats, in order of preference. An "Actual Size and
+    # Quantity:" section is a numbered or bare list, so the scanner already
+    # picks up its lines from the whole message.
+    scanner = _SizeScanner(text, deadline)
     
-    # Pattern 2: Without numbering (e.g., 83 x 72 1/8 - 1)
+    # Numbered list (e.g., 1. 83 x 72 1/8 - 1), then without numbering (e.g., 83 x 72 1/8 - 1)
+    pattern = 'numbered'
+    size_qty_lines = scanner.numbered()
     if not size_qty_lines:
-        size_qty_lines = re.findall(r'([\d\s\./x]+)\s*-\s*(\d+)', text)
+        pattern = 'bare'
+        size_qty_lines = scanner.bare()
     
-    # Pattern 3: Look for "Sizes:" and "Quantities:" sections
+    # "Sizes:" and "Quantities:" sections
     if not size_qty_lines:
-        sizes_section = re.search(r'Sizes[:\-]?\s*(.+?)(?=Quantities|\Z)', text, re.IGNORECASE | re.DOTALL)
-        quantities_section = re.search(r'Quantities[:\-]?\s*(.+)', text, re.IGNORECASE | re.DOTALL)
-        
-        if sizes_section and quantities_section:
-            # Extract sizes and quantities, filtering out empty lines and headers
-            sizes_text = sizes_section.group(1).strip()
-            quantities_text = quantities_section.group(1).strip()
-            
-            # Split by newlines and filter out empty lines and any lines containing "Sizes:" or "Quantities:"
-            sizes_list = [s.strip() for s in sizes_text.split('\n') 
-                         if s.strip() and not re.search(r'Sizes[:\-]?', s, re.IGNORECASE)]
-            quantities_list = [q.strip() for q in quantities_text.split('\n') 
-                              if q.strip() and not re.search(r'Quantities[:\-]?', q, re.IGNORECASE)]
-            
-            print(f"Debug - Sizes list: {sizes_list}")
-            print(f"Debug - Quantities list: {quantities_list}")
-            
-            # Create pairs from the two lists
-            size_qty_lines = list(zip(sizes_list, quantities_list))
+        pattern = 'sections'
+        size_qty_lines = _section_pairs(text)
     
-    # Pattern 4: Look for "Actual Size and Quantity:" section
-    if not size_qty_lines:
-        actual_size_qty_section = re.search(r'Actual Size and Quantity[:\-]?\s*(.+)', text, re.IGNORECASE | re.DOTALL)
-        if actual_size_qty_section:
-            section_text = actual_size_qty_section.group(1).strip()
-            # Try to find numbered list format in this section
-            numbered_items = re.findall(r'\d+\.\s*([\d\s\./x]+)\s*-\s*(\d+)', section_text)
-            if numbered_items:
-                size_qty_lines = numbered_items
-            else:
-                # Try non-numbered format
-                non_numbered_items = re.findall(r'([\d\s\./x]+)\s*-\s*(\d+)', section_text)
-                if non_numbered_items:
-                    size_qty_lines = non_numbered_items
-    
-    # Pattern 5: If glass specs is found but no sizes, use glass specs as the size
+    # If glass specs is found but no sizes, use glass specs as the size
     if not size_qty_lines and glass_specs:
+        pattern = 'glass_specs'
         # Look for quantity after glass specs
-        qty_match = re.search(r'Quantity[:\-]?\s*(\d+)', text, re.IGNORECASE)
+        qty_match = QUANTITY_RE.search(text)
         qty = qty_match.group(1).strip() if qty_match else '1'  # Default to 1 if no quantity found
         size_qty_lines = [(f"Glass Specifications: {glass_specs}", qty)]
     
+    count_pattern_hit(pattern if size_qty_lines else 'none')
+    
     # Process the extracted lines
-    sizes = [s.strip() for s, q in size_qty_lines] if size_qty_lines else []
-    quantities = [q.strip() for s, q in size_qty_lines] if size_qty_lines else []
+    sizes = [s.strip() for s, q in size_qty_lines]
+    quantities = [q.strip() for s, q in size_qty_lines]
     
-    # Debug print
-    print(f"Extracted sizes: {sizes}")
-    print(f"Extracted quantities: {quantities}")
+    logger.debug("Extracted sizes", extra={'fields': {'sizes': sizes, 'quantities': quantities}})
 
     return {
         'client_name': client_name,
@@ -83,19 +230,51 @@ def extract_order_info(text):
         'order_id': order_id
     }
 
+# /search field filters, e.g. client:"john doe" spec:10mm tab:ready id:123456
+SEARCH_FILTER_ALIASES = {'client': 'client', 'spec': 'spec', 'specs': 'spec', 'tab': 'tab', 'id': 'id'}
+SEARCH_QUERY_RE = re.compile(r'(\w+):"([^"]*)"|(\w+):(\S+)|"([^"]*)"|(\S+)')
+
+def parse_search_query(query):
+    """Split a /search query into field filters and free-text terms"""
+    filters = {}
+    terms = []
+    for match in SEARCH_QUERY_RE.finditer(query):
+        quoted_field, quoted_value, field, value, quoted_term, term = match.groups()
+        field = quoted_field or field
+        value = quoted_value if quoted_field else value
+        if field and field.lower() in SEARCH_FILTER_ALIASES:
+            filters.setdefault(SEARCH_FILTER_ALIASES[field.lower()], []).append(value)
+        elif field:
+            # Not a known filter (e.g. a time like 10:30), search for it as typed
+            terms.append(match.group(0).replace('"', ''))
+        else:
+            terms.append(quoted_term if quoted_term is not None else term)
+    return filters, [t for t in terms if t.strip()]
+
+PAGE_ALIASES = {'next': 'next', 'more': 'next', 'prev': 'prev', 'previous': 'prev', 'back': 'prev'}
+
+def parse_page_arg(text):
+    """Page argument of a tab command: a page number, 'next', 'prev' or None for the first page"""
+    parts = text.split()
+    if len(parts) < 2:
+        return None
+    if parts[1].isdigit():
+        return int(parts[1]) or None
+    return PAGE_ALIASES.get(parts[1])
+
 def parse_command(text):
     # WhatsApp slash command parser
     text = text.strip().lower()
     
-    # New enhanced commands for different tabs
+    # New enhanced commands for different tabs: /pending [page | next | prev]
     if text.startswith('/pending'):
-        return {'action': 'get_tab_data', 'params': {'tab': 'Pending'}}
+        return {'action': 'get_tab_data', 'params': {'tab': 'Pending', 'page': parse_page_arg(text)}}
     elif text.startswith('/ready'):
-        return {'action': 'get_tab_data', 'params': {'tab': 'Ready'}}
+        return {'action': 'get_tab_data', 'params': {'tab': 'Ready', 'page': parse_page_arg(text)}}
     elif text.startswith('/delivered'):
-        return {'action': 'get_tab_data', 'params': {'tab': 'Delivered'}}
+        return {'action': 'get_tab_data', 'params': {'tab': 'Delivered', 'page': parse_page_arg(text)}}
     elif text.startswith('/completed'):
-        return {'action': 'get_tab_data', 'params': {'tab': 'Completed'}}
+        return {'action': 'get_tab_data', 'params': {'tab': 'Completed', 'page': parse_page_arg(text)}}
     elif text.startswith('/all'):
         return {'action': 'get_all_tabs_data', 'params': {}}
     elif text.startswith('/help'):
@@ -118,7 +297,8 @@ def parse_command(text):
         # /search [client name or order id]
         parts = text.split(maxsplit=1)
         if len(parts) > 1:
-            return {'action': 'search_all_tabs', 'params': {'search_term': parts[1]}}
+            filters, terms = parse_search_query(parts[1])
+            return {'action': 'search_all_tabs', 'params': {'search_term': parts[1], 'filters': filters, 'terms': terms}}
         else:
             return {'action': 'show_search_help', 'params': {}}
     
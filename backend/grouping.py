@@ -0,0 +1,172 @@
+from datetime import datetime
+from functools import lru_cache
+
+# Column positions in a raw sheet row (getRawSheetData)
+ID_COL, CLIENT_COL, SPECS_COL, SIZES_COL, QTY_COL, STATUS_COL, NOTES_COL, CREATED_COL, UPDATED_COL = range(9)
+ROW_WIDTH = 9
+
+def is_header_row(row):
+    return not row or row[ID_COL] in ('ID', 'id')
+
+def padded_row(row):
+    """row cut or padded with '' to ROW_WIDTH cells, so every column can be indexed without a length check"""
+    width = len(row)
+    if width == ROW_WIDTH:
+        return row
+    if width > ROW_WIDTH:
+        return row[:ROW_WIDTH]
+    return list(row) + [''] * (ROW_WIDTH - width)
+
+@lru_cache(maxsize=4096)
+def format_date_only(dt_str):
+    """'28 June 2025' for an ISO timestamp; anything unparseable is returned as is"""
+    try:
+        if not dt_str:
+            return ''
+        dt = datetime.fromisoformat(dt_str.replace('Z', '+00:00'))
+        return dt.strftime('%d %B %Y')  # e.g., '28 June 2025'
+    except Exception:
+        return dt_str  # fallback to original if parsing fails
+
+class Item:
+    """One size line of an order"""
+    __slots__ = ('sizes', 'quantity')
+
+    def __init__(self, sizes, quantity):
+        self.sizes = sizes
+        self.quantity = quantity
+
+class Order:
+    """A grouped order with fixed fields.
+
+    Slots instead of a dict per order keep a 100k-row tab's grouped orders
+    small. created and updated are the display dates, parsed on first use
+    and then kept on the order, so re-rendering it never parses again.
+    """
+    __slots__ = ('id', 'client_name', 'specifications', 'status', 'notes', 'created_at', 'updated_at',
+                 'items', 'source_tab', '_created', '_updated')
+
+    def __init__(self, order_id, fields, source_tab=None):
+        self.id = order_id
+        self.client_name, self.specifications, self.status, self.notes, self.created_at, self.updated_at = fields
+        self.items = []
+        self.source_tab = source_tab
+        self._created = self._updated = None
+
+    @property
+    def created(self):
+        if self._created is None:
+            self._created = format_date_only(self.created_at)
+        return self._created
+
+    @property
+    def updated(self):
+        if self._updated is None:
+            self._updated = format_date_only(self.updated_at)
+        return self._updated
+
+    def fields(self):
+        return self.client_name, self.specifications, self.status, self.notes, self.created_at, self.updated_at
+
+    def as_dict(self):
+        """The order as the dict grouping used to return (getOrdersFromSheet key names)"""
+        order = {
+            'id': self.id,
+            'clientName': self.client_name,
+            'specifications': self.specifications,
+            'createdAt': self.created_at,
+            'updatedAt': self.updated_at,
+            'status': self.status,
+            'notes': self.notes,
+            'items': [{'sizes': item.sizes, 'quantity': item.quantity} for item in self.items],
+        }
+        if self.source_tab is not None:
+            order['source_tab'] = self.source_tab
+        return order
+
+def order_fields(order):
+    """Order fields from a getOrdersFromSheet order dict"""
+    get = order.get
+    return (get('clientName', ''), get('specifications', ''), get('status', ''), get('notes', ''),
+            get('createdAt', ''), get('updatedAt', ''))
+
+def exact_size_key(size):
+    return size
+
+def normalized_size_key(size):
+    return str(size).strip().lower()
+
+class OrderGrouper:
+    """Groups sheet rows into orders (id -> Order) in one pass.
+
+    The first row seen for an ID supplies the order's fields; later rows
+    only add items. A row without an ID continues the order above it. An
+    item is added when it has both a size and a quantity and its size_key
+    has not been seen for that order yet, which is a set lookup rather
+    than a scan of the items already collected.
+    """
+
+    def __init__(self, size_key=exact_size_key):
+        self.orders = {}
+        self.size_key = size_key
+        self._seen_sizes = {}
+
+    def start_order(self, order_id, fields, source_tab=None):
+        order = self.orders.get(order_id)
+        if order is None:
+            order = self.orders[order_id] = Order(order_id, fields, source_tab)
+            self._seen_sizes[order_id] = set()
+        return order
+
+    def add_item(self, order_id, size, qty):
+        if not (size and qty):
+            return
+        key = self.size_key(size)
+        seen = self._seen_sizes[order_id]
+        if key not in seen:
+            seen.add(key)
+            self.orders[order_id].items.append(Item(size, qty))
+
+    def add_orders(self, orders):
+        """Add getOrdersFromSheet order dicts (one per row with an ID)"""
+        for order in orders:
+            order_id = order.get('id', '')
+            if not order_id:
+                continue
+            self.start_order(order_id, order_fields(order))
+            self.add_item(order_id, order.get('sizes', ''), order.get('quantity', ''))
+
+    def add_raw_rows(self, rows, id_rows=True):
+        """Add raw sheet rows in sheet order, skipping header and empty rows.
+
+        With id_rows=False, rows with an ID only mark which order the
+        continuation rows below them belong to (use this when the ID rows
+        were already added through add_orders), and continuation rows of
+        unknown orders are dropped.
+        """
+        current_id = None
+        for row in rows:
+            if is_header_row(row):
+                continue
+            if len(row) != ROW_WIDTH:
+                row = padded_row(row)
+            row_id = row[ID_COL]
+            if row_id:
+                current_id = row_id
+                if not id_rows:
+                    continue
+                self.start_order(row_id, (row[CLIENT_COL], row[SPECS_COL], row[STATUS_COL], row[NOTES_COL],
+                                          row[CREATED_COL], row[UPDATED_COL]))
+            if current_id in self.orders:
+                self.add_item(current_id, row[SIZES_COL], row[QTY_COL])
+        return self.orders
+
+def group_tab_rows(rows):
+    """Orders of a tab from its raw rows, as listed by /pending, /ready, ... (sizes compared case-insensitively)"""
+    return OrderGrouper(normalized_size_key).add_raw_rows(rows)
+
+def group_search_rows(orders, rows):
+    """Orders of a tab for /search: fields from the order dicts, extra sizes from continuation rows"""
+    grouper = OrderGrouper()
+    grouper.add_orders(orders)
+    return grouper.add_raw_rows(rows, id_rows=False)
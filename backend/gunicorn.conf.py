@@ -0,0 +1,36 @@
+"""Production server settings: `gunicorn -c gunicorn.conf.py app:app`"""
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', os.environ.get('BACKEND_PORT', 5000))}"
+
+# Requests mostly wait on Apps Script, so each worker process runs a pool of threads
+workers = int(os.environ.get('GUNICORN_WORKERS', os.environ.get('WEB_CONCURRENCY', 2)))
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+
+# Import the app once in the master so workers fork with the modules already loaded
+preload_app = True
+
+# An Apps Script read can take READ_TIMEOUT seconds per attempt plus retries
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+# On SIGTERM, workers finish in-flight requests (and drain the order queue) within this window
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = 5
+
+# Caps on the request line and headers; body size is limited per route in app.py
+limit_request_line = 4094
+limit_request_fields = 50
+
+# Empty GUNICORN_ACCESS_LOG turns the access log off
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-') or None
+errorlog = '-'
+
+def post_fork(server, worker):
+    import app
+    import sheets
+    sheets.reset_after_fork()
+    app.start_background_workers()
+
+def worker_exit(server, worker):
+    import app
+    app.stop_background_workers()
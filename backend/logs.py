@@ -0,0 +1,162 @@
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+import uuid
+import zlib
+
+# Structured logging for the request path. Records are put on an in-memory
+# queue and written to stderr by a listener thread, so a request never waits
+# on log I/O; when the queue is full records are dropped and counted.
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json').lower()  # json or text
+LOG_REDACT = os.environ.get('LOG_REDACT', 'true').lower() in ('1', 'true', 'yes')
+LOG_DEBUG_SAMPLE_RATE = float(os.environ.get('LOG_DEBUG_SAMPLE_RATE', 0.1))
+LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))
+
+ROOT_LOGGER = 'glassbot'
+
+# Fields holding customer data; with LOG_REDACT only their size is logged
+REDACTED_FIELDS = {'body', 'message', 'order_info', 'client_name', 'rows', 'sizes', 'quantities', 'search_term', 'query'}
+# Fields identifying the sender; with LOG_REDACT only the last digits are kept
+MASKED_FIELDS = {'sender'}
+
+request_id_var = contextvars.ContextVar('request_id', default=None)
+
+def new_request_id(incoming=None):
+    """Use a sane incoming X-Request-ID or make a new one, and bind it to the current context"""
+    if incoming and len(incoming) <= 64 and incoming.replace('-', '').replace('_', '').isalnum():
+        request_id = incoming
+    else:
+        request_id = uuid.uuid4().hex[:16]
+    request_id_var.set(request_id)
+    return request_id
+
+def redact(name, value):
+    if not LOG_REDACT:
+        return value
+    if name in MASKED_FIELDS:
+        # WhatsApp IDs look like 971501234567@c.us; keep the last digits of the number
+        text = str(value).split('@')[0]
+        return '*' * max(len(text) - 4, 0) + text[-4:]
+    if name in REDACTED_FIELDS:
+        if isinstance(value, str):
+            return f'<redacted {len(value)} chars>'
+        if isinstance(value, (list, tuple, dict)):
+            return f'<redacted {len(value)} items>'
+        return '<redacted>'
+    return value
+
+class ContextFilter(logging.Filter):
+    """Adds the request ID, redacts customer data and samples DEBUG records"""
+
+    def filter(self, record):
+        record.request_id = getattr(record, 'request_id', None) or request_id_var.get()
+        if record.levelno <= logging.DEBUG and LOG_DEBUG_SAMPLE_RATE < 1:
+            # Sample whole requests rather than single lines, so a sampled request is complete
+            if record.request_id:
+                sampled = zlib.crc32(record.request_id.encode()) % 10000 < LOG_DEBUG_SAMPLE_RATE * 10000
+            else:
+                sampled = random.random() < LOG_DEBUG_SAMPLE_RATE
+            if not sampled:
+                return False
+        fields = getattr(record, 'fields', None) or {}
+        record.fields = {name: redact(name, value) for name, value in fields.items()}
+        return True
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f'.{int(record.msecs):03d}Z',
+            'level': record.levelname.lower(),
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        if record.request_id:
+            entry['request_id'] = record.request_id
+        entry.update(record.fields)
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        fields = ' '.join(f'{name}={value}' for name, value in record.fields.items())
+        request = f' [{record.request_id}]' if record.request_id else ''
+        line = f'{self.formatTime(record)} {record.levelname:<7} {record.name}{request} {record.getMessage()} {fields}'.rstrip()
+        if record.exc_info:
+            line += '\n' + self.formatException(record.exc_info)
+        return line
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records instead of blocking or erroring when the queue is full"""
+
+    dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DroppingQueueHandler.dropped += 1
+
+    def prepare(self, record):
+        # Format in the listener thread, not on the request path
+        return record
+
+class StructuredLogger(logging.LoggerAdapter):
+    """logger.info('Order queued', order_id=order_id) logs order_id as a field"""
+
+    RESERVED = {'exc_info', 'stack_info', 'stacklevel', 'extra'}
+
+    def process(self, msg, kwargs):
+        fields = {name: kwargs.pop(name) for name in list(kwargs) if name not in self.RESERVED}
+        extra = dict(kwargs.pop('extra', None) or {})
+        extra['fields'] = {**extra.get('fields', {}), **fields}
+        kwargs['extra'] = extra
+        return msg, kwargs
+
+def get_logger(name):
+    return StructuredLogger(logging.getLogger(f'{ROOT_LOGGER}.{name}'), {})
+
+_listener = None
+_configured_pid = None
+_configure_lock = threading.Lock()
+
+def configure_logging():
+    """Install the queue handler for this process (call again in a forked worker)"""
+    global _listener, _configured_pid
+    with _configure_lock:
+        if _configured_pid == os.getpid():
+            return
+        root = logging.getLogger(ROOT_LOGGER)
+        for handler in list(root.handlers):
+            if isinstance(handler, DroppingQueueHandler):
+                root.removeHandler(handler)
+        # The parent's listener thread did not survive the fork; its queue is abandoned
+
+        records = queue.Queue(LOG_QUEUE_SIZE)
+        output = logging.StreamHandler(sys.stderr)
+        output.setFormatter(TextFormatter() if LOG_FORMAT == 'text' else JsonFormatter())
+        _listener = logging.handlers.QueueListener(records, output)
+        _listener.start()
+
+        handler = DroppingQueueHandler(records)
+        handler.addFilter(ContextFilter())
+        root.addHandler(handler)
+        root.setLevel(LOG_LEVEL)
+        root.propagate = False
+        _configured_pid = os.getpid()
+
+def flush_logging():
+    """Write out queued records (at exit)"""
+    if _listener and _configured_pid == os.getpid():
+        _listener.stop()
+
+atexit.register(flush_logging)
@@ -0,0 +1,132 @@
+import hashlib
+import os
+import sqlite3
+import time
+
+# Replies to messages that write to the sheet (new orders, /update), so a
+# message the bot retries or WhatsApp redelivers is answered from here
+# instead of being applied twice. Kept in SQLite so every worker process
+# sees the same keys.
+DEDUPE_ENABLED = os.environ.get('DEDUPE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+DEDUPE_PATH = os.environ.get('DEDUPE_PATH', 'message_dedupe.db')
+# How long a message ID is remembered
+DEDUPE_WINDOW = float(os.environ.get('DEDUPE_WINDOW', 24 * 3600))
+# Without a message ID the key is the sender and text, and the same order
+# sent again later is a new order; so these keys are kept for a short time only
+DEDUPE_CONTENT_WINDOW = float(os.environ.get('DEDUPE_CONTENT_WINDOW', 300))
+DEDUPE_MAX_ENTRIES = int(os.environ.get('DEDUPE_MAX_ENTRIES', 10000))
+# A duplicate arriving while the first copy is still being handled waits this long for its reply
+DEDUPE_WAIT = float(os.environ.get('DEDUPE_WAIT', 10))
+# A claim older than this with no reply is from a worker that died mid-message; it can be retaken
+DEDUPE_CLAIM_TIMEOUT = float(os.environ.get('DEDUPE_CLAIM_TIMEOUT', 120))
+
+DUPLICATE_IN_PROGRESS_REPLY = '⏳ This message is already being processed. You will get the reply shortly.'
+
+class WriteFailed(Exception):
+    """Raised by a message handler whose sheet write failed; reply is sent, and the message is not remembered"""
+
+    def __init__(self, reply):
+        super().__init__(reply)
+        self.reply = reply
+
+def message_key(sender, body, message_id=None, by_content=True):
+    """(key, window): the message ID if the bot sent one, else a hash of sender and whitespace-normalized text.
+
+    With by_content=False a message without an ID gets None (not deduped):
+    for commands such as /update, where the same text sent again on purpose
+    must run again.
+    """
+    if message_id:
+        return f'id:{sender}:{message_id}', DEDUPE_WINDOW
+    if not by_content:
+        return None
+    normalized = ' '.join(body.split()).lower()
+    digest = hashlib.sha256(f'{sender}\0{normalized}'.encode('utf-8')).hexdigest()
+    return f'body:{digest}', DEDUPE_CONTENT_WINDOW
+
+class MessageDedupe:
+    """Claim / complete / release store for at-most-once message handling.
+
+    claim() is atomic across threads and processes: exactly one caller gets
+    a key until its reply is stored with complete() (later callers get that
+    reply) or it gives the key back with release() after a failure. A
+    connection is opened per call, as in PageCursors.
+    """
+
+    def __init__(self, path=DEDUPE_PATH, max_entries=DEDUPE_MAX_ENTRIES, wait=DEDUPE_WAIT,
+                 claim_timeout=DEDUPE_CLAIM_TIMEOUT):
+        self.path = path
+        self.max_entries = max_entries
+        self.wait = wait
+        self.claim_timeout = claim_timeout
+        self._schema_ready = False
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=5)
+        if not self._schema_ready:
+            with db:
+                db.execute('CREATE TABLE IF NOT EXISTS handled_messages (key TEXT PRIMARY KEY, reply TEXT, '
+                           'claimed_at REAL, expires_at REAL)')
+                db.execute('CREATE INDEX IF NOT EXISTS handled_messages_expiry ON handled_messages (expires_at)')
+            self._schema_ready = True
+        return db
+
+    def _try_claim(self, key, window):
+        """(True, None) if claimed, (False, reply) if handled, (False, None) if another caller holds it"""
+        now = time.time()
+        db = self._connect()
+        try:
+            with db:
+                db.execute('DELETE FROM handled_messages WHERE expires_at < ?', (now,))
+                claimed = db.execute('INSERT OR IGNORE INTO handled_messages (key, reply, claimed_at, expires_at) '
+                                     'VALUES (?, NULL, ?, ?)', (key, now, now + window)).rowcount
+                if claimed:
+                    self._trim(db)
+                    return True, None
+                reply, claimed_at = db.execute('SELECT reply, claimed_at FROM handled_messages WHERE key = ?',
+                                               (key,)).fetchone()
+                if reply is None and now - claimed_at > self.claim_timeout:
+                    retaken = db.execute('UPDATE handled_messages SET claimed_at = ?, expires_at = ? '
+                                         'WHERE key = ? AND reply IS NULL AND claimed_at = ?',
+                                         (now, now + window, key, claimed_at)).rowcount
+                    return bool(retaken), None
+                return False, reply
+        finally:
+            db.close()
+
+    def _trim(self, db):
+        excess = db.execute('SELECT COUNT(*) FROM handled_messages').fetchone()[0] - self.max_entries
+        if excess > 0:
+            # Oldest finished messages first; claims in progress are kept
+            db.execute('DELETE FROM handled_messages WHERE key IN (SELECT key FROM handled_messages '
+                       'WHERE reply IS NOT NULL ORDER BY claimed_at LIMIT ?)', (excess,))
+
+    def claim(self, key, window=DEDUPE_WINDOW):
+        """(True, None) if the caller should handle the message, else (False, original reply).
+
+        The reply is None if the first copy is still being handled after
+        waiting up to self.wait seconds for it.
+        """
+        deadline = time.monotonic() + self.wait
+        while True:
+            claimed, reply = self._try_claim(key, window)
+            if claimed or reply is not None or time.monotonic() >= deadline:
+                return claimed, reply
+            time.sleep(0.1)
+
+    def complete(self, key, reply):
+        db = self._connect()
+        try:
+            with db:
+                db.execute('UPDATE handled_messages SET reply = ? WHERE key = ?', (reply, key))
+        finally:
+            db.close()
+
+    def release(self, key):
+        """Forget a claim whose handling failed, so a retry runs again"""
+        db = self._connect()
+        try:
+            with db:
+                db.execute('DELETE FROM handled_messages WHERE key = ? AND reply IS NULL', (key,))
+        finally:
+            db.close()
@@ -0,0 +1,191 @@
+import bisect
+import os
+import threading
+from contextlib import contextmanager
+
+# In-process metrics served as Prometheus text on /api/metrics. Each worker
+# process keeps its own numbers (no client library, no shared state).
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self._series = {}
+        self._lock = threading.Lock()
+        _metrics[name] = self
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.label_names)
+
+    def _labels(self, key):
+        return list(zip(self.label_names, key))
+
+    def samples(self):
+        """[(suffix, labels, value)] for the exposition"""
+        with self._lock:
+            return [('', self._labels(key), value) for key, value in sorted(self._series.items())]
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._series.get(self._key(labels), 0)
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._series[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels):
+        with self._lock:
+            return self._series.get(self._key(labels), 0)
+
+    @contextmanager
+    def track_in_progress(self, **labels):
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, label_names=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket counts (the last one is +Inf), then sum and count
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, **labels):
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            return series[2] if series else 0
+
+    def samples(self):
+        lines = []
+        with self._lock:
+            series_list = sorted((key, [list(series[0]), series[1], series[2]]) for key, series in self._series.items())
+        for key, (counts, total, count) in series_list:
+            labels = self._labels(key)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                lines.append(('_bucket', labels + [('le', _format_value(float(bound)))], cumulative))
+            lines.append(('_sum', labels, total))
+            lines.append(('_count', labels, count))
+        return lines
+
+_metrics = {}
+_collectors = {}
+
+def register_collector(name, collect):
+    """Add (or replace) a callable returning [(metric name, kind, help, [(labels dict, value)])] read at scrape time"""
+    _collectors[name] = collect
+
+def render_metrics():
+    """All metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in list(_metrics.values()):
+        lines.append(f'# HELP {metric.name} {metric.help}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        for suffix, labels, value in metric.samples():
+            lines.append(f'{metric.name}{suffix}{_format_labels(labels)} {_format_value(value)}')
+    for collect in list(_collectors.values()):
+        for name, kind, help_text, samples in collect():
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in samples:
+                lines.append(f'{name}{_format_labels(sorted(labels.items()))} {_format_value(value)}')
+    return '\n'.join(lines) + '\n'
+
+COMMAND_LATENCY = Histogram('glassbot_command_duration_seconds',
+                            'Time to answer a WhatsApp message, by command action (order for order messages)', ['action'])
+COMMAND_ERRORS = Counter('glassbot_command_errors_total', 'WhatsApp messages whose handler raised, by action',
+                         ['action'])
+APPS_SCRIPT_LATENCY = Histogram('glassbot_apps_script_duration_seconds',
+                                'Apps Script call time by action, including retries', ['action'])
+APPS_SCRIPT_ERRORS = Counter('glassbot_apps_script_errors_total',
+                             'Failed Apps Script calls by action and kind (transport, http, script)', ['action', 'kind'])
+APPS_SCRIPT_IN_FLIGHT = Gauge('glassbot_apps_script_in_flight', 'Apps Script calls currently waiting on a response')
+REQUESTS_IN_FLIGHT = Gauge('glassbot_requests_in_flight', 'HTTP requests currently being handled, by route', ['route'])
+APPS_SCRIPT_PROBE_SECONDS = Gauge('glassbot_apps_script_probe_seconds',
+                                  'Round trip of the last readiness probe to Apps Script')
+APPS_SCRIPT_UP = Gauge('glassbot_apps_script_up', '1 if the last readiness probe reached Apps Script, else 0')
+SHEET_READS_COALESCED = Counter('glassbot_sheet_reads_coalesced_total',
+                                'Tab reads answered by another request\'s in-flight Apps Script call instead of a new one')
+RATE_LIMITED = Counter('glassbot_rate_limited_total', 'Read commands refused by the per-sender rate limit, by action',
+                       ['action'])
+MESSAGE_DUPLICATES = Counter('glassbot_duplicate_messages_total',
+                             'Repeated messages answered from the dedupe store, by key kind (id, body)', ['kind'])
+APPS_SCRIPT_IN_FLIGHT.set(0)
+
+def _process_samples():
+    return [
+        ('glassbot_worker_info', 'gauge', 'Process ID of the worker that answered this scrape',
+         [({'pid': os.getpid()}, 1)]),
+    ]
+
+register_collector('process', _process_samples)
+
+def app_samples(pattern_hits, queue_status=None):
+    """Scrape-time samples from the request path: extraction pattern hits and the order queue backlog"""
+    samples = [('glassbot_extraction_pattern_hits_total', 'counter', 'Order messages by the size/quantity format that matched',
+                [({'pattern': pattern}, hits) for pattern, hits in pattern_hits.items()])]
+    if queue_status:
+        samples.append(('glassbot_order_queue_backlog', 'gauge', 'Orders journaled but not yet synced to the sheet',
+                        [({}, queue_status['backlog'])]))
+        samples.append(('glassbot_order_queue_oldest_unsynced_seconds', 'gauge', 'Age of the oldest unsynced order',
+                        [({}, queue_status['oldest_unsynced_age'])]))
+    return samples
+
+def route_label(path, known_routes):
+    """Route label for a request path; unknown paths share one label so 404 scans cannot add series"""
+    return path if path in known_routes else 'other'
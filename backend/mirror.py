@@ -0,0 +1,214 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+# Local SQLite copy of the order tabs, kept in sync with the sheet and used
+# to answer reads without downloading whole tabs from Apps Script.
+MIRROR_ENABLED = os.environ.get('SHEETS_MIRROR_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+MIRROR_PATH = os.environ.get('SHEETS_MIRROR_PATH', 'sheets_mirror.db')
+MIRROR_MAX_STALENESS = float(os.environ.get('SHEETS_MIRROR_MAX_STALENESS', 60))
+
+# Order dict keys for each column, as returned by getOrdersFromSheet
+ORDER_KEYS = {
+    'ID': 'id', 'Client Name': 'clientName', 'Specifications': 'specifications',
+    'Sizes': 'sizes', 'Quantity': 'quantity', 'Status': 'status', 'Notes': 'notes',
+    'Created At': 'createdAt', 'Updated At': 'updatedAt', 'Sync Status': 'syncStatus',
+}
+
+# Forms a hand edit in the sheet can leave in 'Updated At' (the bot writes '%Y-%m-%d %H:%M:%S')
+SLASH_DATE_FORMATS = ('%m/%d/%Y %H:%M:%S', '%m/%d/%Y %H:%M', '%m/%d/%Y',
+                      '%d/%m/%Y %H:%M:%S', '%d/%m/%Y %H:%M', '%d/%m/%Y')
+WATERMARK_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+def parse_timestamp(value):
+    """Naive datetime for an 'Updated At' value, or None if it is not a date.
+
+    ISO values (UTC if they carry an offset) and M/D/YYYY or D/M/YYYY dates
+    are read; a slash date that reads both ways takes the earlier reading,
+    so a watermark built from it can lag (and re-fetch rows) but never skip.
+    """
+    value = value.strip()
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        readings = []
+        for date_format in SLASH_DATE_FORMATS:
+            try:
+                readings.append(datetime.strptime(value, date_format))
+            except ValueError:
+                pass
+        return min(readings, default=None)
+    if parsed.tzinfo:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def row_hash(values):
+    return hashlib.sha1(json.dumps(values, default=str).encode('utf-8')).hexdigest()
+
+class SheetMirror:
+    """SQLite mirror of the order tabs, one table row per sheet row.
+
+    fetch(tab, since) must return the Apps Script getRawSheetData result for
+    the tab. If it contains 'changedRows' and 'rowCount' it is applied as a
+    delta (see APPS-SCRIPT-API.md); otherwise 'data' is treated as the full
+    tab and diffed against stored row hashes so only changed rows are
+    written. A tab is re-synced when its last sync is older than
+    max_staleness seconds or after mark_stale().
+    """
+
+    def __init__(self, path, columns, fetch, max_staleness=MIRROR_MAX_STALENESS):
+        self.columns = list(columns)
+        self.fetch = fetch
+        self.max_staleness = max_staleness
+        self.path = path
+        self._views = {}  # (kind, tab) -> (version, rows) so unchanged tabs return the same list
+        self._connect()
+
+    def _connect(self):
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db_lock = threading.Lock()
+        self._tab_locks = {}
+        self._create_schema()
+
+    def reopen(self):
+        """Open a fresh connection in a forked worker (SQLite connections must not cross a fork)"""
+        self._connect()
+
+    def _create_schema(self):
+        column_defs = ', '.join(f'"{column}" TEXT' for column in self.columns)
+        with self._db_lock, self._db:
+            self._db.execute(
+                f'CREATE TABLE IF NOT EXISTS sheet_rows (tab TEXT, row_num INTEGER, {column_defs}, '
+                'row_hash TEXT, PRIMARY KEY (tab, row_num))'
+            )
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS sync_state (tab TEXT PRIMARY KEY, synced_at REAL, '
+                'watermark TEXT, row_count INTEGER, version INTEGER DEFAULT 0, stale INTEGER DEFAULT 0)'
+            )
+
+    def _tab_lock(self, tab):
+        with self._db_lock:
+            return self._tab_locks.setdefault(tab, threading.Lock())
+
+    def _state(self, tab):
+        with self._db_lock:
+            row = self._db.execute(
+                'SELECT synced_at, watermark, row_count, version, stale FROM sync_state WHERE tab = ?', (tab,)
+            ).fetchone()
+        return row or (None, None, 0, 0, 1)
+
+    def mark_stale(self, tab):
+        """Force the next read of tab to sync first (after a local write)"""
+        with self._db_lock, self._db:
+            self._db.execute('UPDATE sync_state SET stale = 1 WHERE tab = ?', (tab,))
+
+    def _normalize(self, row):
+        values = ['' if value is None else str(value) for value in list(row)[:len(self.columns)]]
+        return values + [''] * (len(self.columns) - len(values))
+
+    def _watermark(self, rows, previous):
+        try:
+            updated_index = self.columns.index('Updated At')
+        except ValueError:
+            return previous
+        # Compared as dates: the text of hand-edited cells ('3/7/2025 9:05') does not sort
+        stamps = [parse_timestamp(value) for value in [row[updated_index] for row in rows] + [previous] if value]
+        newest = max((stamp for stamp in stamps if stamp), default=None)
+        return newest.strftime(WATERMARK_FORMAT) if newest else previous
+
+    def sync(self, tab):
+        """Bring the mirrored tab up to date; returns the number of rows written"""
+        _, watermark, row_count, _, _ = self._state(tab)
+        result = self.fetch(tab, watermark)
+        placeholders = ', '.join('?' for _ in self.columns)
+        quoted = ', '.join(f'"{column}"' for column in self.columns)
+
+        if 'changedRows' in result and 'rowCount' in result:
+            # Delta: only rows whose content or position changed since the watermark
+            changed = {int(entry['row']): self._normalize(entry['values']) for entry in result['changedRows']}
+            new_count = int(result['rowCount'])
+        else:
+            rows = [self._normalize(row) for row in result.get('data', [])]
+            if rows and rows[0][0] in ('ID', 'id'):
+                rows = rows[1:]
+            with self._db_lock:
+                stored = dict(self._db.execute(
+                    'SELECT row_num, row_hash FROM sheet_rows WHERE tab = ?', (tab,)
+                ).fetchall())
+            changed = {num: row for num, row in enumerate(rows, start=1) if stored.get(num) != row_hash(row)}
+            new_count = len(rows)
+
+        with self._db_lock, self._db:
+            self._db.executemany(
+                f'INSERT OR REPLACE INTO sheet_rows (tab, row_num, {quoted}, row_hash) VALUES (?, ?, {placeholders}, ?)',
+                [(tab, num, *row, row_hash(row)) for num, row in changed.items()]
+            )
+            self._db.execute('DELETE FROM sheet_rows WHERE tab = ? AND row_num > ?', (tab, new_count))
+            self._db.execute(
+                'INSERT INTO sync_state (tab, synced_at, watermark, row_count, version, stale) VALUES (?, ?, ?, ?, 1, 0) '
+                'ON CONFLICT(tab) DO UPDATE SET synced_at = excluded.synced_at, watermark = excluded.watermark, '
+                'row_count = excluded.row_count, stale = 0, '
+                'version = version + (CASE WHEN ? THEN 1 ELSE 0 END)',
+                (tab, time.time(), self._watermark(list(changed.values()), watermark), new_count,
+                 bool(changed) or new_count != row_count)
+            )
+        return len(changed)
+
+    def ensure_fresh(self, tab):
+        """Sync tab if it is older than the staleness bound; returns its version"""
+        synced_at, _, _, version, stale = self._state(tab)
+        if synced_at is not None and not stale and time.time() - synced_at <= self.max_staleness:
+            return version
+        with self._tab_lock(tab):
+            # Another thread may have synced while we waited for the lock
+            synced_at, _, _, version, stale = self._state(tab)
+            if synced_at is None or stale or time.time() - synced_at > self.max_staleness:
+                self.sync(tab)
+                version = self._state(tab)[3]
+        return version
+
+    def raw_rows(self, tab):
+        """Rows in sheet order with the header row first, like getRawSheetData"""
+        version = self.ensure_fresh(tab)
+        cached = self._views.get(('raw', tab))
+        if cached and cached[0] == version:
+            return cached[1]
+        quoted = ', '.join(f'"{column}"' for column in self.columns)
+        with self._db_lock:
+            rows = self._db.execute(
+                f'SELECT {quoted} FROM sheet_rows WHERE tab = ? ORDER BY row_num', (tab,)
+            ).fetchall()
+        value = [list(self.columns)] + [list(row) for row in rows]
+        self._views[('raw', tab)] = (version, value)
+        return value
+
+    def orders(self, tab):
+        """Rows that carry an order ID as order dicts, like getOrdersFromSheet"""
+        version = self.ensure_fresh(tab)
+        cached = self._views.get(('orders', tab))
+        if cached and cached[0] == version:
+            return cached[1]
+        keys = [ORDER_KEYS.get(column, column) for column in self.columns]
+        value = [dict(zip(keys, row)) for row in self.raw_rows(tab)[1:] if row[0]]
+        self._views[('orders', tab)] = (version, value)
+        return value
+
+    def tabs_containing(self, order_id):
+        with self._db_lock:
+            rows = self._db.execute(
+                f'SELECT DISTINCT tab FROM sheet_rows WHERE "{self.columns[0]}" = ?', (str(order_id).strip(),)
+            ).fetchall()
+        return {tab for (tab,) in rows}
+
+    def status(self):
+        """Per synced tab: when it was last synced, its row count, version and whether it is marked stale"""
+        with self._db_lock:
+            rows = self._db.execute('SELECT tab, synced_at, row_count, version, stale FROM sync_state').fetchall()
+        return {
+            tab: {'synced_at': synced_at, 'rows': row_count, 'version': version, 'stale': bool(stale)}
+            for tab, synced_at, row_count, version, stale in rows
+        }
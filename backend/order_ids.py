@@ -0,0 +1,102 @@
+import logging
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Order IDs come from a counter file shared by every worker process (under an
+# exclusive file lock) and kept across restarts, so no two orders get the same
+# ID and no Apps Script round trip is needed. IDs start at 1000000 (plus the
+# time floor below), above the 6-digit random IDs older orders have. ORDER_ID_PATH must be on
+# storage that survives redeploys (a mounted volume in containers).
+ORDER_ID_PATH = os.environ.get('ORDER_ID_PATH', 'order_ids.counter')
+ORDER_ID_START = int(os.environ.get('ORDER_ID_START', 1000000))
+# The counter never falls below ORDER_ID_START plus the number of
+# ORDER_ID_FLOOR_UNIT seconds (default: minutes) since this Unix time
+# (2025-01-01), so a lost counter file resumes past every ID already issued
+# unless orders have averaged more than one per unit. With minutes, IDs stay
+# 7 digits until about 2042. Empty ORDER_ID_EPOCH = no floor.
+ORDER_ID_EPOCH = os.environ.get('ORDER_ID_EPOCH', '1735689600')
+ORDER_ID_FLOOR_UNIT = float(os.environ.get('ORDER_ID_FLOOR_UNIT', 60))
+# Set to a digit (0-9) per host when several hosts add orders; it is appended to every ID
+ORDER_ID_SHARD = os.environ.get('ORDER_ID_SHARD', '')
+
+# Stdlib logger so this module stays importable on its own, as in extraction.py
+logger = logging.getLogger('glassbot.order_ids')
+
+def _lock(handle):
+    """Block until this process holds an exclusive lock on handle"""
+    if fcntl:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+    else:
+        handle.seek(0)
+        msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+
+def _unlock(handle):
+    if fcntl:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+    else:
+        handle.seek(0)
+        msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+
+class OrderIdAllocator:
+    """Monotonic, collision-free order IDs from a persisted counter.
+
+    The counter file holds the next ID. It is replaced atomically (write a
+    temp file, fsync, rename) while the '.lock' file next to it is held, so
+    a crash never loses or repeats an ID.
+    """
+
+    def __init__(self, path=ORDER_ID_PATH, start=ORDER_ID_START, shard=ORDER_ID_SHARD, epoch=ORDER_ID_EPOCH,
+                 floor_unit=ORDER_ID_FLOOR_UNIT):
+        if shard and not (len(shard) == 1 and shard.isdigit()):
+            raise ValueError(f'ORDER_ID_SHARD must be a single digit, got {shard!r}')
+        self.path = path
+        self.start = start
+        self.shard = shard
+        self.epoch = int(epoch) if epoch not in (None, '') else None
+        self.floor_unit = floor_unit
+        self._lock = threading.Lock()
+
+    def floor(self):
+        """Lowest next ID: start, plus the floor units elapsed since epoch when it is set"""
+        if self.epoch is None:
+            return self.start
+        return self.start + max(int((time.time() - self.epoch) // self.floor_unit), 0)
+
+    def _read(self):
+        floor = self.floor()
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return max(int(f.read().strip()), floor)
+        except FileNotFoundError:
+            # Expected once; seen again, the file is not on persistent storage and only the time floor keeps IDs unique
+            logger.warning("Order ID counter not found, starting a new one", extra={'fields': {'path': self.path, 'start': floor}})
+            return floor
+
+    def _write(self, value):
+        tmp_path = f'{self.path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(f'{value}\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def allocate(self, count=1):
+        """count new order IDs (strings), in increasing order"""
+        with self._lock, open(self.path + '.lock', 'a+') as lock_file:
+            _lock(lock_file)
+            try:
+                first = self._read()
+                self._write(first + count)
+            finally:
+                _unlock(lock_file)
+        return [f'{number}{self.shard}' for number in range(first, first + count)]
+
+    def next_id(self):
+        return self.allocate()[0]
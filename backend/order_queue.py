@@ -0,0 +1,352 @@
+import json
+import os
+import threading
+import time
+
+from logs import get_logger
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Write-behind order intake: orders are journaled locally, acknowledged to the
+# sender straight away and flushed to Google Sheets by a background worker.
+ORDER_QUEUE_ENABLED = os.environ.get('ORDER_QUEUE_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+ORDER_QUEUE_DIR = os.environ.get('ORDER_QUEUE_DIR', 'order_journal')
+ORDER_QUEUE_BATCH_SIZE = int(os.environ.get('ORDER_QUEUE_BATCH_SIZE', 25))
+ORDER_QUEUE_FLUSH_INTERVAL = float(os.environ.get('ORDER_QUEUE_FLUSH_INTERVAL', 2))
+ORDER_QUEUE_RETRY_DELAY = float(os.environ.get('ORDER_QUEUE_RETRY_DELAY', 15))
+ORDER_QUEUE_DRAIN_TIMEOUT = float(os.environ.get('ORDER_QUEUE_DRAIN_TIMEOUT', 10))
+# An order that fails to sync on its own this many times, while orders next to
+# it sync fine, is moved to the dead-letter file so it stops holding up the queue
+ORDER_QUEUE_MAX_FAILURES = int(os.environ.get('ORDER_QUEUE_MAX_FAILURES', 3))
+DEAD_LETTER_FILE = 'dead-letter.jsonl'
+
+logger = get_logger('order_queue')
+
+def _try_lock(handle):
+    """Take an exclusive, non-blocking lock on an open file; False if another process holds it"""
+    try:
+        if fcntl:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+class OrderJournal:
+    """Append-only JSON-lines journal of queued orders.
+
+    Each queued order is an 'add' record; a successful sync appends an 'ack'
+    record for its sequence numbers. Replaying the file therefore yields the
+    orders that were accepted but not yet confirmed by Google Sheets. The
+    journal is rewritten (compacted) once acknowledged records outnumber the
+    pending ones, so it stays small under a steady backlog.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.pending = {}  # seq -> entry, in insertion order
+        self.acked = 0  # 'add' records in the file that are acknowledged
+        self._next_seq = 1
+        self._replay()
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def _replay(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A crash mid-write can leave a torn last line; the order it held was never acknowledged
+                    continue
+                if record.get('op') == 'add':
+                    self.pending[record['seq']] = record
+                    self._next_seq = max(self._next_seq, record['seq'] + 1)
+                elif record.get('op') == 'ack':
+                    for seq in record.get('seqs', []):
+                        if self.pending.pop(seq, None):
+                            self.acked += 1
+
+    def _write(self, record):
+        self._file.write(json.dumps(record) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def append(self, order_id, rows, queued_at=None):
+        record = {
+            'op': 'add',
+            'seq': self._next_seq,
+            'order_id': order_id,
+            'rows': rows,
+            'queued_at': queued_at or time.time(),
+        }
+        self._next_seq += 1
+        self._write(record)
+        self.pending[record['seq']] = record
+        return record
+
+    def ack(self, seqs):
+        self._write({'op': 'ack', 'seqs': list(seqs)})
+        for seq in seqs:
+            if self.pending.pop(seq, None):
+                self.acked += 1
+        if self.acked > len(self.pending):
+            self.compact()
+
+    def compact(self):
+        """Rewrite the journal with only the unacknowledged records"""
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for record in self.pending.values():
+                f.write(json.dumps(record) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self._file.close()
+        os.replace(tmp_path, self.path)
+        self._file = open(self.path, 'a', encoding='utf-8')
+        self.acked = 0
+
+    def close(self):
+        self._file.close()
+
+class WriteBehindQueue:
+    """Flushes journaled orders to Sheets in batches from a background thread.
+
+    Delivery is at-least-once: records are acknowledged only after
+    sync_func returns, so a crash between the sync and the ack replays the
+    batch on restart. A batch the script rejects is split in halves down to
+    single orders, so one order Sheets keeps rejecting does not hold up the
+    ones queued after it; after max_failures such rejections it is moved to
+    the dead-letter file in directory. Network and HTTP errors, or every
+    order failing, mean Apps Script is down: nothing is split or
+    dead-lettered and the flush is retried later.
+    """
+
+    def __init__(self, directory, sync_func, batch_size=ORDER_QUEUE_BATCH_SIZE,
+                 flush_interval=ORDER_QUEUE_FLUSH_INTERVAL, retry_delay=ORDER_QUEUE_RETRY_DELAY,
+                 max_failures=ORDER_QUEUE_MAX_FAILURES):
+        self.directory = directory
+        self.sync_func = sync_func
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retry_delay = retry_delay
+        self.max_failures = max_failures
+        self.journal = None
+        self.synced_total = 0
+        self.dead_lettered_total = 0
+        self._failures = {}  # seq -> times the order failed on its own
+        self.last_error = None
+        self.last_flush_at = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = False
+        self._thread = None
+
+    def _claim_journal(self):
+        """Lock the first free journal slot so each worker process owns its own file"""
+        os.makedirs(self.directory, exist_ok=True)
+        slot = 0
+        while True:
+            lock_file = open(os.path.join(self.directory, f'journal-{slot}.lock'), 'a+')
+            if _try_lock(lock_file):
+                self._lock_file = lock_file
+                return OrderJournal(os.path.join(self.directory, f'journal-{slot}.jsonl'))
+            lock_file.close()
+            slot += 1
+
+    def _adopt_orphans(self):
+        """Take over unacknowledged orders left in journals no running process owns"""
+        for name in sorted(os.listdir(self.directory)):
+            if not name.endswith('.jsonl'):
+                continue
+            path = os.path.join(self.directory, name)
+            if path == self.journal.path:
+                continue
+            lock_file = open(path[:-len('.jsonl')] + '.lock', 'a+')
+            try:
+                if not _try_lock(lock_file):
+                    continue
+                orphan = OrderJournal(path)
+                for record in orphan.pending.values():
+                    self.journal.append(record['order_id'], record['rows'], record['queued_at'])
+                orphan.close()
+                os.remove(path)
+            finally:
+                lock_file.close()
+
+    def start(self):
+        with self._lock:
+            if self._thread:
+                return
+            self.journal = self._claim_journal()
+            self._adopt_orphans()
+            if self.journal.pending:
+                logger.info("Replaying unsynced orders", count=len(self.journal.pending), journal=self.journal.path)
+            self._thread = threading.Thread(target=self._run, name='order-queue', daemon=True)
+            self._thread.start()
+
+    def enqueue(self, order_id, rows):
+        """Durably record an order; it is synced to Sheets in the background"""
+        with self._lock:
+            self.journal.append(order_id, rows)
+        self._wakeup.set()
+
+    def enqueue_many(self, orders):
+        """enqueue for several (order_id, rows); they are journaled together so one sync picks them all up"""
+        with self._lock:
+            for order_id, rows in orders:
+                self.journal.append(order_id, rows)
+        self._wakeup.set()
+
+    def _next_batch(self):
+        with self._lock:
+            batch = []
+            for record in self.journal.pending.values():
+                if len(batch) >= self.batch_size:
+                    break
+                batch.append(record)
+            return batch
+
+    def _sync(self, batch):
+        self.sync_func([row for record in batch for row in record['rows']])
+
+    def _sync_split(self, batch, synced, failed):
+        """Sync the halves of a batch that failed as a whole, splitting them down to single orders.
+
+        Appends what synced to synced and (record, error) for orders that
+        failed on their own to failed. An OSError (network or HTTP error:
+        Apps Script itself is failing) stops the split and is raised.
+        """
+        middle = len(batch) // 2
+        for half in (batch[:middle], batch[middle:]):
+            try:
+                self._sync(half)
+            except OSError:
+                raise
+            except Exception as e:
+                if len(half) == 1:
+                    failed.append((half[0], e))
+                else:
+                    self._sync_split(half, synced, failed)
+            else:
+                synced += half
+
+    def flush_once(self):
+        """Sync one batch; returns True if something was synced"""
+        batch = self._next_batch()
+        if not batch:
+            return False
+        try:
+            self._sync(batch)
+        except Exception as e:
+            if len(batch) == 1 or isinstance(e, OSError):
+                raise
+            synced, failed = [], []
+            try:
+                self._sync_split(batch, synced, failed)
+            finally:
+                self._acknowledge(synced, failed)
+            if not synced:
+                # Every order failed: the script is failing, not one bad order
+                raise failed[-1][1]
+            self._dead_letter_failing(failed)
+        else:
+            self._acknowledge(batch, [])
+        return True
+
+    def _acknowledge(self, synced, failed):
+        with self._lock:
+            self.journal.ack([record['seq'] for record in synced])
+            for record in synced:
+                self._failures.pop(record['seq'], None)
+            self.synced_total += len(synced)
+            if synced:
+                self.last_flush_at = time.time()
+            self.last_error = str(failed[-1][1]) if failed else None
+
+    def _dead_letter_failing(self, failed):
+        """Count failures of orders rejected while others synced; move the ones that reached max_failures aside"""
+        dead = []
+        for record, error in failed:
+            failures = self._failures.get(record['seq'], 0) + 1
+            self._failures[record['seq']] = failures
+            logger.warning("Queued order failed to sync on its own", order_id=record['order_id'],
+                           failures=failures, error=str(error))
+            if failures >= self.max_failures:
+                dead.append((record, error))
+        if not dead:
+            return
+        with open(os.path.join(self.directory, DEAD_LETTER_FILE), 'a', encoding='utf-8') as f:
+            for record, error in dead:
+                f.write(json.dumps(dict(record, error=str(error), failed_at=time.time())) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        with self._lock:
+            self.journal.ack([record['seq'] for record, _ in dead])
+            for record, _ in dead:
+                self._failures.pop(record['seq'], None)
+            self.dead_lettered_total += len(dead)
+        for record, error in dead:
+            logger.error("Queued order moved to the dead-letter file", order_id=record['order_id'],
+                         path=os.path.join(self.directory, DEAD_LETTER_FILE), error=str(error))
+
+    def _run(self):
+        while not self._stopping:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                while self.flush_once():
+                    pass
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error("Order queue flush failed", retry_in=self.retry_delay, error=str(e))
+                # stop() may have set the wakeup before it was cleared above
+                if not self._stopping:
+                    self._wakeup.wait(self.retry_delay)
+        # Shutting down: one last attempt to sync what is left
+        try:
+            while self.flush_once():
+                pass
+        except Exception as e:
+            self.last_error = str(e)
+            logger.error("Order queue final flush failed", error=str(e))
+
+    def stop(self, timeout=ORDER_QUEUE_DRAIN_TIMEOUT):
+        """Drain the backlog and stop the worker; returns the number of orders left unsynced.
+
+        Orders that could not be synced within timeout stay in the journal
+        and are replayed by the next process that claims it.
+        """
+        with self._lock:
+            thread = self._thread
+        if not thread:
+            return 0
+        self._stopping = True
+        self._wakeup.set()
+        thread.join(timeout)
+        with self._lock:
+            left = len(self.journal.pending)
+        if left:
+            logger.warning("Order queue stopped with unsynced orders", count=left, journal=self.journal.path)
+        return left
+
+    def status(self):
+        with self._lock:
+            pending = list(self.journal.pending.values()) if self.journal else []
+        oldest = min((record['queued_at'] for record in pending), default=None)
+        return {
+            'enabled': True,
+            'backlog': len(pending),
+            'oldest_unsynced_age': round(time.time() - oldest, 3) if oldest else 0,
+            'synced_total': self.synced_total,
+            'dead_lettered_total': self.dead_lettered_total,
+            'last_flush_at': self.last_flush_at,
+            'last_error': self.last_error,
+        }
@@ -0,0 +1,71 @@
+import os
+import sqlite3
+import time
+
+# Page each sender last viewed per tab, so '/pending next' continues where they left off.
+# Kept in SQLite so every worker process sees the same cursor.
+PAGE_CURSOR_PATH = os.environ.get('PAGE_CURSOR_PATH', 'page_cursors.db')
+PAGE_CURSOR_TTL = float(os.environ.get('PAGE_CURSOR_TTL', 1800))
+
+class PageCursors:
+    """Per-sender, per-tab page cursors that expire after ttl seconds.
+
+    A connection is opened per call, so the store is safe to use from any
+    thread and from forked worker processes.
+    """
+
+    def __init__(self, path=PAGE_CURSOR_PATH, ttl=PAGE_CURSOR_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._schema_ready = False
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=5)
+        if not self._schema_ready:
+            # Created on first use so requests without a sender never touch the disk
+            with db:
+                db.execute('CREATE TABLE IF NOT EXISTS page_cursors (sender TEXT, tab TEXT, page INTEGER, '
+                           'updated_at REAL, PRIMARY KEY (sender, tab))')
+            self._schema_ready = True
+        return db
+
+    def get(self, sender, tab):
+        """Last page the sender viewed in tab, or None"""
+        db = self._connect()
+        try:
+            row = db.execute('SELECT page, updated_at FROM page_cursors WHERE sender = ? AND tab = ?',
+                             (sender, tab)).fetchone()
+        finally:
+            db.close()
+        if not row or time.time() - row[1] > self.ttl:
+            return None
+        return row[0]
+
+    def set(self, sender, tab, page):
+        now = time.time()
+        db = self._connect()
+        try:
+            with db:
+                db.execute('INSERT OR REPLACE INTO page_cursors (sender, tab, page, updated_at) VALUES (?, ?, ?, ?)',
+                           (sender, tab, page, now))
+                db.execute('DELETE FROM page_cursors WHERE updated_at < ?', (now - self.ttl,))
+        finally:
+            db.close()
+
+    def resolve(self, sender, tab, page, total_pages):
+        """Page number for a request ('next', 'prev', a number or None) clamped to 1..total_pages.
+
+        The result becomes the sender's cursor for the tab.
+        """
+        if page in ('next', 'prev'):
+            current = self.get(sender, tab) if sender else None
+            if current is None:
+                number = 1
+            else:
+                number = current + 1 if page == 'next' else current - 1
+        else:
+            number = page or 1
+        number = max(1, min(number, total_pages))
+        if sender:
+            self.set(sender, tab, number)
+        return number
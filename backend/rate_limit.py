@@ -0,0 +1,47 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Per-sender token bucket for commands that read the sheet, so one person
+# repeating /pending cannot queue up Apps Script work for everyone else.
+# Each worker process keeps its own buckets.
+SENDER_RATE_LIMIT = float(os.environ.get('SENDER_RATE_LIMIT', 0.5))  # tokens per second; 0 turns limiting off
+SENDER_RATE_BURST = float(os.environ.get('SENDER_RATE_BURST', 5))
+SENDER_RATE_MAX_SENDERS = int(os.environ.get('SENDER_RATE_MAX_SENDERS', 10000))
+
+# parse_command actions that cost Apps Script reads; help and updates are not limited
+RATE_LIMITED_ACTIONS = {'get_tab_data', 'get_all_tabs_data', 'search_all_tabs', 'query'}
+
+def slow_down_reply(retry_after):
+    return f'🐢 You are sending commands faster than the sheet can keep up. Please wait {max(1, round(retry_after))}s and try again.'
+
+class SenderRateLimiter:
+    """Token buckets keyed by sender: burst commands at once, then rate per second.
+
+    Idle buckets refill to full, so only the most recently active
+    max_senders are kept.
+    """
+
+    def __init__(self, rate=SENDER_RATE_LIMIT, burst=SENDER_RATE_BURST, max_senders=SENDER_RATE_MAX_SENDERS):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.max_senders = max_senders
+        self._buckets = OrderedDict()  # sender -> (tokens, time.monotonic() of last update)
+        self._lock = threading.Lock()
+
+    def allow(self, sender):
+        """(True, 0) and take a token, or (False, seconds until the next token)"""
+        if self.rate <= 0:
+            return True, 0
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(sender, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[sender] = (tokens, now)
+            while len(self._buckets) > self.max_senders:
+                self._buckets.popitem(last=False)
+        return (True, 0) if allowed else (False, (1 - tokens) / self.rate)
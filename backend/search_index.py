@@ -0,0 +1,106 @@
+import re
+from bisect import bisect_left
+from collections import defaultdict
+
+# Fields that can be used as filters in /search (client:, spec:, tab:, id:)
+SEARCH_FIELDS = ('id', 'client', 'spec', 'tab')
+
+# Fields a bare search term is matched against
+FREE_TEXT_FIELDS = ('id', 'client', 'spec')
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+def tokenize(text):
+    """Lowercase alphanumeric tokens of a value or search term"""
+    return TOKEN_RE.findall(str(text or '').lower())
+
+class OrderIndex:
+    """Inverted index over grouped orders: field -> token -> order keys.
+
+    Terms match indexed tokens by prefix (so 'jo' finds 'john'), using a
+    sorted vocabulary per field. Lookups only touch the matching postings,
+    so query cost grows with the number of hits rather than with the number
+    of rows in the sheet.
+    """
+
+    def __init__(self):
+        self._postings = {field: defaultdict(set) for field in SEARCH_FIELDS}
+        self._vocab = {}
+        self._seq = {}
+        self.orders = {}
+
+    def add(self, key, order, tab):
+        """Index one grouped Order under key"""
+        if key not in self._seq:
+            self._seq[key] = len(self._seq)
+        self.orders[key] = order
+        values = {
+            'id': order.id,
+            'client': order.client_name,
+            'spec': order.specifications,
+            'tab': tab,
+        }
+        for field, value in values.items():
+            tokens = tokenize(value)
+            if field == 'id':
+                # The whole ID is also a token so 'PI-2024/17' can be matched as typed
+                tokens.append(str(value).strip().lower())
+            for token in tokens:
+                if token:
+                    self._postings[field][token].add(key)
+        self._vocab.clear()
+
+    def _sorted_vocab(self, field):
+        vocab = self._vocab.get(field)
+        if vocab is None:
+            vocab = self._vocab[field] = sorted(self._postings[field])
+        return vocab
+
+    def lookup(self, field, token):
+        """Keys whose field has a token starting with token"""
+        vocab = self._sorted_vocab(field)
+        postings = self._postings[field]
+        keys = set()
+        index = bisect_left(vocab, token)
+        while index < len(vocab) and vocab[index].startswith(token):
+            keys |= postings[vocab[index]]
+            index += 1
+        return keys
+
+    def _match_value(self, fields, value):
+        """Keys matching every token of value in at least one of fields"""
+        tokens = tokenize(value)
+        if 'id' in fields and str(value).strip():
+            whole = self._union(fields=('id',), token=str(value).strip().lower())
+        else:
+            whole = set()
+        matched = None
+        for token in tokens:
+            keys = self._union(fields, token)
+            matched = keys if matched is None else matched & keys
+            if not matched:
+                break
+        return whole | (matched or set())
+
+    def _union(self, fields, token):
+        keys = set()
+        for field in fields:
+            keys |= self.lookup(field, token)
+        return keys
+
+    def search(self, filters=None, terms=None):
+        """Keys matching all field filters and all free-text terms, in index order.
+
+        With no filters or terms every indexed key matches.
+        """
+        matched = None
+        clauses = [((field,), value) for field, values in (filters or {}).items() for value in values]
+        clauses += [(FREE_TEXT_FIELDS, term) for term in (terms or [])]
+        for fields, value in clauses:
+            keys = self._match_value(fields, value)
+            matched = keys if matched is None else matched & keys
+            if not matched:
+                return []
+        if matched is None:
+            return list(self._seq)
+        return sorted(matched, key=self._seq.__getitem__)
@@ -1,15 +1,31 @@
 import requests
-import pandas as pd
+from requests.adapters import HTTPAdapter
+from urllib3 import HTTPConnectionPool, HTTPSConnectionPool
 from datetime import datetime
 import os
 import random
+import contextvars
+import hashlib
 import json
+import threading
+import time
+from bisect import bisect_right
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from search_index import OrderIndex
+from grouping import OrderGrouper, group_search_rows, is_header_row, normalized_size_key
+from mirror import MIRROR_ENABLED, MIRROR_PATH, SheetMirror
+from page_cursors import PageCursors
+from order_ids import OrderIdAllocator
+from tab_generations import SHEETS_CACHE_SHARED_PATH, TabGenerations
+from timing import record_stage, stage
+from logs import DroppingQueueHandler, get_logger
+from metrics import (
+    APPS_SCRIPT_ERRORS, APPS_SCRIPT_IN_FLIGHT, APPS_SCRIPT_LATENCY, APPS_SCRIPT_PROBE_SECONDS, APPS_SCRIPT_UP,
+    SHEET_READS_COALESCED, register_collector,
+)
 
-try:
-    from app import GOOGLE_CREDS, SHEET_NAME
-except ImportError:
-    GOOGLE_CREDS = os.environ.get('GOOGLE_CREDS', 'google-credentials.json')
-    SHEET_NAME = os.environ.get('SHEET_NAME', 'Pending')
+logger = get_logger('sheets')
 
 # Google Apps Script Web App URL - Update this with your deployed web app URL
 APPS_SCRIPT_URL = os.environ.get('APPS_SCRIPT_URL', '')
@@ -20,341 +36,1020 @@ COLUMNS = [
     'Notes', 'Created At', 'Updated At', 'Sync Status'
 ]
 
+# Read-through cache for tab reads (seconds / number of cached tab payloads).
+# A TTL of 0 disables caching.
+CACHE_TTL = float(os.environ.get('SHEETS_CACHE_TTL', 30))
+CACHE_MAX_ENTRIES = int(os.environ.get('SHEETS_CACHE_MAX_ENTRIES', 32))
+
+# Tab the Apps Script 'getOrders' action reads from
+DEFAULT_TAB = 'Pending'
+
+# Order tabs in the order they are reported by multi-tab commands
+ALL_TABS = ['Pending', 'Ready', 'Delivered', 'Completed']
+
+# Worker threads used to fan out multi-tab reads (1 runs them sequentially)
+FANOUT_WORKERS = int(os.environ.get('SHEETS_FANOUT_WORKERS', 8))
+
+# Orders per reply for /pending, /ready, /delivered and /completed (0 = whole tab in one reply)
+TAB_PAGE_SIZE = int(os.environ.get('TAB_PAGE_SIZE', 20))
+
+class TabCache:
+    """Thread-safe TTL cache for Apps Script tab payloads, keyed by (kind, tab).
+
+    With shared (a TabGenerations store), invalidations made by other worker
+    processes count too: an entry is only served while the tab's shared
+    counter still has the value it had when the entry was cached.
+    """
+
+    def __init__(self, ttl, max_entries, shared=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.shared = shared
+        self._entries = OrderedDict()
+        self._generations = {}  # tab -> number of times it was invalidated in this process
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return (hit, value) for key, dropping the entry if it has expired or its tab was written elsewhere"""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value, generation = entry
+        if expires_at < time.monotonic() or (self.shared and self.generation(key[1]) != generation):
+            with self._lock:
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+            return False, None
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+        return True, value
+
+    def generation(self, tab):
+        """Changes whenever tab is invalidated (by any worker, with shared); take it before a read starts and pass it to set()"""
+        with self._lock:
+            local = self._generations.get(tab, 0)
+        return (local, self.shared.get(tab)) if self.shared else local
+
+    def set(self, key, value, generation=None):
+        """Cache value, unless its tab was invalidated since generation was taken (the value may predate a write)"""
+        if self.ttl <= 0 or self.max_entries <= 0:
+            return
+        current = self.generation(key[1])
+        if generation is not None and current != generation:
+            return
+        if self.shared and current[1] is None:
+            # Another worker's write could not be seen; do not cache
+            return
+        with self._lock:
+            if self._generations.get(key[1], 0) != (current[0] if self.shared else current):
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, value, current)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_tab(self, tab):
+        """Drop every cached payload belonging to tab, here and (with shared) in other workers; reads already in flight will not be cached"""
+        with self._lock:
+            self._generations[tab] = self._generations.get(tab, 0) + 1
+            for key in [k for k in self._entries if k[1] == tab]:
+                del self._entries[key]
+        if self.shared:
+            self.shared.bump(tab)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def tabs_containing(self, order_id):
+        """Return the cached tabs that currently hold a row for order_id"""
+        order_id = str(order_id).strip()
+        tabs = set()
+        with self._lock:
+            entries = list(self._entries.items())
+        for (kind, tab), (_, value, _) in entries:
+            for row in value or []:
+                if isinstance(row, dict):
+                    row_id = row.get('id', '')
+                else:
+                    row_id = row[0] if row else ''
+                if str(row_id).strip() == order_id:
+                    tabs.add(tab)
+                    break
+        return tabs
+
+_tab_cache = TabCache(CACHE_TTL, CACHE_MAX_ENTRIES,
+                      TabGenerations() if SHEETS_CACHE_SHARED_PATH and CACHE_TTL > 0 else None)
+
+class ReadFlights:
+    """Single-flight registry for tab reads, keyed by (kind, tab) like TabCache.
+
+    The first caller to miss the cache for a key fetches it; callers that
+    miss while that fetch is in flight wait on its Future (asyncio code can
+    await it with asyncio.wrap_future) and get the same payload or error.
+    """
+
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def join(self, keys):
+        """({key: Future} for keys this caller must fetch, {key: Future} for keys already in flight)"""
+        lead, follow = {}, {}
+        with self._lock:
+            for key in keys:
+                flight = self._flights.get(key)
+                if flight is None:
+                    lead[key] = self._flights[key] = Future()
+                else:
+                    follow[key] = flight
+        return lead, follow
+
+    def land(self, key, flight, value):
+        """Hand value (a payload or an exception) to everyone waiting on flight"""
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        flight.set_result(value)
+
+    def forget_tab(self, tab):
+        """Stop new readers joining reads of tab that started before a write"""
+        with self._lock:
+            for key in [k for k in self._flights if k[1] == tab]:
+                del self._flights[key]
+
+_read_flights = ReadFlights()
+
+# Rendered replies, reused until the tab content they were built from changes
+REPLY_CACHE_MAX_ENTRIES = int(os.environ.get('REPLY_CACHE_MAX_ENTRIES', 128))
+_reply_cache = TabCache(float('inf'), REPLY_CACHE_MAX_ENTRIES)
+
+_content_versions = {}
+_content_versions_lock = threading.Lock()
+
+def content_version(key, payload):
+    """Short hash of a tab payload's content, computed once per payload object.
+
+    A refetch that returns the same rows gets the same version, so replies
+    rendered from the old payload stay valid.
+    """
+    with _content_versions_lock:
+        cached = _content_versions.get(key)
+    if cached and cached[0] is payload:
+        return cached[1]
+    version = hashlib.sha1(json.dumps(payload, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:16]
+    with _content_versions_lock:
+        _content_versions[key] = (payload, version)
+    return version
+
+def cached_reply(key, version, render):
+    """render() for key, or the reply it returned last time if version is unchanged"""
+    hit, cached = _reply_cache.get(key)
+    if hit and cached[0] == version:
+        return cached[1]
+    with stage('render'):
+        reply = render()
+    _reply_cache.set(key, (version, reply))
+    return reply
+
+class AppsScriptError(Exception):
+    """The Apps Script web app answered with success: false"""
+
+# HTTP client settings for the Apps Script web app
+APPS_SCRIPT_POOL_SIZE = int(os.environ.get('APPS_SCRIPT_POOL_SIZE', 10))
+APPS_SCRIPT_CONNECT_TIMEOUT = float(os.environ.get('APPS_SCRIPT_CONNECT_TIMEOUT', 5))
+APPS_SCRIPT_READ_TIMEOUT = float(os.environ.get('APPS_SCRIPT_READ_TIMEOUT', 30))
+APPS_SCRIPT_MAX_RETRIES = int(os.environ.get('APPS_SCRIPT_MAX_RETRIES', 3))
+APPS_SCRIPT_BACKOFF_BASE = float(os.environ.get('APPS_SCRIPT_BACKOFF_BASE', 0.5))
+APPS_SCRIPT_BACKOFF_MAX = float(os.environ.get('APPS_SCRIPT_BACKOFF_MAX', 8))
+
+# Only read actions are safe to send twice; writes such as syncToSheets are never retried
+READ_ACTIONS = {'getOrders', 'getOrdersFromSheet', 'getRawSheetData', 'getrawsheetdata', 'getAvailableSheets'}
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+_client_stats = {'requests': 0, 'connections_opened': 0, 'retries': 0}
+_client_stats_lock = threading.Lock()
+
+def count_client_stat(stat, amount=1):
+    with _client_stats_lock:
+        _client_stats[stat] += amount
+
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+    def _new_conn(self):
+        count_client_stat('connections_opened')
+        return super()._new_conn()
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    def _new_conn(self):
+        count_client_stat('connections_opened')
+        return super()._new_conn()
+
+class _PooledAdapter(HTTPAdapter):
+    """HTTPAdapter that counts new connections so reuse can be reported"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _CountingHTTPConnectionPool,
+            'https': _CountingHTTPSConnectionPool,
+        }
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session():
+    """Module-level keep-alive session shared by all Apps Script calls"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = _PooledAdapter(pool_connections=4, pool_maxsize=APPS_SCRIPT_POOL_SIZE)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            # Fires for every response, including the script.googleusercontent.com redirect hop
+            session.hooks['response'].append(lambda response, *args, **kwargs: count_client_stat('requests'))
+            _session = session
+        return _session
+
+def get_client_stats():
+    """Counters for the pooled Apps Script client"""
+    with _client_stats_lock:
+        stats = dict(_client_stats)
+    stats['handshakes_saved'] = max(stats['requests'] - stats['connections_opened'], 0)
+    stats['pool_size'] = APPS_SCRIPT_POOL_SIZE
+    return stats
+
+def get_apps_script_stats():
+    """/api/apps_script_stats body: client counters, plus each mirrored tab's sync state when the mirror is on"""
+    stats = get_client_stats()
+    if sheet_mirror:
+        stats['mirror'] = sheet_mirror.status()
+    return stats
+
+def _client_samples():
+    stats = get_client_stats()
+    return [
+        ('glassbot_apps_script_http_requests_total', 'counter', 'HTTP responses received from Apps Script, redirect hops included',
+         [({}, stats['requests'])]),
+        ('glassbot_apps_script_connections_opened_total', 'counter', 'New connections opened to Apps Script',
+         [({}, stats['connections_opened'])]),
+        ('glassbot_apps_script_retries_total', 'counter', 'Apps Script calls retried after a failure',
+         [({}, stats['retries'])]),
+        ('glassbot_log_records_dropped_total', 'counter', 'Log records dropped because the log queue was full',
+         [({}, DroppingQueueHandler.dropped)]),
+    ]
+
+register_collector('apps_script_client', _client_samples)
+
+def is_retryable(action, data):
+    if action == 'batch':
+        return all(req.get('action') in READ_ACTIONS for req in (data or {}).get('requests', []))
+    return action in READ_ACTIONS
+
+def backoff_delay(attempt, response=None):
+    """Full-jitter exponential backoff, honouring a numeric Retry-After header"""
+    delay = random.uniform(0, min(APPS_SCRIPT_BACKOFF_MAX, APPS_SCRIPT_BACKOFF_BASE * (2 ** attempt)))
+    retry_after = response.headers.get('Retry-After') if response is not None else None
+    if retry_after and retry_after.isdigit():
+        delay = max(delay, min(float(retry_after), APPS_SCRIPT_BACKOFF_MAX))
+    return delay
+
+def error_kind(error):
+    """Label for APPS_SCRIPT_ERRORS: 'script' (success: false), 'http' (bad status) or 'transport'"""
+    if isinstance(error, AppsScriptError):
+        return 'script'
+    if getattr(error, 'response', None) is not None:
+        return 'http'
+    return 'transport'
+
 def call_apps_script(action, data=None):
     """Make a request to the Google Apps Script web app"""
+    started = time.perf_counter()
+    APPS_SCRIPT_IN_FLIGHT.inc()
     try:
         payload = {
             'action': action,
             'data': data or {}
         }
+        retries_left = APPS_SCRIPT_MAX_RETRIES if is_retryable(action, data) else 0
+        attempt = 0
+        
+        while True:
+            try:
+                response = get_session().post(
+                    APPS_SCRIPT_URL, json=payload,
+                    timeout=(APPS_SCRIPT_CONNECT_TIMEOUT, APPS_SCRIPT_READ_TIMEOUT)
+                )
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt >= retries_left:
+                    raise
+                delay = backoff_delay(attempt)
+                logger.warning("Apps Script call failed, retrying", action=action, error=str(e), retry_in=round(delay, 2))
+            else:
+                if response.status_code not in RETRY_STATUS_CODES or attempt >= retries_left:
+                    break
+                delay = backoff_delay(attempt, response)
+                logger.warning("Apps Script returned a retryable status", action=action, status=response.status_code, retry_in=round(delay, 2))
+            attempt += 1
+            count_client_stat('retries')
+            time.sleep(delay)
         
-        response = requests.post(APPS_SCRIPT_URL, json=payload, timeout=30)
         response.raise_for_status()
         
         result = response.json()
         if not result.get('success'):
-            raise Exception(f"Apps Script error: {result.get('message', 'Unknown error')}")
+            raise AppsScriptError(f"Apps Script error: {result.get('message', 'Unknown error')}")
         
         return result
     except Exception as e:
-        print(f"Error calling Apps Script ({action}): {e}")
+        APPS_SCRIPT_ERRORS.inc(action=action, kind=error_kind(e))
+        logger.error("Error calling Apps Script", action=action, error=str(e))
         raise
+    finally:
+        elapsed = time.perf_counter() - started
+        APPS_SCRIPT_IN_FLIGHT.dec()
+        APPS_SCRIPT_LATENCY.observe(elapsed, action=action)
+        record_stage(f'apps_script.{action}', elapsed)
+
+# Batched envelope (see APPS-SCRIPT-API.md). 'auto' probes the deployed script
+# and falls back to one request per action if it does not know 'batch'.
+BATCH_MODE = os.environ.get('APPS_SCRIPT_BATCH', 'auto').lower()
+# In 'auto' mode, batching is switched off after this many failed batch requests in a row
+BATCH_MAX_FAILURES = int(os.environ.get('APPS_SCRIPT_BATCH_MAX_FAILURES', 3))
+_batch_supported = {'auto': None, 'on': True, 'off': False}.get(BATCH_MODE)
+_batch_failures = 0
+_batch_lock = threading.Lock()
+
+def _looks_like_unknown_action(error):
+    message = str(error).lower()
+    return isinstance(error, AppsScriptError) and 'action' in message and any(
+        word in message for word in ('unknown', 'invalid', 'unsupported', 'not supported'))
+
+def _call_individually(calls):
+    results = []
+    for action, data in calls:
+        try:
+            results.append(call_apps_script(action, data))
+        except Exception as e:
+            results.append(e)
+    return results
+
+def batch_payload(calls):
+    return {'requests': [{'action': action, 'data': data or {}} for action, data in calls]}
+
+def batch_results(calls, result):
+    """Demultiplex a 'batch' result into one result dict or exception per call.
+
+    Returns None if the response is not one dict with a 'success' key per
+    call; the caller then makes individual calls for this batch only, and
+    the reply counts towards batch_failed's limit.
+    """
+    global _batch_supported, _batch_failures
+    responses = result.get('data')
+    if not (isinstance(responses, list) and len(responses) == len(calls)
+            and all(isinstance(response, dict) and 'success' in response for response in responses)):
+        batch_failed('malformed batch response')
+        return None
+
+    with _batch_lock:
+        _batch_supported = True
+        _batch_failures = 0
+    results = []
+    for (action, _), response in zip(calls, responses):
+        if response['success']:
+            results.append(response)
+        else:
+            message = response.get('message', 'Unknown error')
+            logger.error("Error calling Apps Script in batch", action=action, error=message)
+            results.append(AppsScriptError(f"Apps Script error: {message}"))
+    return results
+
+def batch_failed(error):
+    """Record a batch request the script did not answer properly (any failure but a transport one).
+
+    The caller falls back to individual calls for that batch. In 'auto'
+    mode batching is switched off at once if the script says it has no
+    'batch' action, or after BATCH_MAX_FAILURES failures in a row (an older
+    script may answer with an HTML page, a 4xx or an unrelated error).
+    """
+    global _batch_supported, _batch_failures
+    with _batch_lock:
+        _batch_failures += 1
+        failures = _batch_failures
+        give_up = BATCH_MODE == 'auto' and _batch_supported is not False and (
+            _looks_like_unknown_action(error) or failures >= BATCH_MAX_FAILURES)
+        if give_up:
+            _batch_supported = False
+    logger.warning("Batch request failed, falling back to individual calls", error=str(error), failures=failures)
+    if give_up:
+        logger.info("Apps Script batch requests switched off", failures=failures)
+
+def should_batch(calls):
+    return len(calls) > 1 and _batch_supported is not False
+
+def call_apps_script_batch(calls):
+    """Send several (action, data) pairs to Apps Script in a single request.
+
+    Returns one entry per call, in order: the action's result dict, or the
+    exception it failed with. Falls back to individual requests when the
+    batch request fails for any reason but the network (see batch_failed).
+    """
+    if not should_batch(calls):
+        return _call_individually(calls)
 
-def get_sheet():
-    """Get orders from the default sheet (Pending)"""
     try:
-        result = call_apps_script('getOrders')
-        return result.get('data', [])
+        result = call_apps_script('batch', batch_payload(calls))
+    except (requests.ConnectionError, requests.Timeout):
+        # Individual calls would hit the same network problem
+        raise
     except Exception as e:
-        print(f"Error getting sheet data: {e}")
-        return []
+        batch_failed(e)
+        return _call_individually(calls)
+
+    results = batch_results(calls, result)
+    return results if results is not None else _call_individually(calls)
+
+# Readiness probe: one cheap read without retries. The report is reused for a
+# few seconds so frequent probes do not eat into the Apps Script quota.
+READINESS_TIMEOUT = float(os.environ.get('READINESS_TIMEOUT', 5))
+READINESS_CACHE_SECONDS = float(os.environ.get('READINESS_CACHE_SECONDS', 5))
+PROBE_ACTION = 'getAvailableSheets'
+
+_last_probe = None  # (time.monotonic() of the probe, report)
+
+def cached_probe():
+    """The last readiness report if it is recent enough, else None"""
+    probe = _last_probe
+    if probe and time.monotonic() - probe[0] < READINESS_CACHE_SECONDS:
+        return probe[1]
+    return None
+
+def check_probe_response(response):
+    response.raise_for_status()
+    if not response.json().get('success'):
+        raise AppsScriptError(f"Apps Script error: {response.json().get('message', 'Unknown error')}")
+
+def probe_report(rtt, error=None):
+    """Readiness report for a probe that took rtt seconds; also updates the probe gauges"""
+    global _last_probe
+    APPS_SCRIPT_UP.set(0 if error else 1)
+    APPS_SCRIPT_PROBE_SECONDS.set(rtt)
+    report = {'ready': not error, 'apps_script_rtt_ms': round(rtt * 1000, 1)}
+    if error:
+        report['error'] = str(error)
+        logger.warning("Readiness probe failed", error=str(error), rtt_ms=report['apps_script_rtt_ms'])
+    _last_probe = (time.monotonic(), report)
+    return report
 
-def format_date_only(dt_str):
+def readiness_reply(report, queue_status=None, startup=None):
+    """/api/ready body: the probe report plus the order queue backlog and the startup timings"""
+    body = dict(report, status='ready' if report['ready'] else 'unavailable')
+    if queue_status:
+        body['order_queue_backlog'] = queue_status['backlog']
+    if startup:
+        body['startup_ms'] = startup
+    return body
+
+def probe_apps_script():
+    """Readiness: measured round trip of one getAvailableSheets call"""
+    report = cached_probe()
+    if report:
+        return report
+    if not APPS_SCRIPT_URL:
+        return probe_report(0, 'APPS_SCRIPT_URL is not set')
+    started = time.perf_counter()
     try:
-        if not dt_str:
-            return ''
-        dt = datetime.fromisoformat(dt_str.replace('Z', '+00:00'))
-        return dt.strftime('%d %B %Y')  # e.g., '28 June 2025'
-    except Exception:
-        return dt_str  # fallback to original if parsing fails
-
-def get_tab_data(tab_name):
-    """Get orders from a specific tab with formatted output (robust grouping for all sizes, no emojis)"""
+        response = get_session().post(
+            APPS_SCRIPT_URL, json={'action': PROBE_ACTION, 'data': {}},
+            timeout=(min(APPS_SCRIPT_CONNECT_TIMEOUT, READINESS_TIMEOUT), READINESS_TIMEOUT)
+        )
+        check_probe_response(response)
+    except Exception as e:
+        return probe_report(time.perf_counter() - started, e)
+    return probe_report(time.perf_counter() - started)
+
+def _mirror_fetch(tab_name, since):
+    return call_apps_script('getRawSheetData', {'sheetName': tab_name, 'updatedSince': since})
+
+# Optional local SQLite mirror that serves tab reads within a staleness bound
+sheet_mirror = SheetMirror(MIRROR_PATH, COLUMNS, _mirror_fetch) if MIRROR_ENABLED else None
+
+def _read_from_mirror(kind, tab):
     try:
-        # Get orders from the specified tab
-        result = call_apps_script('getOrdersFromSheet', {'sheetName': tab_name})
-        orders = result.get('data', [])
-        
-        if not orders:
-            return f"📋 *{tab_name} Tab*\nNo orders found in {tab_name} tab."
-        
-        # Try to get raw sheet data to capture rows without IDs
+        with stage('mirror'):
+            return sheet_mirror.raw_rows(tab) if kind == 'raw' else sheet_mirror.orders(tab)
+    except Exception as e:
+        logger.error("Error reading from mirror", tab=tab, error=str(e))
+        return e
+
+def cache_lookup(reads):
+    """Split (kind, action, tab, data) reads into cached values and the indexes still to fetch"""
+    values = [None] * len(reads)
+    misses = []
+    for index, (kind, action, tab, data) in enumerate(reads):
+        hit, value = _tab_cache.get((kind, tab))
+        if hit:
+            values[index] = value
+        else:
+            misses.append(index)
+    return values, misses
+
+def cache_store(reads, values, misses, results, generations):
+    """Fill values with fetched results for the missed reads and cache the successful ones.
+
+    generations maps each fetched tab to its cache generation from before
+    the fetch; a tab written (invalidated) meanwhile is not cached.
+    """
+    for index, result in zip(misses, results):
+        if isinstance(result, Exception):
+            values[index] = result
+            continue
+        kind, _, tab, _ = reads[index]
+        values[index] = result.get('data', [])
+        _tab_cache.set((kind, tab), values[index], generations[tab])
+    return values
+
+def claim_reads(reads, misses):
+    """Split cache misses into (indexes to fetch, [(index, Future)] to wait on, led flights, tab generations).
+
+    A read another request is already fetching is waited on instead of
+    fetched again; so is a repeat of a read within reads. The generations
+    are taken before the fetch starts, for land_reads.
+    """
+    generations = {reads[i][2]: _tab_cache.generation(reads[i][2]) for i in misses}
+    lead, follow = _read_flights.join({(reads[i][0], reads[i][2]) for i in misses})
+    fetch, waits, fetching = [], [], set()
+    for index in misses:
+        key = (reads[index][0], reads[index][2])
+        if key in lead and key not in fetching:
+            fetching.add(key)
+            fetch.append(index)
+        else:
+            waits.append((index, lead.get(key) or follow[key]))
+    if waits:
+        SHEET_READS_COALESCED.inc(len(waits))
+    return fetch, waits, lead, generations
+
+def land_reads(reads, values, fetch, results, lead, generations):
+    """Store fetched results (cache and values) and release the readers waiting on them.
+
+    results may be short if the fetch failed unexpectedly; those waiters get an error.
+    """
+    results = list(results) + [AppsScriptError('Read was interrupted')] * (len(fetch) - len(results))
+    cache_store(reads, values, fetch, results, generations)
+    for index in fetch:
+        key = (reads[index][0], reads[index][2])
+        _read_flights.land(key, lead[key], values[index])
+
+def _cached_read_many(reads):
+    """Read-through for several (kind, action, tab, data) reads.
+
+    Cache misses are fetched together in one batched request, except those
+    another request is already fetching, which share that fetch. Returns
+    the payload or the exception for each read, in order. When the SQLite
+    mirror is enabled it answers all reads instead.
+    """
+    if sheet_mirror:
+        return [_read_from_mirror(kind, tab) for kind, _, tab, _ in reads]
+
+    values, misses = cache_lookup(reads)
+    if misses:
+        fetch, waits, lead, generations = claim_reads(reads, misses)
+        results = []
         try:
-            raw_result = call_apps_script('getRawSheetData', {'sheetName': tab_name})
-            raw_data = raw_result.get('data', [])
+            results = call_apps_script_batch([(reads[i][1], reads[i][3]) for i in fetch]) if fetch else []
         except Exception as e:
-            print(f"Error getting raw sheet data: {e}")
-            raw_data = []
-
-        # --- Robust grouping logic ---
-        grouped_orders = {}
-        current_id = None
-        for row in raw_data:
-            # Skip header row
-            if not row or row[0] in ('ID', 'id'):
-                continue
-            row_id = row[0]
-            client_name = row[1] if len(row) > 1 else ''
-            specs = row[2] if len(row) > 2 else ''
-            size = row[3] if len(row) > 3 else ''
-            qty = row[4] if len(row) > 4 else ''
-            status = row[5] if len(row) > 5 else ''
-            notes = row[6] if len(row) > 6 else ''
-            created_at = row[7] if len(row) > 7 else ''
-            updated_at = row[8] if len(row) > 8 else ''
-
-            # If this row has an ID, start a new order
-            if row_id:
-                current_id = row_id
-                if current_id not in grouped_orders:
-                    grouped_orders[current_id] = {
-                        'id': current_id,
-                        'clientName': client_name,
-                        'specifications': specs,
-                        'createdAt': created_at,
-                        'updatedAt': updated_at,
-                        'status': status,
-                        'notes': notes,
-                        'items': []
-                    }
-            # Only add items if we have a current order
-            if current_id and (size or qty):
-                # Normalize size for duplicate checking
-                norm_size = str(size).strip().lower()
-                already_exists = any(str(item['sizes']).strip().lower() == norm_size for item in grouped_orders[current_id]['items'])
-                if size and qty and not already_exists:
-                    grouped_orders[current_id]['items'].append({
-                        'sizes': size,
-                        'quantity': qty
-                    })
-
-        # Format output
-        tab_display_names = {
-            'Pending': 'Pending Orders',
-            'Ready': 'Ready Orders', 
-            'Delivered': 'Glass Delivered',
-            'Completed': 'Completed Orders'
-        }
-        display_name = tab_display_names.get(tab_name, f"{tab_name} Orders")
-        
-        output = f"*{display_name} - {len(grouped_orders)} orders*\n"
-        output += "*" + "=" * 40 + "*\n\n"
-        for order_id, order in grouped_orders.items():
-            output += f"*Order ID:* {order_id}\n"
-            output += f"*Client:* {order['clientName']}\n"
-            output += f"*Specs:* {order['specifications']}\n"
-            # Add line items
-            if order['items']:
-                output += "*Glass Sizes:*\n"
-                for item in order['items']:
-                    if item['sizes'] and item['quantity']:
-                        output += f"  • {item['sizes']} - Qty: {item['quantity']}\n"
-            # Add dates (formatted)
-            if order['createdAt']:
-                output += f"*Created:* {format_date_only(order['createdAt'])}\n"
-            # Only show Updated for non-Pending tabs
-            if tab_name.lower() != 'pending' and order['updatedAt'] and order['updatedAt'] != order['createdAt']:
-                output += f"*Updated:* {format_date_only(order['updatedAt'])}\n"
-            # Only show Notes for Delivered tab
-            if tab_name.lower() == 'delivered' and order['notes']:
-                output += f"*Notes:* {order['notes']}\n"
-            output += "\n*" + "-" * 30 + "*\n\n"
-        return output
+            results = [e] * len(fetch)
+        finally:
+            land_reads(reads, values, fetch, results, lead, generations)
+        for index, flight in waits:
+            values[index] = flight.result()
+    return values
+
+def _cached_read(kind, action, tab, data=None):
+    """Read-through helper: serve a tab payload from the cache or fetch and store it"""
+    value = _cached_read_many([(kind, action, tab, data)])[0]
+    if isinstance(value, Exception):
+        raise value
+    return value
+
+def orders_read(tab_name):
+    return ('orders', 'getOrdersFromSheet', tab_name, {'sheetName': tab_name})
+
+def raw_read(tab_name):
+    return ('raw', 'getRawSheetData', tab_name, {'sheetName': tab_name})
+
+def fetch_orders(tab_name):
+    """Order dicts for a tab (cached 'getOrdersFromSheet')"""
+    return _cached_read(*orders_read(tab_name))
+
+def fetch_raw_rows(tab_name):
+    """Raw sheet rows for a tab, including continuation rows without IDs (cached 'getRawSheetData')"""
+    return _cached_read(*raw_read(tab_name))
+
+def tab_reads(tab_name):
+    return [orders_read(tab_name), raw_read(tab_name)]
+
+def tab_payloads(tab_name, values):
+    """(orders, raw_rows) from the values of tab_reads(tab_name)"""
+    orders, raw_data = values
+    if isinstance(orders, Exception):
+        raise orders
+    if isinstance(raw_data, Exception):
+        logger.error("Error getting raw sheet data", tab=tab_name, error=str(raw_data))
+        raw_data = []
+    return orders, raw_data
+
+def fetch_tab(tab_name):
+    """Order dicts and raw rows for a tab, fetched in one batched request.
+
+    A failed raw read is tolerated (returned as []); a failed orders read raises.
+    """
+    return tab_payloads(tab_name, _cached_read_many(tab_reads(tab_name)))
+
+_fanout_pool = None
+_fanout_pool_lock = threading.Lock()
+
+def _get_fanout_pool():
+    global _fanout_pool
+    with _fanout_pool_lock:
+        if _fanout_pool is None:
+            _fanout_pool = ThreadPoolExecutor(max_workers=FANOUT_WORKERS, thread_name_prefix='sheets-fanout')
+        return _fanout_pool
+
+def run_concurrently(tasks):
+    """Run (label, func) tasks on the fan-out pool.
+
+    Returns [(label, value, error)] in the order the tasks were given, so a
+    failing task only affects its own entry.
+    """
+    if FANOUT_WORKERS <= 1 or len(tasks) <= 1:
+        futures = None
+    else:
+        pool = _get_fanout_pool()
+        # Each task runs in a copy of the caller's context so log lines keep the request ID
+        futures = [(label, pool.submit(contextvars.copy_context().run, func)) for label, func in tasks]
+
+    results = []
+    for index, (label, func) in enumerate(tasks):
+        try:
+            value = futures[index][1].result() if futures else func()
+            results.append((label, value, None))
+        except Exception as e:
+            logger.error("Error in concurrent read", label=label, error=str(e))
+            results.append((label, None, e))
+    return results
+
+def invalidate_tabs(*tab_names):
+    """Forget cached reads for the given tabs after a write"""
+    for tab_name in tab_names:
+        if tab_name:
+            _tab_cache.invalidate_tab(tab_name)
+            _read_flights.forget_tab(tab_name)
+            if sheet_mirror:
+                sheet_mirror.mark_stale(tab_name)
+
+def warm_connection():
+    """Boot warmup: open the pooled Apps Script connection with one readiness probe"""
+    report = probe_apps_script()
+    if not report['ready']:
+        raise AppsScriptError(report['error'])
+
+def prefetch_tabs():
+    """Boot warmup: read every order tab into the cache"""
+    results = run_concurrently([(tab, lambda tab=tab: fetch_tab(tab)) for tab in ALL_TABS])
+    failed = [tab for tab, _, error in results if error is not None]
+    if failed:
+        raise AppsScriptError(f"Could not read: {', '.join(failed)}")
+
+def warm_up_steps():
+    """(name, function) steps for warmup.BootWarmup"""
+    return [('connect', warm_connection), ('prefetch', prefetch_tabs)]
+
+def tabs_holding_order(order_id):
+    """Tabs known (from the cache or mirror) to contain order_id"""
+    tabs = _tab_cache.tabs_containing(order_id)
+    if sheet_mirror:
+        tabs |= sheet_mirror.tabs_containing(order_id)
+    return tabs
+
+def reset_after_fork():
+    """Drop per-process resources inherited from a preloading parent (gunicorn post_fork)"""
+    global _session, _fanout_pool
+    # Sockets and pool threads belong to the parent; each worker builds its own on first use
+    _session = None
+    _fanout_pool = None
+    if sheet_mirror:
+        sheet_mirror.reopen()
+
+def default_sheet_payload():
+    """Cached orders of the default sheet (Pending), shared with other callers; do not modify"""
+    try:
+        return _cached_read('default', 'getOrders', DEFAULT_TAB)
     except Exception as e:
-        print(f"Error getting tab data for {tab_name}: {e}")
+        logger.error("Error getting sheet data", error=str(e))
+        return []
+
+def get_sheet():
+    """Get orders from the default sheet (Pending)"""
+    return list(default_sheet_payload())
+
+def get_tab_data(tab_name, page=None, sender=None):
+    """Get one page of orders from a specific tab with formatted output (robust grouping for all sizes, no emojis)
+
+    page is a page number, 'next', 'prev' or None (first page); 'next' and
+    'prev' move from the sender's last viewed page of the tab.
+    """
+    try:
+        # Get orders and raw sheet data (to capture rows without IDs) from the specified tab
+        orders, raw_data = fetch_tab(tab_name)
+        return render_tab_data(tab_name, orders, raw_data, page, sender)
+    except Exception as e:
+        logger.error("Error getting tab data", tab=tab_name, error=str(e))
         return f"❌ Error retrieving {tab_name} data: {str(e)}"
 
+TAB_DISPLAY_NAMES = {
+    'Pending': 'Pending Orders',
+    'Ready': 'Ready Orders', 
+    'Delivered': 'Glass Delivered',
+    'Completed': 'Completed Orders'
+}
+
+# Where each order's rows sit in a tab, rebuilt only when the cached raw payload changes
+_tab_layouts = {}
+_tab_layouts_lock = threading.Lock()
+
+def get_tab_layout(tab_name, raw_data):
+    """(order IDs in first-seen order, {order ID: row indexes where its rows start}, sorted start rows)
+
+    Only the ID column is read, so building this is much cheaper than
+    grouping the whole tab.
+    """
+    with _tab_layouts_lock:
+        cached = _tab_layouts.get(tab_name)
+    if cached and cached[0] is raw_data:
+        return cached[1]
+
+    runs = {}
+    starts = []
+    with stage('group'):
+        for index, row in enumerate(raw_data):
+            if not is_header_row(row) and row[0]:
+                runs.setdefault(row[0], []).append(index)
+                starts.append(index)
+    layout = (list(runs), runs, starts)
+    with _tab_layouts_lock:
+        _tab_layouts[tab_name] = (raw_data, layout)
+    return layout
+
+def _group_tab_order(raw_data, order_id, runs, starts):
+    """Group one order's rows (ID row plus the continuation rows below it, for every place the ID appears)"""
+    grouper = OrderGrouper(normalized_size_key)
+    with stage('group'):
+        for start in runs[order_id]:
+            next_start = bisect_right(starts, start)
+            end = starts[next_start] if next_start < len(starts) else len(raw_data)
+            grouper.add_raw_rows(raw_data[start:end])
+    return grouper.orders[order_id]
+
+_page_cursors = None
+_page_cursors_lock = threading.Lock()
+
+def get_page_cursors():
+    """Shared per-sender page cursor store, created on first use"""
+    global _page_cursors
+    with _page_cursors_lock:
+        if _page_cursors is None:
+            _page_cursors = PageCursors()
+        return _page_cursors
+
+def tab_page_count(order_count, page_size=None):
+    page_size = TAB_PAGE_SIZE if page_size is None else page_size
+    if page_size <= 0:
+        return 1
+    return max(1, -(-order_count // page_size))
+
+def render_tab_data(tab_name, orders, raw_data, page=None, sender=None):
+    """Format one page of a tab's orders for WhatsApp; only the orders on that page are grouped"""
+    if not orders:
+        return f"📋 *{tab_name} Tab*\nNo orders found in {tab_name} tab."
+
+    order_ids, runs, starts = get_tab_layout(tab_name, raw_data)
+    total_pages = tab_page_count(len(order_ids))
+    with stage('page_cursor'):
+        page_number = get_page_cursors().resolve(sender, tab_name, page, total_pages)
+    version = content_version(('raw', tab_name), raw_data)
+    return cached_reply(('tab', tab_name, page_number, TAB_PAGE_SIZE), version,
+                        lambda: _format_tab_page(tab_name, raw_data, order_ids, runs, starts, page_number, total_pages))
+
+def _format_tab_page(tab_name, raw_data, order_ids, runs, starts, page_number, total_pages):
+    if total_pages > 1:
+        first = (page_number - 1) * TAB_PAGE_SIZE
+        page_ids = order_ids[first:first + TAB_PAGE_SIZE]
+    else:
+        page_ids = order_ids
+
+    # Format output
+    display_name = TAB_DISPLAY_NAMES.get(tab_name, f"{tab_name} Orders")
+    
+    page_label = f" (page {page_number} of {total_pages})" if total_pages > 1 else ""
+    output = f"*{display_name} - {len(order_ids)} orders{page_label}*\n"
+    output += "*" + "=" * 40 + "*\n\n"
+    for order_id in page_ids:
+        order = _group_tab_order(raw_data, order_id, runs, starts)
+        output += f"*Order ID:* {order_id}\n"
+        output += f"*Client:* {order.client_name}\n"
+        output += f"*Specs:* {order.specifications}\n"
+        # Add line items (the grouper only keeps items with a size and a quantity)
+        if order.items:
+            output += "*Glass Sizes:*\n"
+            for item in order.items:
+                output += f"  • {item.sizes} - Qty: {item.quantity}\n"
+        # Add dates (formatted)
+        if order.created_at:
+            output += f"*Created:* {order.created}\n"
+        # Only show Updated for non-Pending tabs
+        if tab_name.lower() != 'pending' and order.updated_at and order.updated_at != order.created_at:
+            output += f"*Updated:* {order.updated}\n"
+        # Only show Notes for Delivered tab
+        if tab_name.lower() == 'delivered' and order.notes:
+            output += f"*Notes:* {order.notes}\n"
+        output += "\n*" + "-" * 30 + "*\n\n"
+    if page_number < total_pages:
+        command = f"/{tab_name.lower()}"
+        output += f"Send `{command} next` for page {page_number + 1} or `{command} [page]` to jump.\n"
+    return output
+
 def get_all_tabs_data():
     """Get summary data from all tabs"""
     try:
-        tabs = ['Pending', 'Ready', 'Delivered', 'Completed']
-        all_data = {}
-        
-        for tab in tabs:
-            result = call_apps_script('getOrdersFromSheet', {'sheetName': tab})
-            orders = result.get('data', [])
-            # Count unique orders (by ID)
-            unique_orders = set()
-            for order in orders:
-                if order.get('id'):
-                    unique_orders.add(order.get('id'))
-            all_data[tab] = len(unique_orders)
-        
-        # Format summary
-        output = "📊 *Order Summary - All Tabs*\n"
-        output += "=" * 30 + "\n\n"
-        
-        for tab, count in all_data.items():
-            emoji = {
-                'Pending': '⏳',
-                'Ready': '✅',
-                'Delivered': '🚚',
-                'Completed': '🎉'
-            }.get(tab, '📋')
-            
-            output += f"{emoji} *{tab}:* {count} orders\n"
-        
-        output += "\n💡 Use /pending, /ready, /delivered, or /completed to see detailed orders."
-        
-        return output
+        results = run_concurrently([(tab, lambda tab=tab: fetch_orders(tab)) for tab in ALL_TABS])
+        return render_all_tabs_summary(results)
         
     except Exception as e:
-        print(f"Error getting all tabs data: {e}")
+        logger.error("Error getting all tabs data", error=str(e))
         return f"❌ Error retrieving summary data: {str(e)}"
 
-def search_all_tabs(search_term):
-    """Search for orders across all tabs"""
-    try:
-        tabs = ['Pending', 'Ready', 'Delivered', 'Completed']
-        all_orders = {}  # Dictionary to store all orders by tab
-        raw_data_by_tab = {}  # Dictionary to store raw data by tab
-        
-        # First, collect all orders from all tabs
-        for tab in tabs:
-            result = call_apps_script('getOrdersFromSheet', {'sheetName': tab})
-            orders = result.get('data', [])
-            if orders:
-                all_orders[tab] = orders
-            
-            # Try to get raw sheet data to capture rows without IDs
-            try:
-                raw_result = call_apps_script('getrawsheetdata', {'sheetName': tab})
-                raw_data = raw_result.get('data', [])
-                if raw_data:
-                    raw_data_by_tab[tab] = raw_data
-            except Exception as e:
-                print(f"Error getting raw sheet data for {tab}: {e}")
-                raw_data_by_tab[tab] = []
-        
-        # Find orders matching the search term and collect their IDs
-        found_orders = {}
-        found_order_ids = set()
-        
-        for tab, orders in all_orders.items():
-            tab_found_orders = []
-            for order in orders:
-                # Search in ID, client name, and specifications
-                searchable_text = f"{order.get('id', '')} {order.get('clientName', '')} {order.get('specifications', '')}".lower()
-                if search_term.lower() in searchable_text:
-                    order['source_tab'] = tab
-                    tab_found_orders.append(order)
-                    found_order_ids.add(order.get('id', ''))
-            
-            if tab_found_orders:
-                found_orders[tab] = tab_found_orders
-        
-        if not found_orders:
-            return f"🔍 *Search Results*\nNo orders found matching '{search_term}'"
+def render_all_tabs_summary(results):
+    """Format per-tab (tab, orders, error) results as the /all summary"""
+    if any(error is not None for _, _, error in results):
+        # Partial results are not cached
+        return _format_all_tabs_summary(results)
+    version = ':'.join(content_version(('orders', tab), orders) for tab, orders, _ in results)
+    return cached_reply(('all', '*'), version, lambda: _format_all_tabs_summary(results))
+
+def _format_all_tabs_summary(results):
+    all_data = {}
+    failed_tabs = []
+    
+    for tab, orders, error in results:
+        if error is not None:
+            failed_tabs.append(tab)
+            all_data[tab] = None
+            continue
+        # Count unique orders (by ID)
+        unique_orders = set()
+        for order in orders:
+            if order.get('id'):
+                unique_orders.add(order.get('id'))
+        all_data[tab] = len(unique_orders)
+    
+    if len(failed_tabs) == len(results):
+        raise results[0][2]
+    
+    # Format summary
+    output = "📊 *Order Summary - All Tabs*\n"
+    output += "=" * 30 + "\n\n"
+    
+    for tab, count in all_data.items():
+        emoji = {
+            'Pending': '⏳',
+            'Ready': '✅',
+            'Delivered': '🚚',
+            'Completed': '🎉'
+        }.get(tab, '📋')
         
-        # Group by order ID
-        grouped_orders = {}
+        if count is None:
+            output += f"{emoji} *{tab}:* unavailable\n"
+        else:
+            output += f"{emoji} *{tab}:* {count} orders\n"
+    
+    output += "\n💡 Use /pending, /ready, /delivered, or /completed to see detailed orders."
+    
+    return output
+
+# Per-tab search index, rebuilt only when the cached tab payload changes
+_search_indexes = {}
+_search_indexes_lock = threading.Lock()
+
+def get_search_index(tab_name, orders, raw_data):
+    """Inverted index over a tab's grouped orders, reused while its payloads are unchanged"""
+    with _search_indexes_lock:
+        cached = _search_indexes.get(tab_name)
+    if cached and cached[0] is orders and cached[1] is raw_data:
+        return cached[2]
+    
+    index = OrderIndex()
+    with stage('index'):
+        for order_id, order in group_search_rows(orders, raw_data).items():
+            index.add(order_id, order, tab_name)
+    with _search_indexes_lock:
+        _search_indexes[tab_name] = (orders, raw_data, index)
+    return index
+
+def search_plan(search_term, filters=None, terms=None):
+    """(tabs to read, field filters, free-text terms) for a /search query"""
+    if filters is None and terms is None:
+        terms = search_term.split()
+    filters = dict(filters or {})
+    
+    # tab: filters pick which tabs are read at all
+    tab_filters = [value.lower() for value in filters.pop('tab', [])]
+    tabs = [tab for tab in ALL_TABS if not tab_filters or any(tab.lower().startswith(v) for v in tab_filters)]
+    return tabs, filters, terms or []
+
+def search_all_tabs(search_term, filters=None, terms=None):
+    """Search for orders across all tabs.
+
+    filters maps a field (id, client, spec, tab) to the values it must
+    match; terms are matched against ID, client name and specifications.
+    Without either, search_term is split into terms.
+    """
+    try:
+        tabs, filters, terms = search_plan(search_term, filters, terms)
         
-        # For each found order ID, collect all sizes from all tabs
-        for tab, orders in found_orders.items():
-            for order in orders:
-                order_id = order.get('id', '')
-                if not order_id:  # Skip rows without an ID
-                    continue
-                
-                # If this is a new order ID, initialize its entry
-                if order_id not in grouped_orders:
-                    grouped_orders[order_id] = {
-                        'id': order_id,
-                        'clientName': order.get('clientName', ''),
-                        'specifications': order.get('specifications', ''),
-                        'createdAt': order.get('createdAt', ''),
-                        'updatedAt': order.get('updatedAt', ''),
-                        'status': order.get('status', ''),
-                        'notes': order.get('notes', ''),
-                        'source_tab': tab,
-                        'items': []
-                    }
-                
-                # Add size/quantity if present
-                size = order.get('sizes', '')
-                qty = order.get('quantity', '')
-                
-                if size and qty:
-                    # Check if this size is already in the items list
-                    size_exists = False
-                    for item in grouped_orders[order_id]['items']:
-                        if item['sizes'] == size:
-                            size_exists = True
-                            break
-                    
-                    # Only add if this size isn't already in the items list
-                    if not size_exists:
-                        grouped_orders[order_id]['items'].append({
-                            'sizes': size,
-                            'quantity': qty
-                        })
+        # Collect orders and raw rows (to capture rows without IDs) from the tabs at once
+        results = run_concurrently([(tab, lambda tab=tab: fetch_tab(tab)) for tab in tabs])
+        return render_search_results(search_term, filters, terms, results)
         
-        # Process raw data to find additional sizes for found orders
-        for tab, raw_data in raw_data_by_tab.items():
-            if not raw_data:
-                continue
-                
-            current_id = None
-            for row in raw_data:
-                # Skip header row
-                if len(row) == 0 or row[0] == 'ID' or row[0] == 'id':
-                    continue
-                
-                # Get values from the row
-                row_id = row[0] if len(row) > 0 else ''
-                size = row[3] if len(row) > 3 else ''  # SIZES column (index 3)
-                qty = row[4] if len(row) > 4 else ''   # QUANTITY column (index 4)
-                
-                # If this row has an ID, update current_id
-                if row_id:
-                    current_id = row_id
-                    continue  # Skip processing as we already handled rows with IDs
-                
-                # If we have a current ID and this row has size/quantity but no ID
-                # AND the current ID is one of our found order IDs
-                if current_id and current_id in found_order_ids and current_id in grouped_orders and (size or qty):
-                    if size and qty:
-                        # Check if this size is already in the items list
-                        size_exists = False
-                        for item in grouped_orders[current_id]['items']:
-                            if item['sizes'] == size:
-                                size_exists = True
-                                break
-                        
-                        # Only add if this size isn't already in the items list
-                        if not size_exists:
-                            grouped_orders[current_id]['items'].append({
-                                'sizes': size,
-                                'quantity': qty
-                            })
+    except Exception as e:
+        logger.error("Error searching all tabs", error=str(e))
+        return f"❌ Error searching orders: {str(e)}"
+
+def render_search_results(search_term, filters, terms, results):
+    """Match per-tab (tab, (orders, raw_rows), error) results against the query and format them"""
+    failed_tabs = []
+    
+    if results and all(error is not None for _, _, error in results):
+        raise results[0][2]
+    
+    # Look up matches in each tab's index and merge them by order ID, in tab order
+    merged = OrderGrouper()
+    for tab, data, error in results:
+        if error is not None:
+            failed_tabs.append(tab)
+            continue
+        index = get_search_index(tab, *data)
+        with stage('search'):
+            for order_id in index.search(filters, terms):
+                order = index.orders[order_id]
+                merged.start_order(order_id, order.fields(), source_tab=tab)
+                for item in order.items:
+                    merged.add_item(order_id, item.sizes, item.quantity)
+    grouped_orders = merged.orders
+    
+    failed_note = f"\n⚠️ Could not read: {', '.join(failed_tabs)}" if failed_tabs else ''
+    with stage('render'):
+        return _format_search_results(search_term, grouped_orders, failed_note)
+
+def _format_search_results(search_term, grouped_orders, failed_note):
+    if not grouped_orders:
+        return f"🔍 *Search Results*\nNo orders found matching '{search_term}'" + failed_note
+    
+    # Format results
+    output = f"*Search Results for '{search_term}'*\n"
+    output += f"*Found {len(grouped_orders)} orders*\n"
+    output += "*" + "=" * 40 + "*\n\n"
+    
+    for order_id, order in grouped_orders.items():
+        tab_display_names = {
+            'Pending': 'Pending Orders',
+            'Ready': 'Ready Orders', 
+            'Delivered': 'Glass Delivered',
+            'Completed': 'Completed Orders'
+        }
+        display_name = tab_display_names.get(order.source_tab, f"{order.source_tab} Orders")
         
-        # Format results
-        output = f"*Search Results for '{search_term}'*\n"
-        output += f"*Found {len(grouped_orders)} orders*\n"
-        output += "*" + "=" * 40 + "*\n\n"
+        output += f"*{display_name}*\n"
+        output += f"*Order ID:* {order_id}\n"
+        output += f"*Client:* {order.client_name}\n"
+        output += f"*Specs:* {order.specifications}\n"
         
-        for order_id, order in grouped_orders.items():
-            tab_display_names = {
-                'Pending': 'Pending Orders',
-                'Ready': 'Ready Orders', 
-                'Delivered': 'Glass Delivered',
-                'Completed': 'Completed Orders'
-            }
-            display_name = tab_display_names.get(order['source_tab'], f"{order['source_tab']} Orders")
-            
-            output += f"*{display_name}*\n"
-            output += f"*Order ID:* {order_id}\n"
-            output += f"*Client:* {order['clientName']}\n"
-            output += f"*Specs:* {order['specifications']}\n"
-            
-            if order['items']:
-                output += "*Items:*\n"
-                for item in order['items']:
-                    if item['sizes'] and item['quantity']:
-                        output += f"  • {item['sizes']} - Qty: {item['quantity']}\n"
-            
-            if order['createdAt']:
-                output += f"*Created:* {format_date_only(order['createdAt'])}\n"
-            if order['updatedAt'] and order['updatedAt'] != order['createdAt']:
-                output += f"*Updated:* {format_date_only(order['updatedAt'])}\n"
-            
-            output += "\n*" + "-" * 30 + "*\n\n"
+        if order.items:
+            output += "*Items:*\n"
+            for item in order.items:
+                output += f"  • {item.sizes} - Qty: {item.quantity}\n"
         
-        return output
+        if order.created_at:
+            output += f"*Created:* {order.created}\n"
+        if order.updated_at and order.updated_at != order.created_at:
+            output += f"*Updated:* {order.updated}\n"
         
-    except Exception as e:
-        print(f"Error searching all tabs: {e}")
-        return f"❌ Error searching orders: {str(e)}"
+        output += "\n*" + "-" * 30 + "*\n\n"
+    
+    return output + failed_note
 
 def show_help():
     """Show help message with all available commands"""
@@ -366,6 +1061,7 @@ def show_help():
 • `/delivered` - Show all delivered orders
 • `/completed` - Show all completed orders
 • `/all` - Show summary of all tabs
+• `/pending 2`, `/pending next` - Page through a long tab
 
 🔍 *Search & Status:*
 • `/search [term]` - Search orders by ID, client name, or specs
@@ -415,95 +1111,186 @@ Examples:
 • `/search 123456` - Find order with ID "123456"
 • `/search glass` - Find orders with "glass" in specifications
 
+Filters (can be combined with each other and with plain words):
+• `/search client:"John Doe"` - Client name only
+• `/search spec:10mm` - Specifications only
+• `/search id:123456` - Order ID only
+• `/search tab:ready` - Only look in one tab
+
 💡 Searches across all tabs (Pending, Ready, Delivered, Completed)
 """
 
-def add_order(order_info):
-    """Add a new order to the Pending sheet via Apps Script"""
-    try:
-        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        client_name = order_info.get('client_name', '')
-        glass_specs = order_info.get('glass_specs', '')
-        sizes = order_info.get('sizes', [])
-        quantities = order_info.get('quantities', [])
-        # Use invoice number as order ID if present, else generate random
-        order_id = order_info.get('invoice_number') or str(random.randint(100000, 999999))
-        
-        # Prepare order data in Apps Script format
-        orders = []
-        
-        # If there are no sizes or quantities, add a single row with just the client and specs
-        if not sizes and not quantities:
+def order_added_reply(order_info, order_id):
+    """Confirmation message for a newly added order"""
+    # Create success message
+    client_name = order_info.get('client_name', 'UNKNOWN')
+    
+    success_msg = f"✅ Order added successfully!\n\n"
+    success_msg += f"Client: {client_name}\n"
+    success_msg += f"Order ID: {order_id}\n"
+    
+    # Add extracted details if available
+    if order_info.get('product'):
+        success_msg += f"Product: {order_info['product']}\n"
+    if order_info.get('quantity'):
+        success_msg += f"Quantity: {order_info['quantity']}\n"
+    if order_info.get('price'):
+        success_msg += f"Price: {order_info['price']}\n"
+    
+    return success_msg
+
+def orders_added_reply(orders):
+    """Confirmation message for several orders from one message, as [(order_info, order_id)]"""
+    if len(orders) == 1:
+        return order_added_reply(*orders[0])
+    success_msg = f"✅ {len(orders)} orders added successfully!\n\n"
+    for number, (order_info, order_id) in enumerate(orders, 1):
+        sizes = len(order_info.get('sizes') or [])
+        size_note = f" ({sizes} size{'s' if sizes != 1 else ''})" if sizes else ''
+        success_msg += f"{number}. Order ID: {order_id} - Client: {order_info.get('client_name', 'UNKNOWN')}{size_note}\n"
+    return success_msg
+
+# IDs for new orders, unique across worker processes and restarts
+_order_ids = OrderIdAllocator()
+
+def next_order_id():
+    return _order_ids.next_id()
+
+def new_order_ids(order_infos):
+    """An order ID per order info: its invoice number, or a new ID (new IDs are taken in one counter update)"""
+    missing = sum(1 for order_info in order_infos if not order_info.get('invoice_number'))
+    new_ids = iter(_order_ids.allocate(missing) if missing else [])
+    return [order_info.get('invoice_number') or next(new_ids) for order_info in order_infos]
+
+def build_orders_rows(order_infos):
+    """(order_id, rows) for each order info, as build_order_rows, allocating their new IDs at once"""
+    return [build_order_rows(order_info, order_id)
+            for order_info, order_id in zip(order_infos, new_order_ids(order_infos))]
+
+def build_order_rows(order_info, order_id=None):
+    """Turn extracted order info into (order_id, rows) in Apps Script format; a new ID is allocated unless order_id is given"""
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    client_name = order_info.get('client_name', '')
+    glass_specs = order_info.get('glass_specs', '')
+    sizes = order_info.get('sizes', [])
+    quantities = order_info.get('quantities', [])
+    # Use invoice number as order ID if present, else allocate a new one
+    order_id = order_id or order_info.get('invoice_number') or next_order_id()
+    
+    # Prepare order data in Apps Script format
+    orders = []
+    
+    # If there are no sizes or quantities, add a single row with just the client and specs
+    if not sizes and not quantities:
+        order_data = {
+            'id': order_id,
+            'clientName': client_name,
+            'specifications': glass_specs,
+            'sizes': '',
+            'quantity': '',
+            'status': 'Pending',
+            'notes': '',
+            'createdAt': now,
+            'updatedAt': now
+        }
+        orders.append(order_data)
+    else:
+        # Add a row for each size/quantity pair
+        for i in range(max(len(sizes), len(quantities))):
+            size = sizes[i] if i < len(sizes) else ''
+            qty = quantities[i] if i < len(quantities) else ''
+            
             order_data = {
-                'id': order_id,
-                'clientName': client_name,
-                'specifications': glass_specs,
-                'sizes': '',
-                'quantity': '',
+                'id': order_id,  # Use invoice number or generated ID
+                'clientName': client_name,  # Include client name on every row
+                'specifications': glass_specs,  # Include specs on every row
+                'sizes': size,
+                'quantity': qty,
                 'status': 'Pending',
                 'notes': '',
                 'createdAt': now,
                 'updatedAt': now
             }
             orders.append(order_data)
-        else:
-            # Add a row for each size/quantity pair
-            for i in range(max(len(sizes), len(quantities))):
-                size = sizes[i] if i < len(sizes) else ''
-                qty = quantities[i] if i < len(quantities) else ''
-                
-                order_data = {
-                    'id': order_id,  # Use invoice number or generated ID
-                    'clientName': client_name,  # Include client name on every row
-                    'specifications': glass_specs,  # Include specs on every row
-                    'sizes': size,
-                    'quantity': qty,
-                    'status': 'Pending',
-                    'notes': '',
-                    'createdAt': now,
-                    'updatedAt': now
-                }
-                orders.append(order_data)
-        
-        # Sync to Apps Script, always specify Pending as the target sheet
-        result = call_apps_script('syncToSheets', {'orders': orders, 'targetSheetName': 'Pending'})
+    
+    return order_id, orders
+
+def sync_order_rows(rows):
+    """Write order rows to the Pending sheet in one syncToSheets call"""
+    # Sync to Apps Script, always specify Pending as the target sheet
+    try:
+        return call_apps_script('syncToSheets', {'orders': rows, 'targetSheetName': 'Pending'})
+    finally:
+        invalidate_tabs('Pending')
+
+def add_order(order_info):
+    """Add a new order to the Pending sheet via Apps Script"""
+    try:
+        order_id, orders = build_order_rows(order_info)
+        sync_order_rows(orders)
         return order_id
         
     except Exception as e:
-        print(f"Error adding order: {e}")
+        logger.error("Error adding order", error=str(e))
+        raise
+
+def add_orders(order_infos):
+    """Add several orders to the Pending sheet in one syncToSheets call; returns their order IDs"""
+    try:
+        built = build_orders_rows(order_infos)
+        sync_order_rows([row for _, rows in built for row in rows])
+        return [order_id for order_id, _ in built]
+    except Exception as e:
+        logger.error("Error adding orders", orders=len(order_infos), error=str(e))
         raise
 
 def query_orders(query):
     """Query orders from the default sheet"""
+    return query_orders_with_version(query)[0]
+
+def query_orders_with_version(query):
+    """(reply, content version of the default sheet); the version is the /api/orders ETag"""
     try:
-        data = get_sheet()
-        if not data:
-            return 'No orders found.'
-        
-        # Filter based on query parameters
-        filtered_data = data
-        if 'status' in query:
-            filtered_data = [order for order in filtered_data if order.get('status', '').lower() == query['status'].lower()]
-        if 'client_name' in query:
-            filtered_data = [order for order in filtered_data if query['client_name'].lower() in order.get('clientName', '').lower()]
-        
-        if not filtered_data:
-            return 'No orders found matching the criteria.'
-        
-        # Return a summary string for WhatsApp
-        summary = f"Found {len(filtered_data)} orders:\n"
-        for order in filtered_data:
-            summary += f"\nClient: {order.get('clientName', 'N/A')}\n"
-            summary += f"Specs: {order.get('specifications', 'N/A')}\n"
-            summary += f"Sizes: {order.get('sizes', 'N/A')}\n"
-            summary += f"Qty: {order.get('quantity', 'N/A')}\n"
-            summary += f"Status: {order.get('status', 'N/A')}\n---"
-        
-        return summary
-        
+        return query_results_with_version(default_sheet_payload(), query)
+
     except Exception as e:
-        print(f"Error querying orders: {e}")
-        return f"Error querying orders: {str(e)}"
+        logger.error("Error querying orders", error=str(e))
+        return f"Error querying orders: {str(e)}", None
+
+def query_results_with_version(data, query):
+    """(reply, content version) for query over the default sheet's orders"""
+    return render_query_results(data, query), content_version(('default', DEFAULT_TAB), data)
+
+def render_query_results(data, query):
+    """Filter default-sheet orders by a /status query and format them"""
+    version = content_version(('default', DEFAULT_TAB), data)
+    key = ('query', DEFAULT_TAB, tuple(sorted(query.items())))
+    return cached_reply(key, version, lambda: _format_query_results(data, query))
+
+def _format_query_results(data, query):
+    if not data:
+        return 'No orders found.'
+    
+    # Filter based on query parameters
+    filtered_data = data
+    if 'status' in query:
+        filtered_data = [order for order in filtered_data if order.get('status', '').lower() == query['status'].lower()]
+    if 'client_name' in query:
+        filtered_data = [order for order in filtered_data if query['client_name'].lower() in order.get('clientName', '').lower()]
+    
+    if not filtered_data:
+        return 'No orders found matching the criteria.'
+    
+    # Return a summary string for WhatsApp
+    summary = f"Found {len(filtered_data)} orders:\n"
+    for order in filtered_data:
+        summary += f"\nClient: {order.get('clientName', 'N/A')}\n"
+        summary += f"Specs: {order.get('specifications', 'N/A')}\n"
+        summary += f"Sizes: {order.get('sizes', 'N/A')}\n"
+        summary += f"Qty: {order.get('quantity', 'N/A')}\n"
+        summary += f"Status: {order.get('status', 'N/A')}\n---"
+    
+    return summary
 
 def update_order_status(params):
     """Update order status via Apps Script"""
@@ -511,16 +1298,21 @@ def update_order_status(params):
         if 'order_id' in params:
             # Normalize status to match sheet names
             status = params['status'].strip().capitalize()
-            result = call_apps_script('updateOrderStatusAndMove', {
-                'orderId': params['order_id'],
-                'newStatus': status
-            })
+            # Source tab(s) must be looked up before the move changes them
+            source_tabs = tabs_holding_order(params['order_id'])
+            try:
+                result = call_apps_script('updateOrderStatusAndMove', {
+                    'orderId': params['order_id'],
+                    'newStatus': status
+                })
+            finally:
+                invalidate_tabs(status, *source_tabs)
             return True
         else:
-            print("Warning: update_order_status called without order_id")
+            logger.warning("update_order_status called without order_id")
             return False
     except Exception as e:
-        print(f"Error updating order status: {e}")
+        logger.error("Error updating order status", error=str(e))
         return False
 
 def get_orders_json():
@@ -528,16 +1320,15 @@ def get_orders_json():
     try:
         return get_sheet()
     except Exception as e:
-        print(f"Error getting orders JSON: {e}")
+        logger.error("Error getting orders JSON", error=str(e))
         return []
 
 def get_orders_from_sheet(sheet_name):
     """Get all orders from a specific sheet as JSON"""
     try:
-        result = call_apps_script('getOrdersFromSheet', {'sheetName': sheet_name})
-        return result.get('data', [])
+        return list(fetch_orders(sheet_name))
     except Exception as e:
-        print(f"Error getting orders from sheet {sheet_name}: {e}")
+        logger.error("Error getting orders from sheet", tab=sheet_name, error=str(e))
         return []
 
 def get_available_sheet_names():
@@ -546,7 +1337,7 @@ def get_available_sheet_names():
         result = call_apps_script('getAvailableSheets')
         return result.get('data', ['Pending', 'Ready', 'Delivered', 'Completed', 'Orders'])
     except Exception as e:
-        print(f"Error getting available sheets: {e}")
+        logger.error("Error getting available sheets", error=str(e))
         return ['Pending', 'Ready', 'Delivered', 'Completed', 'Orders']
 
 def update_order_details(order):
@@ -554,21 +1345,25 @@ def update_order_details(order):
     try:
         # For now, we'll use the status update mechanism
         if 'ID' in order and 'Status' in order:
-            result = call_apps_script('updateOrderStatusAndMove', {
-                'orderId': order['ID'],
-                'newStatus': order['Status']
-            })
+            source_tabs = tabs_holding_order(order['ID'])
+            try:
+                result = call_apps_script('updateOrderStatusAndMove', {
+                    'orderId': order['ID'],
+                    'newStatus': order['Status']
+                })
+            finally:
+                invalidate_tabs(str(order['Status']).strip().capitalize(), *source_tabs)
             return True
         return False
     except Exception as e:
-        print(f"Error updating order details: {e}")
+        logger.error("Error updating order details", error=str(e))
         return False
 
 def create_order(order):
     """Create a new order via Apps Script"""
     try:
         now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        order_id = order.get('ID') or str(random.randint(100000, 999999))
+        order_id = order.get('ID') or next_order_id()
         
         order_data = {
             'id': order_id,
@@ -582,18 +1377,22 @@ def create_order(order):
             'updatedAt': now
         }
         
-        result = call_apps_script('syncToSheets', {'orders': [order_data]})
+        try:
+            result = call_apps_script('syncToSheets', {'orders': [order_data]})
+        finally:
+            # syncToSheets without a target sheet writes to the default tab
+            invalidate_tabs(DEFAULT_TAB)
         return True
     except Exception as e:
-        print(f"Error creating order: {e}")
+        logger.error("Error creating order", error=str(e))
         return False
 
 def delete_order(order):
     """Delete order - this would need to be implemented in Apps Script"""
     try:
         # This functionality would need to be added to the Apps Script
-        print("Delete order functionality not yet implemented in Apps Script")
+        logger.warning("Delete order functionality not yet implemented in Apps Script")
         return False
     except Exception as e:
-        print(f"Error deleting order: {e}")
+        logger.error("Error deleting order", error=str(e))
         return False 
\ No newline at end of file
@@ -0,0 +1,294 @@
+import asyncio
+import os
+import time
+
+import httpx
+
+import sheets
+from logs import get_logger
+from metrics import APPS_SCRIPT_ERRORS, APPS_SCRIPT_IN_FLIGHT, APPS_SCRIPT_LATENCY
+from timing import record_stage
+from sheets import (
+    AppsScriptError, APPS_SCRIPT_CONNECT_TIMEOUT, APPS_SCRIPT_READ_TIMEOUT, APPS_SCRIPT_POOL_SIZE,
+    APPS_SCRIPT_MAX_RETRIES, RETRY_STATUS_CODES, DEFAULT_TAB, ALL_TABS,
+)
+
+logger = get_logger('sheets_async')
+
+# Most Apps Script calls allowed in flight at once per worker; the rest wait their turn
+APPS_SCRIPT_MAX_CONCURRENCY = int(os.environ.get('APPS_SCRIPT_MAX_CONCURRENCY', 100))
+
+_client = None
+_semaphore = None
+
+async def _count_response(response):
+    # Same counter as the requests session hook, so /api/apps_script_stats covers both clients
+    sheets.count_client_stat('requests')
+
+async def _count_connection(event_name, info):
+    # httpcore trace event; fires only when a request has to open a new connection
+    if event_name == 'connection.connect_tcp.complete':
+        sheets.count_client_stat('connections_opened')
+
+async def _trace_connections(request):
+    # Set on every request, redirect hops included, like the sync client's counting pools
+    request.extensions['trace'] = _count_connection
+
+def get_async_client():
+    """Shared keep-alive client for the async Apps Script calls"""
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(APPS_SCRIPT_READ_TIMEOUT, connect=APPS_SCRIPT_CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=APPS_SCRIPT_MAX_CONCURRENCY,
+                                max_keepalive_connections=APPS_SCRIPT_POOL_SIZE),
+            # Apps Script answers a POST with a redirect to script.googleusercontent.com
+            follow_redirects=True,
+            event_hooks={'request': [_trace_connections], 'response': [_count_response]},
+        )
+    return _client
+
+def _get_semaphore():
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(APPS_SCRIPT_MAX_CONCURRENCY)
+    return _semaphore
+
+async def close_async_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+async def call_apps_script_async(action, data=None):
+    """Async counterpart of sheets.call_apps_script (same retry policy, errors and metrics)"""
+    started = time.perf_counter()
+    APPS_SCRIPT_IN_FLIGHT.inc()
+    try:
+        payload = {
+            'action': action,
+            'data': data or {}
+        }
+        retries_left = APPS_SCRIPT_MAX_RETRIES if sheets.is_retryable(action, data) else 0
+        attempt = 0
+
+        while True:
+            try:
+                async with _get_semaphore():
+                    response = await get_async_client().post(sheets.APPS_SCRIPT_URL, json=payload)
+            except httpx.TransportError as e:
+                if attempt >= retries_left:
+                    raise
+                delay = sheets.backoff_delay(attempt)
+                logger.warning("Apps Script call failed, retrying", action=action, error=str(e), retry_in=round(delay, 2))
+            else:
+                if response.status_code not in RETRY_STATUS_CODES or attempt >= retries_left:
+                    break
+                delay = sheets.backoff_delay(attempt, response)
+                logger.warning("Apps Script returned a retryable status", action=action, status=response.status_code, retry_in=round(delay, 2))
+            attempt += 1
+            sheets.count_client_stat('retries')
+            await asyncio.sleep(delay)
+
+        response.raise_for_status()
+
+        result = response.json()
+        if not result.get('success'):
+            raise AppsScriptError(f"Apps Script error: {result.get('message', 'Unknown error')}")
+
+        return result
+    except Exception as e:
+        APPS_SCRIPT_ERRORS.inc(action=action, kind=sheets.error_kind(e))
+        logger.error("Error calling Apps Script", action=action, error=str(e))
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        APPS_SCRIPT_IN_FLIGHT.dec()
+        APPS_SCRIPT_LATENCY.observe(elapsed, action=action)
+        record_stage(f'apps_script.{action}', elapsed)
+
+async def _call_individually(calls):
+    return await asyncio.gather(*(call_apps_script_async(action, data) for action, data in calls),
+                                return_exceptions=True)
+
+async def call_apps_script_batch_async(calls):
+    """Async counterpart of sheets.call_apps_script_batch"""
+    if not sheets.should_batch(calls):
+        return await _call_individually(calls)
+
+    try:
+        result = await call_apps_script_async('batch', sheets.batch_payload(calls))
+    except httpx.TransportError:
+        raise
+    except Exception as e:
+        sheets.batch_failed(e)
+        return await _call_individually(calls)
+
+    results = sheets.batch_results(calls, result)
+    return results if results is not None else await _call_individually(calls)
+
+async def _cached_read_many(reads):
+    if sheets.sheet_mirror:
+        # SQLite reads (and any sync they trigger) stay off the event loop
+        return await asyncio.to_thread(sheets._cached_read_many, reads)
+    values, misses = sheets.cache_lookup(reads)
+    if misses:
+        # Shares in-flight reads with other requests, as in sheets._cached_read_many
+        fetch, waits, lead, generations = sheets.claim_reads(reads, misses)
+        results = []
+        try:
+            results = await call_apps_script_batch_async([(reads[i][1], reads[i][3]) for i in fetch]) if fetch else []
+        except Exception as e:
+            results = [e] * len(fetch)
+        finally:
+            sheets.land_reads(reads, values, fetch, results, lead, generations)
+        for index, flight in waits:
+            values[index] = await asyncio.wrap_future(flight)
+    return values
+
+async def _cached_read(read):
+    value = (await _cached_read_many([read]))[0]
+    if isinstance(value, Exception):
+        raise value
+    return value
+
+async def fetch_tab_async(tab_name):
+    return sheets.tab_payloads(tab_name, await _cached_read_many(sheets.tab_reads(tab_name)))
+
+async def fetch_orders_async(tab_name):
+    return await _cached_read(sheets.orders_read(tab_name))
+
+async def _gather_tabs(tabs, fetch):
+    """[(tab, value, error)] in tab order, like sheets.run_concurrently"""
+    values = await asyncio.gather(*(fetch(tab) for tab in tabs), return_exceptions=True)
+    return [(tab, None, value) if isinstance(value, Exception) else (tab, value, None)
+            for tab, value in zip(tabs, values)]
+
+async def get_tab_data_async(tab_name, page=None, sender=None):
+    try:
+        orders, raw_data = await fetch_tab_async(tab_name)
+        # Rendering reads and moves the sender's page cursor in SQLite
+        return await asyncio.to_thread(sheets.render_tab_data, tab_name, orders, raw_data, page, sender)
+    except Exception as e:
+        logger.error("Error getting tab data", tab=tab_name, error=str(e))
+        return f"❌ Error retrieving {tab_name} data: {str(e)}"
+
+async def get_all_tabs_data_async():
+    try:
+        results = await _gather_tabs(ALL_TABS, fetch_orders_async)
+        # Grouping and formatting every tab is CPU work; keep it off the event loop
+        return await asyncio.to_thread(sheets.render_all_tabs_summary, results)
+    except Exception as e:
+        logger.error("Error getting all tabs data", error=str(e))
+        return f"❌ Error retrieving summary data: {str(e)}"
+
+async def search_all_tabs_async(search_term, filters=None, terms=None):
+    try:
+        tabs, filters, terms = sheets.search_plan(search_term, filters, terms)
+        results = await _gather_tabs(tabs, fetch_tab_async)
+        return await asyncio.to_thread(sheets.render_search_results, search_term, filters, terms, results)
+    except Exception as e:
+        logger.error("Error searching all tabs", error=str(e))
+        return f"❌ Error searching orders: {str(e)}"
+
+async def default_sheet_payload_async():
+    try:
+        return await _cached_read(('default', 'getOrders', DEFAULT_TAB, None))
+    except Exception as e:
+        logger.error("Error getting sheet data", error=str(e))
+        return []
+
+async def get_sheet_async():
+    return list(await default_sheet_payload_async())
+
+async def query_orders_async(query):
+    return (await query_orders_with_version_async(query))[0]
+
+async def query_orders_with_version_async(query):
+    try:
+        data = await default_sheet_payload_async()
+        # Rendering scans the whole tab and the version hashes it; keep both off the event loop
+        return await asyncio.to_thread(sheets.query_results_with_version, data, query)
+    except Exception as e:
+        logger.error("Error querying orders", error=str(e))
+        return f"Error querying orders: {str(e)}", None
+
+async def probe_apps_script_async():
+    """Async counterpart of sheets.probe_apps_script"""
+    report = sheets.cached_probe()
+    if report:
+        return report
+    if not sheets.APPS_SCRIPT_URL:
+        return sheets.probe_report(0, 'APPS_SCRIPT_URL is not set')
+    started = time.perf_counter()
+    try:
+        response = await get_async_client().post(
+            sheets.APPS_SCRIPT_URL, json={'action': sheets.PROBE_ACTION, 'data': {}},
+            timeout=httpx.Timeout(sheets.READINESS_TIMEOUT,
+                                  connect=min(APPS_SCRIPT_CONNECT_TIMEOUT, sheets.READINESS_TIMEOUT))
+        )
+        sheets.check_probe_response(response)
+    except Exception as e:
+        return sheets.probe_report(time.perf_counter() - started, e)
+    return sheets.probe_report(time.perf_counter() - started)
+
+async def warm_connection_async():
+    """Async counterpart of sheets.warm_connection"""
+    report = await probe_apps_script_async()
+    if not report['ready']:
+        raise AppsScriptError(report['error'])
+
+async def prefetch_tabs_async():
+    """Async counterpart of sheets.prefetch_tabs"""
+    results = await _gather_tabs(sheets.ALL_TABS, fetch_tab_async)
+    failed = [tab for tab, _, error in results if error is not None]
+    if failed:
+        raise AppsScriptError(f"Could not read: {', '.join(failed)}")
+
+def warm_up_steps_async():
+    """(name, function) steps for warmup.BootWarmup.run_async"""
+    return [('connect', warm_connection_async), ('prefetch', prefetch_tabs_async)]
+
+async def sync_order_rows_async(rows):
+    try:
+        return await call_apps_script_async('syncToSheets', {'orders': rows, 'targetSheetName': 'Pending'})
+    finally:
+        sheets.invalidate_tabs('Pending')
+
+async def add_order_async(order_info):
+    try:
+        # Allocating the ID takes the counter file lock and fsyncs
+        order_id, rows = await asyncio.to_thread(sheets.build_order_rows, order_info)
+        await sync_order_rows_async(rows)
+        return order_id
+    except Exception as e:
+        logger.error("Error adding order", error=str(e))
+        raise
+
+async def add_orders_async(order_infos):
+    try:
+        built = await asyncio.to_thread(sheets.build_orders_rows, order_infos)
+        await sync_order_rows_async([row for _, rows in built for row in rows])
+        return [order_id for order_id, _ in built]
+    except Exception as e:
+        logger.error("Error adding orders", orders=len(order_infos), error=str(e))
+        raise
+
+async def update_order_status_async(params):
+    try:
+        if 'order_id' not in params:
+            logger.warning("update_order_status called without order_id")
+            return False
+        status = params['status'].strip().capitalize()
+        source_tabs = await asyncio.to_thread(sheets.tabs_holding_order, params['order_id'])
+        try:
+            await call_apps_script_async('updateOrderStatusAndMove', {
+                'orderId': params['order_id'],
+                'newStatus': status
+            })
+        finally:
+            sheets.invalidate_tabs(status, *source_tabs)
+        return True
+    except Exception as e:
+        logger.error("Error updating order status", error=str(e))
+        return False
@@ -0,0 +1,59 @@
+import logging
+import os
+import sqlite3
+
+# Every worker process keeps its own tab cache, so a write handled by one
+# worker must reach the others: each write bumps the tab's counter here, and
+# a cached tab is only served while its counter is unchanged. Kept in SQLite
+# so every worker process on the host sees the same counters; empty = each
+# worker only sees its own writes (fine with a single worker).
+SHEETS_CACHE_SHARED_PATH = os.environ.get('SHEETS_CACHE_SHARED_PATH', 'sheets_cache.db')
+
+# Stdlib logger so this module stays importable on its own, as in extraction.py
+logger = logging.getLogger('glassbot.tab_generations')
+
+class TabGenerations:
+    """Per-tab invalidation counters shared by worker processes.
+
+    A connection is opened per call, as in PageCursors. get() returns None
+    when the store cannot be read, which never equals a stored generation,
+    so callers stop caching rather than serve a tab another worker wrote.
+    """
+
+    def __init__(self, path=SHEETS_CACHE_SHARED_PATH):
+        self.path = path
+        self._schema_ready = False
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=5)
+        if not self._schema_ready:
+            with db:
+                db.execute('CREATE TABLE IF NOT EXISTS tab_generations (tab TEXT PRIMARY KEY, generation INTEGER)')
+            self._schema_ready = True
+        return db
+
+    def get(self, tab):
+        """The tab's counter (0 if it was never bumped), or None if the store is unreadable"""
+        try:
+            db = self._connect()
+            try:
+                row = db.execute('SELECT generation FROM tab_generations WHERE tab = ?', (tab,)).fetchone()
+            finally:
+                db.close()
+        except sqlite3.Error as e:
+            logger.warning("Could not read shared tab generation", extra={'fields': {'tab': tab, 'error': str(e)}})
+            return None
+        return row[0] if row else 0
+
+    def bump(self, tab):
+        """Mark tab as written, so every worker drops its cached copy"""
+        try:
+            db = self._connect()
+            try:
+                with db:
+                    db.execute('INSERT INTO tab_generations (tab, generation) VALUES (?, 1) '
+                               'ON CONFLICT(tab) DO UPDATE SET generation = generation + 1', (tab,))
+            finally:
+                db.close()
+        except sqlite3.Error as e:
+            logger.error("Could not share tab invalidation", extra={'fields': {'tab': tab, 'error': str(e)}})
@@ -0,0 +1,123 @@
+import contextlib
+import contextvars
+import os
+import random
+import re
+import threading
+import time
+
+# Opt-in per-request stage timings (Server-Timing header and a log line) and
+# cProfile dumps. When a request is not timed, stage() costs one context
+# variable lookup; when profiling is off, nothing is started at all.
+REQUEST_TIMING = os.environ.get('REQUEST_TIMING', 'false').lower() in ('1', 'true', 'yes')
+REQUEST_TIMING_HEADER = 'X-Request-Timing'
+
+# Profiles are written here; profiling is off unless this is set
+PROFILE_DIR = os.environ.get('PROFILE_DIR', '')
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+PROFILE_HEADER = 'X-Profile'
+
+_timings_var = contextvars.ContextVar('request_timings', default=None)
+
+def header_flag(value):
+    return (value or '').lower() in ('1', 'true', 'yes')
+
+class RequestTimings:
+    """Total time and call count per stage for one request.
+
+    Stages may overlap: Apps Script calls made in parallel each add their
+    own time, and render includes the grouping done while rendering.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds):
+        with self._lock:
+            total, count = self.stages.get(name, (0.0, 0))
+            self.stages[name] = (total + seconds, count + 1)
+
+    def summary(self):
+        """{stage: milliseconds} plus the request total, for the log line"""
+        with self._lock:
+            stages = {name: round(total * 1000, 1) for name, (total, _) in self.stages.items()}
+        stages['total'] = round((time.perf_counter() - self.started) * 1000, 1)
+        return stages
+
+    def server_timing(self):
+        """Server-Timing header value, e.g. parse;dur=0.1, apps_script.getOrders;dur=412.5;desc="2 calls", total;dur=420.3"""
+        with self._lock:
+            stages = list(self.stages.items())
+        entries = []
+        for name, (total, count) in stages:
+            entry = f'{name};dur={total * 1000:.1f}'
+            if count > 1:
+                entry += f';desc="{count} calls"'
+            entries.append(entry)
+        entries.append(f'total;dur={(time.perf_counter() - self.started) * 1000:.1f}')
+        return ', '.join(entries)
+
+def start_request_timing(requested=False):
+    """Bind a RequestTimings to the current request if timing is on (REQUEST_TIMING or the request header)"""
+    timings = RequestTimings() if REQUEST_TIMING or requested else None
+    # Always set, so a worker thread does not carry the previous request's timings
+    _timings_var.set(timings)
+    return timings
+
+def record_stage(name, seconds):
+    timings = _timings_var.get()
+    if timings is not None:
+        timings.add(name, seconds)
+
+class _Stage:
+    __slots__ = ('timings', 'name', 'started')
+
+    def __init__(self, timings, name):
+        self.timings = timings
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.timings.add(self.name, time.perf_counter() - self.started)
+
+_NOT_TIMED = contextlib.nullcontext()
+
+def stage(name):
+    """with stage('group'): ... adds the block's time to the current request's timings, if any"""
+    timings = _timings_var.get()
+    return _NOT_TIMED if timings is None else _Stage(timings, name)
+
+# cProfile can only profile one request at a time in a process
+_profile_lock = threading.Lock()
+
+def start_profile(requested=False):
+    """A running cProfile.Profile for this request, or None.
+
+    Requires PROFILE_DIR; then a request is profiled when it asks for it
+    (X-Profile: 1) or is sampled at PROFILE_SAMPLE_RATE. Only the calling
+    thread is profiled.
+    """
+    if not PROFILE_DIR or not (requested or (PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE)):
+        return None
+    if not _profile_lock.acquire(blocking=False):
+        return None
+    import cProfile  # only loaded once profiling is used
+    profile = cProfile.Profile()
+    profile.enable()
+    return profile
+
+def finish_profile(profile, label):
+    """Stop profile and write it to PROFILE_DIR; returns the file path (open it with pstats or snakeviz)"""
+    try:
+        profile.disable()
+    finally:
+        _profile_lock.release()
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    safe_label = re.sub(r'[^A-Za-z0-9_-]+', '_', label).strip('_')
+    path = os.path.join(PROFILE_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{safe_label}.prof")
+    profile.dump_stats(path)
+    return path
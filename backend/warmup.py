@@ -0,0 +1,110 @@
+import inspect
+import logging
+import os
+import threading
+import time
+
+# Boot warmup: right after a worker starts it opens its Apps Script connection
+# (TLS handshake included) and reads the order tabs into the cache in the
+# background, so the first command after a deploy or cold start does not pay
+# for either. /api/ready answers 503 "warming" until the warmup has finished,
+# or for at most WARMUP_TIMEOUT seconds when Apps Script is slow.
+BOOT_WARMUP = os.environ.get('BOOT_WARMUP', 'true').lower() in ('1', 'true', 'yes')
+WARMUP_TIMEOUT = float(os.environ.get('WARMUP_TIMEOUT', 30))
+
+# app.py and asgi.py import this module first, so this is close to when the server began loading
+IMPORT_STARTED = time.perf_counter()
+
+# Stdlib logger so this module stays importable on its own, as in extraction.py
+logger = logging.getLogger('glassbot.warmup')
+
+def _ms(seconds):
+    return round(seconds * 1000, 1)
+
+class BootWarmup:
+    """Runs a worker's boot steps once and times them.
+
+    steps are (name, function) pairs run in order; with run_async a function
+    may return an awaitable. A failing step is logged and the next one still
+    runs, since requests work without the warmup, only slower. The breakdown
+    (imports, each step, total since loading began) is logged as "Startup
+    timing" and kept in timings.
+    """
+
+    def __init__(self, enabled=BOOT_WARMUP, timeout=WARMUP_TIMEOUT, started=IMPORT_STARTED):
+        self.enabled = enabled
+        self.timeout = timeout
+        self.started = started
+        self.timings = {}  # stage -> milliseconds
+        self.errors = {}  # step name -> error message
+        self._began = None
+        self._done = threading.Event()
+
+    def imported(self):
+        """Record the end of module loading (call once at the bottom of the server module)"""
+        self.timings['imports'] = _ms(time.perf_counter() - self.started)
+
+    def start(self, steps):
+        """Run steps on a background thread; returns at once"""
+        self._began = time.perf_counter()
+        if not self.enabled:
+            self._finish()
+            return
+        threading.Thread(target=self._run, args=(steps,), name='boot-warmup', daemon=True).start()
+
+    def _run(self, steps):
+        try:
+            for name, func in steps:
+                step_started = time.perf_counter()
+                try:
+                    func()
+                except Exception as e:
+                    self._failed(name, e)
+                self.timings[name] = _ms(time.perf_counter() - step_started)
+        finally:
+            self._finish()
+
+    async def run_async(self, steps):
+        """Run steps on the event loop (call from a task; requests are served meanwhile)"""
+        self._began = time.perf_counter()
+        if not self.enabled:
+            self._finish()
+            return
+        try:
+            for name, func in steps:
+                step_started = time.perf_counter()
+                try:
+                    result = func()
+                    if inspect.isawaitable(result):
+                        await result
+                except Exception as e:
+                    self._failed(name, e)
+                self.timings[name] = _ms(time.perf_counter() - step_started)
+        finally:
+            self._finish()
+
+    def _failed(self, name, error):
+        self.errors[name] = str(error)
+        logger.warning("Boot warmup step failed", extra={'fields': {'step': name, 'error': str(error)}})
+
+    def _finish(self):
+        self.timings['total'] = _ms(time.perf_counter() - self.started)
+        self._done.set()
+        fields = {f'{stage}_ms': value for stage, value in self.timings.items()}
+        fields.update(warmup=self.enabled, pid=os.getpid())
+        if self.errors:
+            fields['failed'] = sorted(self.errors)
+        logger.info("Startup timing", extra={'fields': fields})
+
+    def warming(self):
+        """True from start() until the steps are done, or until timeout seconds have passed"""
+        if self._began is None or self._done.is_set():
+            return False
+        return time.perf_counter() - self._began < self.timeout
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def warming_reply(self):
+        """/api/ready body while warming"""
+        return {'ready': False, 'status': 'warming', 'warming_ms': _ms(time.perf_counter() - self._began)}
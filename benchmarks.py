@@ -0,0 +1,335 @@
+"""
+Offline microbenchmarks for the backend's request-path code.
+
+Covers extract_order_info over every supported message format and size,
+parse_command throughput, get_tab_data / search_all_tabs grouping and
+rendering at 1k/10k/100k sheet rows, and server cold starts (launch to the
+first /pending reply, with and without the boot warmup). Apps Script is
+replaced by canned responses or the local simulator, so nothing leaves the
+machine. Results are written as JSON so two
+commits can be compared:
+
+    python benchmarks.py --output before.json
+    git checkout my-branch
+    python benchmarks.py --output after.json --compare before.json
+    python benchmarks.py --quick --only extract parse   # smaller run, selected groups
+
+"cold" tab/search benchmarks refetch the canned payload and drop every
+cache first, so they include layout, grouping, indexing and rendering;
+"warm" ones repeat the same request with the caches in place.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend')
+sys.path.insert(0, BACKEND_DIR)
+
+from extraction import MAX_MESSAGE_CHARS, extract_order_info, parse_command  # noqa: E402
+
+HEADER = ['ID', 'Client Name', 'Specifications', 'Sizes', 'Quantity', 'Status', 'Notes', 'Created At', 'Updated At']
+ORDER_KEYS = ['id', 'clientName', 'specifications', 'sizes', 'quantity', 'status', 'notes', 'createdAt', 'updatedAt']
+TABS = ['Pending', 'Ready', 'Delivered', 'Completed']
+
+# ---------------------------------------------------------------- corpora
+
+def size_lines(count, rng, numbered):
+    lines = []
+    for i in range(count):
+        size = f'{rng.randint(10, 400)} x {rng.randint(10, 400)}' + (f' {rng.randint(1, 7)}/8' if i % 3 == 0 else '')
+        prefix = f'{i + 1}. ' if numbered else ''
+        lines.append(f'{prefix}{size} - {rng.randint(1, 20)}')
+    return lines
+
+def order_message(fmt, count, seed=1):
+    """A WhatsApp order message in one of the formats extract_order_info reads"""
+    rng = random.Random(seed)
+    head = ['Proforma Invoice No: PI-2025/0042', f'Client Name: Client {seed}', 'Glass Specifications: 10mm clear tempered']
+    if fmt == 'numbered':
+        body = size_lines(count, rng, numbered=True)
+    elif fmt == 'bare':
+        body = size_lines(count, rng, numbered=False)
+    elif fmt == 'actual_size':
+        body = ['Actual Size and Quantity:'] + size_lines(count, rng, numbered=True)
+    elif fmt == 'sections':
+        sizes = [f'{rng.randint(10, 400)}x{rng.randint(10, 400)}' for _ in range(count)]
+        body = ['Sizes:'] + sizes + ['Quantities:'] + [str(rng.randint(1, 20)) for _ in range(count)]
+    elif fmt == 'glass_specs':
+        body = [f'Quantity: {rng.randint(1, 20)}']
+    elif fmt == 'free_text':
+        # No size lines at all: the slowest path, every pattern is tried
+        words = ['please', 'call', 'me', 'about', 'the', 'order', 'tomorrow', 'thanks']
+        head = []
+        body = [' '.join(rng.choice(words) for _ in range(12)) for _ in range(count)]
+    else:
+        raise ValueError(fmt)
+    return '\n'.join(head + body)[:MAX_MESSAGE_CHARS]
+
+EXTRACTION_FORMATS = ['numbered', 'bare', 'actual_size', 'sections', 'glass_specs', 'free_text']
+EXTRACTION_SIZES = {'small': 3, 'medium': 40, 'large': 400}
+
+COMMANDS = [
+    '/pending', '/pending 3', '/pending next', '/ready prev', '/delivered', '/completed', '/all', '/help',
+    '/status john', '/status', '/update 100042 ready', '/update', '/search john', '/search client:"john doe" spec:10mm tab:ready',
+    '/search', '/query', '/unknown', 'Client Name: not a command',
+]
+
+def sheet_rows(order_count, tab, sizes_per_order=3, seed=5):
+    """Raw rows of a tab: one ID row per order followed by continuation rows with more sizes"""
+    rng = random.Random(seed)
+    rows = [HEADER]
+    for i in range(order_count):
+        order_id = str(100000 + i)
+        rows.append([order_id, f'Client {i % 500}', rng.choice(['10mm clear', '6mm frosted', '8mm tinted']),
+                     f'{rng.randint(10, 400)}x{rng.randint(10, 400)}', str(rng.randint(1, 9)), tab, '',
+                     '2025-06-28T10:00:00Z', '2025-07-01T10:00:00Z'])
+        for _ in range(sizes_per_order - 1):
+            rows.append(['', '', '', f'{rng.randint(10, 400)}x{rng.randint(10, 400)}', str(rng.randint(1, 9)),
+                         '', '', '', ''])
+    return rows
+
+def sheet_orders(rows):
+    return [dict(zip(ORDER_KEYS, row)) for row in rows[1:] if row[0]]
+
+class CannedAppsScript:
+    """Stands in for sheets.call_apps_script with fixed tab payloads.
+
+    Every call returns fresh list objects (as a real refetch would), so
+    identity-keyed memos in sheets.py are rebuilt unless the tab cache
+    serves the payload.
+    """
+
+    def __init__(self, row_count):
+        orders_per_tab = max(1, row_count // 3)
+        self.rows = {tab: sheet_rows(orders_per_tab, tab, seed=index) for index, tab in enumerate(TABS)}
+        self.orders = {tab: sheet_orders(rows) for tab, rows in self.rows.items()}
+
+    def __call__(self, action, data=None):
+        data = data or {}
+        if action == 'batch':
+            return {'success': True, 'data': [self(req['action'], req.get('data')) for req in data['requests']]}
+        tab = data.get('sheetName', 'Pending')
+        if action in ('getOrders', 'getOrdersFromSheet'):
+            return {'success': True, 'data': list(self.orders[tab])}
+        if action.lower() == 'getrawsheetdata':
+            return {'success': True, 'data': list(self.rows[tab])}
+        return {'success': True, 'data': []}
+
+# ---------------------------------------------------------------- timing
+
+def measure(func, repeat, min_time):
+    """Per-call seconds for each of repeat rounds; a round runs func enough times to last min_time"""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or number >= 1 << 20:
+            break
+        number *= 2 if elapsed <= 0 else max(2, min(10, int(min_time / elapsed) + 1))
+    rounds = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        rounds.append((time.perf_counter() - start) / number)
+    return number, rounds
+
+def result(name, group, number, rounds, **params):
+    median = statistics.median(rounds)
+    return {
+        'name': name,
+        'group': group,
+        'params': params,
+        'calls_per_round': number,
+        'rounds': len(rounds),
+        'min_us': round(min(rounds) * 1e6, 3),
+        'median_us': round(median * 1e6, 3),
+        'mean_us': round(statistics.fmean(rounds) * 1e6, 3),
+        'stdev_us': round(statistics.stdev(rounds) * 1e6, 3) if len(rounds) > 1 else 0.0,
+        'ops_per_sec': round(1 / median, 1) if median else None,
+    }
+
+# ---------------------------------------------------------------- benchmarks
+
+def bench_extract(args):
+    for fmt in EXTRACTION_FORMATS:
+        for size_name, count in EXTRACTION_SIZES.items():
+            message = order_message(fmt, count)
+            number, rounds = measure(lambda: extract_order_info(message), args.repeat, args.min_time)
+            yield result(f'extract.{fmt}.{size_name}', 'extract', number, rounds,
+                         format=fmt, size_lines=count, chars=len(message))
+
+def bench_parse(args):
+    number, rounds = measure(lambda: [parse_command(text) for text in COMMANDS], args.repeat, args.min_time)
+    # One call runs the whole command list; report per command
+    rounds = [value / len(COMMANDS) for value in rounds]
+    yield result('parse_command.mixed', 'parse', number * len(COMMANDS), rounds, commands=len(COMMANDS))
+
+def sheet_benchmarks(args):
+    import sheets
+
+    original_call = sheets.call_apps_script
+    original_page_size = sheets.TAB_PAGE_SIZE
+    original_ttl = sheets._tab_cache.ttl
+
+    def drop_caches():
+        sheets._tab_cache.clear()
+        sheets._reply_cache.clear()
+
+    try:
+        # Long enough that warm runs never refetch
+        sheets._tab_cache.ttl = 3600
+        for row_count in args.rows:
+            canned = CannedAppsScript(row_count)
+            sheets.call_apps_script = canned
+            cases = [
+                ('tab.page', lambda: sheets.get_tab_data('Pending'), sheets.TAB_PAGE_SIZE or 20),
+                ('tab.full', lambda: sheets.get_tab_data('Pending'), 0),
+                ('search.client', lambda: sheets.search_all_tabs('client 42'), None),
+                ('search.filters', lambda: sheets.search_all_tabs(
+                    'spec:frosted tab:ready 1000', {'spec': ['frosted']}, ['1000']), None),
+            ]
+            for name, func, page_size in cases:
+                if page_size is not None:
+                    sheets.TAB_PAGE_SIZE = page_size
+                if page_size == 0 and row_count > args.max_full_rows:
+                    # A whole-tab reply of this size is not something a user can be sent
+                    continue
+
+                def cold(func=func):
+                    drop_caches()
+                    return func()
+
+                reply = cold()
+                if reply.startswith('❌'):
+                    raise RuntimeError(f'{name} failed at {row_count} rows: {reply}')
+                number, rounds = measure(cold, args.repeat, args.min_time)
+                yield result(f'{name}.cold.{row_count}', name.split('.')[0], number, rounds,
+                             rows=row_count, cache='cold', reply_chars=len(reply))
+                func()
+                number, rounds = measure(func, args.repeat, args.min_time)
+                yield result(f'{name}.warm.{row_count}', name.split('.')[0], number, rounds,
+                             rows=row_count, cache='warm', reply_chars=len(reply))
+                sheets.TAB_PAGE_SIZE = original_page_size
+    finally:
+        sheets.call_apps_script = original_call
+        sheets.TAB_PAGE_SIZE = original_page_size
+        sheets._tab_cache.ttl = original_ttl
+        drop_caches()
+
+def bench_startup(args):
+    """Launch-to-first-/pending-reply of each server against the local Apps Script simulator"""
+    from apps_script_simulator import AppsScriptSimulator, start_simulator
+    from loadtest_server import first_reply_time, stub_rows
+
+    stub = start_simulator(AppsScriptSimulator(tabs={tab: stub_rows(tab) for tab in TABS}, latency='fixed:0.3'))
+    try:
+        for mode in args.startup_modes:
+            for warmup in ('true', 'false'):
+                timings = [first_reply_time(mode, stub.url, BOOT_WARMUP=warmup) for _ in range(args.startup_runs)]
+                name = f"startup.{mode}.{'warm' if warmup == 'true' else 'cold'}"
+                yield result(f'{name}.first_reply', 'startup', 1, [t['first_reply'] for t in timings],
+                             mode=mode, boot_warmup=warmup, apps_script_latency=0.3)
+                yield result(f'{name}.command', 'startup', 1, [t['reply'] for t in timings],
+                             mode=mode, boot_warmup=warmup, apps_script_latency=0.3)
+    finally:
+        stub.shutdown()
+
+BENCHMARKS = {
+    'extract': bench_extract,
+    'parse': bench_parse,
+    'sheets': sheet_benchmarks,
+    'startup': bench_startup,
+}
+
+# ---------------------------------------------------------------- report
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def compare(results, baseline, threshold):
+    """Print median changes against a baseline run; returns the names that got slower than threshold"""
+    before = {entry['name']: entry for entry in baseline['results']}
+    regressions = []
+    print(f"\nCompared with {baseline['meta'].get('git_revision') or 'baseline'}:", file=sys.stderr)
+    for entry in results:
+        old = before.get(entry['name'])
+        if not old:
+            continue
+        change = entry['median_us'] / old['median_us'] - 1 if old['median_us'] else 0
+        flag = ''
+        if change > threshold:
+            flag = '  SLOWER'
+            regressions.append(entry['name'])
+        elif change < -threshold:
+            flag = '  faster'
+        print(f"  {entry['name']:<36} {old['median_us']:>12.1f} -> {entry['median_us']:>12.1f} us  {change:+7.1%}{flag}", file=sys.stderr)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--only', nargs='+', choices=sorted(BENCHMARKS), default=list(BENCHMARKS))
+    parser.add_argument('--rows', nargs='+', type=int, default=[1000, 10000, 100000], help='sheet rows per tab benchmark')
+    parser.add_argument('--max-full-rows', type=int, default=10000, help='largest sheet rendered as one whole-tab reply')
+    parser.add_argument('--repeat', type=int, default=5, help='rounds per benchmark')
+    parser.add_argument('--min-time', type=float, default=0.2, help='seconds each round should last')
+    parser.add_argument('--startup-modes', nargs='+', default=['dev', 'uvicorn'], help='servers timed by the startup group')
+    parser.add_argument('--startup-runs', type=int, default=3, help='launches per server and warmup setting')
+    parser.add_argument('--quick', action='store_true', help='1k/10k rows, 3 short rounds')
+    parser.add_argument('--output', help='write the JSON results here (default: stdout)')
+    parser.add_argument('--compare', help='JSON results of an earlier run to compare medians with')
+    parser.add_argument('--threshold', type=float, default=0.15, help='median change reported as a regression')
+    args = parser.parse_args()
+    if args.quick:
+        args.rows = [rows for rows in args.rows if rows <= 10000]
+        args.repeat = min(args.repeat, 3)
+        args.min_time = min(args.min_time, 0.05)
+        args.startup_runs = 1
+
+    results = []
+    for group in args.only:
+        for entry in BENCHMARKS[group](args):
+            print(f"{entry['name']:<36} {entry['median_us']:>12.1f} us  {entry['ops_per_sec'] or 0:>12.1f} ops/s",
+                  file=sys.stderr)
+            results.append(entry)
+
+    report = {
+        'meta': {
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'started_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'repeat': args.repeat,
+            'min_time': args.min_time,
+        },
+        'results': results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} benchmark(s) slower by more than {args.threshold:.0%}", file=sys.stderr)
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+"""
+Throughput comparison of the backend servers on this machine.
+
+Starts the local Apps Script simulator (apps_script_simulator.py), runs the
+backend against it in each server mode, and fires concurrent /api/whatsapp_in
+requests at it for a fixed time. Nothing is sent to Google.
+
+    python loadtest_server.py                      # all modes, fixed 0.3s Apps Script latency
+    python loadtest_server.py --modes dev gunicorn --concurrency 64 --duration 20
+    python loadtest_server.py --latency lognormal:0.8,0.5 --http-error-rate 0.02 --max-concurrent 30
+
+All simulator options are accepted; by default it answers every call after
+0.3s with no errors or throttling, so runs stay comparable.
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from apps_script_simulator import add_simulator_arguments, simulator_from_args, start_simulator
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend')
+
+SERVER_COMMANDS = {
+    'dev': [sys.executable, 'app.py'],
+    'gunicorn': [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'],
+    'uvicorn': [sys.executable, '-m', 'uvicorn', 'asgi:app', '--host', '0.0.0.0', '--log-level', 'warning'],
+}
+
+HEADER = ['ID', 'Client Name', 'Specifications', 'Sizes', 'Quantity', 'Status', 'Notes', 'Created At', 'Updated At']
+
+def stub_rows(tab, count=60):
+    rows = [HEADER]
+    for i in range(count):
+        rows.append([str(100000 + i), f'Client {i % 7}', '10mm clear', '100x200', '2', tab, '',
+                     '2025-06-28 10:00:00', '2025-06-28 10:00:00'])
+        rows.append(['', '', '', '50x80', '1', '', '', '', ''])
+    return rows
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def wait_until_up(base_url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(f'{base_url}/api/health', timeout=1).ok:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f'server at {base_url} did not come up')
+
+def first_reply_time(mode, apps_script_url, command='/pending', timeout=60, **env):
+    """Launch a server and time a cold start as a deploy sees it.
+
+    Polls /api/ready until it answers 200, then sends command once. Returns
+    {'ready': seconds from launch to ready, 'reply': seconds for the command
+    itself, 'first_reply': seconds from launch to the reply, 'text': reply}.
+    env entries override the server's environment (e.g. BOOT_WARMUP='false').
+    """
+    port = free_port()
+    workdir = tempfile.mkdtemp()
+    command_line = SERVER_COMMANDS[mode] + (['--port', str(port)] if mode == 'uvicorn' else [])
+    server_env = dict(os.environ,
+                      APPS_SCRIPT_URL=apps_script_url, BACKEND_PORT=str(port), PORT=str(port),
+                      GUNICORN_WORKERS='1', GUNICORN_ACCESS_LOG='',
+                      ORDER_QUEUE_ENABLED='false', SHEETS_MIRROR_ENABLED='false',
+                      PAGE_CURSOR_PATH=os.path.join(workdir, 'page_cursors.db'),
+                      DEDUPE_PATH=os.path.join(workdir, 'message_dedupe.db'),
+                      ORDER_ID_PATH=os.path.join(workdir, 'order_ids.counter'),
+                      **env)
+    log = tempfile.TemporaryFile()
+    launched = time.perf_counter()
+    server = subprocess.Popen(command_line, cwd=BACKEND_DIR, env=server_env, stdout=log, stderr=subprocess.STDOUT)
+    base_url = f'http://127.0.0.1:{port}'
+    try:
+        deadline = launched + timeout
+        while True:
+            try:
+                if requests.get(f'{base_url}/api/ready', timeout=timeout).ok:
+                    break
+            except requests.RequestException:
+                pass
+            if time.perf_counter() > deadline or server.poll() is not None:
+                log.seek(0)
+                raise RuntimeError(f'{mode} server did not become ready:\n{log.read().decode(errors="replace")[-2000:]}')
+            time.sleep(0.02)
+        ready = time.perf_counter()
+        response = requests.post(f'{base_url}/api/whatsapp_in', json={'from': 'cold-start', 'body': command}, timeout=timeout)
+        replied = time.perf_counter()
+        response.raise_for_status()
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+            server.wait()
+    return {'ready': ready - launched, 'reply': replied - ready, 'first_reply': replied - launched,
+            'text': response.json()['reply']}
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)] if ordered else 0
+
+def run_load(base_url, messages, concurrency, duration):
+    latencies, errors = [], 0
+    lock = threading.Lock()
+    deadline = time.time() + duration
+
+    def client(index):
+        nonlocal errors
+        session = requests.Session()
+        sent = index
+        while time.time() < deadline:
+            started = time.perf_counter()
+            try:
+                response = session.post(f'{base_url}/api/whatsapp_in', timeout=60,
+                                        json={'from': f'load-{index}', 'body': messages[sent % len(messages)]})
+                ok = response.ok and 'reply' in response.json()
+            except requests.RequestException:
+                ok = False
+            elapsed = time.perf_counter() - started
+            with lock:
+                if ok:
+                    latencies.append(elapsed)
+                else:
+                    errors += 1
+            sent += 1
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(client, range(concurrency)))
+    return latencies, errors
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modes', nargs='+', choices=sorted(SERVER_COMMANDS), default=['dev', 'gunicorn', 'uvicorn'])
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=15)
+    parser.add_argument('--workers', type=int, default=2, help='worker processes for gunicorn/uvicorn')
+    parser.add_argument('--threads', type=int, default=8, help='threads per gunicorn worker')
+    add_simulator_arguments(parser)
+    parser.set_defaults(latency='fixed:0.3', batch_entry_latency=None, max_concurrent=0)
+    args = parser.parse_args()
+
+    tabs = {tab: stub_rows(tab) for tab in ['Pending', 'Ready', 'Delivered', 'Completed']}
+    # New orders are acknowledged but not stored, so the tabs stay the same size for the whole run
+    stub = start_simulator(simulator_from_args(args, tabs, discard_writes=True))
+    messages = ['/pending', '/search client 3', '/all',
+                'Client: Load Test\nSpecs: 10mm clear\nSizes: 100x200 = 2']
+    print(f'{args.concurrency} clients, {args.duration:.0f}s per mode, Apps Script latency {args.latency}, '
+          f'{os.cpu_count()} CPUs')
+    print(f"{'mode':<10}{'requests':>10}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'errors':>8}")
+
+    for mode in args.modes:
+        port = free_port()
+        command = SERVER_COMMANDS[mode] + (['--port', str(port), '--workers', str(args.workers)] if mode == 'uvicorn' else [])
+        env = dict(os.environ,
+                   APPS_SCRIPT_URL=stub.url,
+                   BACKEND_PORT=str(port), PORT=str(port),
+                   GUNICORN_WORKERS=str(args.workers), GUNICORN_THREADS=str(args.threads),
+                   GUNICORN_ACCESS_LOG='',
+                   # Every request waits on the stub, so the servers are compared on blocking I/O
+                   SHEETS_CACHE_TTL='0', ORDER_QUEUE_ENABLED='false', SHEETS_MIRROR_ENABLED='false',
+                   # Each client resends the same order text, which the dedupe store would answer without a sheet write,
+                   # and sends commands faster than the per-sender rate limit allows
+                   DEDUPE_ENABLED='false', SENDER_RATE_LIMIT='0')
+        log = tempfile.TemporaryFile()
+        server = subprocess.Popen(command, cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+        try:
+            base_url = f'http://127.0.0.1:{port}'
+            try:
+                wait_until_up(base_url)
+            except RuntimeError:
+                log.seek(0)
+                print(log.read().decode(errors='replace')[-2000:])
+                raise
+            latencies, errors = run_load(base_url, messages, args.concurrency, args.duration)
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+        print(f'{mode:<10}{len(latencies):>10}{len(latencies) / args.duration:>10.1f}'
+              f'{percentile(latencies, 0.5) * 1000:>10.0f}{percentile(latencies, 0.95) * 1000:>10.0f}{errors:>8}')
+
+    stats = stub.simulator.snapshot()
+    print(f"Apps Script simulator: {stats['requests']} requests, {stats['http_errors']} HTTP errors, "
+          f"{stats['script_errors']} script errors, {stats['throttled']} throttled, max {stats['max_in_flight']} in flight")
+    stub.shutdown()
+
+if __name__ == '__main__':
+    main()
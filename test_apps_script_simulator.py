@@ -0,0 +1,73 @@
+"""
+Tests for the local Apps Script simulator used by loadtest_server.py.
+"""
+
+import pytest
+
+from apps_script_simulator import AppsScriptSimulator, parse_latency, synthetic_tabs
+
+def simulator(**options):
+    return AppsScriptSimulator(tabs=synthetic_tabs(2, sizes_per_order=2), seed=1, **options)
+
+def test_reads_match_the_contract():
+    sim = simulator()
+    raw = sim.answer('getRawSheetData', {'sheetName': 'Ready'})
+    assert raw['success'] and raw['data'][0][0] == 'ID' and len(raw['data']) == 5
+    orders = sim.answer('getOrdersFromSheet', {'sheetName': 'Ready'})['data']
+    assert [order['id'] for order in orders] == [row[0] for row in raw['data'][1:] if row[0]]
+    assert sim.answer('getOrders', {})['data'] == sim.answer('getOrdersFromSheet', {'sheetName': 'Pending'})['data']
+    assert sim.answer('getAvailableSheets', {})['data'] == ['Pending', 'Ready', 'Delivered', 'Completed']
+    assert sim.answer('getOrdersFromSheet', {'sheetName': 'Nope'}) == {'success': False, 'message': 'Sheet not found: Nope'}
+
+def test_batch_answers_each_request():
+    sim = simulator()
+    result = sim.answer('batch', {'requests': [{'action': 'getAvailableSheets'}, {'action': 'nope'}]})
+    assert result['success']
+    assert result['data'][0]['success'] and result['data'][1] == {'success': False, 'message': 'Unknown action: nope'}
+    assert simulator(batch=False).answer('batch', {'requests': []}) == {'success': False, 'message': 'Unknown action: batch'}
+
+def test_sync_and_move():
+    sim = simulator()
+    order = {'id': '42', 'clientName': 'Ann', 'sizes': '1x2', 'quantity': '1', 'status': 'Pending'}
+    assert sim.answer('syncToSheets', {'orders': [order, dict(order, sizes='3x4')], 'targetSheetName': 'Pending'})['success']
+    moved = sim.answer('updateOrderStatusAndMove', {'orderId': '42', 'newStatus': 'Ready'})
+    assert moved['data']['rowsMoved'] == 2
+    assert not any(row[0] == '42' for row in sim.tabs['Pending'])
+    assert [row[5] for row in sim.tabs['Ready'] if row[0] == '42'] == ['Ready', 'Ready']
+    assert not sim.answer('updateOrderStatusAndMove', {'orderId': '42', 'newStatus': 'Nope'})['success']
+    assert not sim.answer('updateOrderStatusAndMove', {'orderId': '999', 'newStatus': 'Ready'})['success']
+
+def test_discard_writes_leaves_tabs_unchanged():
+    sim = simulator(discard_writes=True)
+    before = {tab: [list(row) for row in rows] for tab, rows in sim.tabs.items()}
+    sim.answer('syncToSheets', {'orders': [{'id': '42'}]})
+    sim.answer('updateOrderStatusAndMove', {'orderId': before['Pending'][1][0], 'newStatus': 'Ready'})
+    assert sim.tabs == before
+
+def test_throttling():
+    sim = simulator(max_concurrent=1)
+    assert sim.admit() is None
+    status, headers, _ = sim.admit()
+    assert status == 429 and headers['Retry-After'] == '1'
+    sim.release()
+    assert sim.admit() is None
+
+    sim = simulator(quota_rps=0.5, quota_burst=2)
+    assert sim.admit() is None and sim.admit() is None
+    assert sim.admit()[0] == 429
+
+def test_error_injection():
+    sim = simulator(http_error_rate=1.0)
+    assert sim.handle({'action': 'getOrders'})[0] in (500, 502, 503)
+    sim = simulator(script_error_rate=1.0)
+    assert not sim.answer('getOrders', {})['success']
+
+def test_latency_specs():
+    import random
+    rng = random.Random(1)
+    assert parse_latency('0.3')(rng) == 0.3
+    assert 1 <= parse_latency('uniform:1,2')(rng) <= 2
+    assert parse_latency('lognormal:0.8,0.4')(rng) > 0
+    assert parse_latency(None)(rng) == 0
+    with pytest.raises(ValueError):
+        parse_latency('gamma:1')
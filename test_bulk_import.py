@@ -0,0 +1,111 @@
+"""
+Tests for the streaming bulk order import in backend/bulk_import.py.
+"""
+
+import json
+
+from backend.bulk_import import import_orders, iter_lines, shutdown_pool, upload_format
+from backend.extraction import extract_order_info
+
+def build_order_rows(info):
+    order_id = info.get('invoice_number') or info['client_name']
+    return order_id, [{'id': order_id, 'sizes': size} for size in info['sizes']] or [{'id': order_id}]
+
+def build_rows(infos):
+    return [build_order_rows(info) for info in infos]
+
+def chunked(data, size=7):
+    """Split an upload into small byte chunks, so lines and UTF-8 characters straddle chunks"""
+    data = data.encode('utf-8')
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+def run(upload, fmt='ndjson', sync_rows=None, **options):
+    writes = []
+    def record_write(rows):
+        writes.append(rows)
+    results = list(import_orders(chunked(upload), fmt, extract_order_info, build_rows, sync_rows or record_write,
+                                 workers=1, **options))
+    return results[:-1], results[-1]['summary'], writes
+
+def test_ndjson_messages_and_structured_records():
+    upload = '\n'.join([
+        json.dumps({'message': 'Client Name: Ahmed\nGlass Specifications: 10mm clear\n1. 100x200 - 2\n2. 50x60 - 4'}),
+        json.dumps('Client Name: Sära\n30x40 - 3'),
+        '',
+        json.dumps({'client_name': 'Omar', 'sizes': '1x1;2x2', 'quantities': '1;2', 'order_id': 'X-1'}),
+        'not json',
+        json.dumps({'nothing': 1}),
+    ])
+    reports, summary, writes = run(upload, chunk_size=2)
+    by_record = {report['record']: report for report in reports}
+    assert by_record[1] == {'record': 1, 'status': 'ok', 'order_id': 'Ahmed', 'rows': 2}
+    assert by_record[2]['order_id'] == 'Sära'
+    assert by_record[3] == {'record': 3, 'status': 'ok', 'order_id': 'X-1', 'rows': 2}
+    assert by_record[4]['status'] == 'error' and 'Invalid JSON' in by_record[4]['error']
+    assert by_record[5]['status'] == 'error'
+    assert [len(rows) for rows in writes] == [3, 2]
+    assert summary['records'] == 5 and summary['imported'] == 3 and summary['failed'] == 2
+    assert summary['chunks'] == 2 and summary['sheet_rows'] == 5
+
+def test_non_string_message_fails_only_its_record():
+    upload = '\n'.join([
+        json.dumps({'message': 123}),
+        json.dumps({'text': ['Client Name: A', '1x1 - 1']}),
+        json.dumps({'body': {'client': 'B'}}),
+        json.dumps({'message': 'Client Name: Ahmed\n100x200 - 2'}),
+    ])
+    reports, summary, writes = run(upload)
+    assert [report['status'] for report in reports] == ['error', 'error', 'error', 'ok']
+    assert reports[0]['error'] == "'message' must be a string"
+    assert summary['imported'] == 1 and summary['failed'] == 3
+    assert len(writes) == 1
+
+def test_csv_with_multiline_messages():
+    upload = 'message\n"Client Name: Zed\n100x100 - 1"\n \n"Client Name: Amy\n20x20 - 2"\n'
+    reports, summary, writes = run(upload, fmt='csv')
+    assert [report['order_id'] for report in reports] == ['Zed', 'Amy']
+    assert len(writes) == 1 and summary['imported'] == 2
+
+def test_failed_sheet_write_fails_only_its_chunk():
+    calls = []
+    def flaky_sync(rows):
+        calls.append(rows)
+        if len(calls) == 2:
+            raise RuntimeError('Apps Script error: timed out')
+    upload = '\n'.join(json.dumps({'client_name': f'C{i}', 'sizes': ['1x1']}) for i in range(5))
+    reports, summary, _ = run(upload, sync_rows=flaky_sync, chunk_size=2)
+    statuses = {report['record']: report['status'] for report in reports}
+    assert statuses == {1: 'ok', 2: 'ok', 3: 'error', 4: 'error', 5: 'ok'}
+    assert 'Sheet write failed' in reports[2]['error']
+    assert summary['imported'] == 3 and summary['failed'] == 2 and summary['chunks'] == 3
+
+def test_extraction_on_process_pool():
+    upload = '\n'.join(json.dumps({'message': f'Client Name: C{i}\n{i + 10}x20 - 1'}) for i in range(20))
+    try:
+        results = list(import_orders(chunked(upload), 'ndjson', extract_order_info, build_rows, lambda rows: None,
+                                     workers=2, chunk_size=8))
+    finally:
+        shutdown_pool()
+    assert [result['order_id'] for result in results[:-1]] == [f'C{i}' for i in range(20)]
+    assert results[-1]['summary']['chunks'] == 3
+
+def test_max_records_truncates_upload():
+    upload = '\n'.join(json.dumps({'client_name': f'C{i}'}) for i in range(10))
+    reports, summary, _ = run(upload, max_records=4)
+    assert len(reports) == 4
+    assert summary['truncated'] is True
+
+def test_iter_lines_keeps_line_endings_and_drops_bom():
+    assert list(iter_lines(chunked('﻿a,b\nç\n\nlast'))) == ['a,b\n', 'ç\n', '\n', 'last']
+
+def test_upload_format():
+    assert upload_format('text/csv; charset=utf-8') == 'csv'
+    assert upload_format('application/x-ndjson') == 'ndjson'
+    assert upload_format(None) == 'ndjson'
+    assert upload_format('application/x-ndjson', 'CSV') == 'csv'
+    try:
+        upload_format(None, 'xml')
+    except ValueError:
+        pass
+    else:
+        assert False, 'unknown format accepted'
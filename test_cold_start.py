@@ -0,0 +1,80 @@
+"""
+Cold start: time from launching the backend to its first useful reply, with
+the Apps Script simulator standing in for Google (see loadtest_server.py).
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+from apps_script_simulator import AppsScriptSimulator, start_simulator
+from backend.warmup import BootWarmup
+from loadtest_server import first_reply_time, stub_rows
+
+# Longer than any single step of a healthy boot, so only a real regression trips it
+FIRST_REPLY_BUDGET = 15
+
+@pytest.fixture(scope='module')
+def apps_script():
+    tabs = {tab: stub_rows(tab) for tab in ['Pending', 'Ready', 'Delivered', 'Completed']}
+    stub = start_simulator(AppsScriptSimulator(tabs=tabs, latency='fixed:0.2'))
+    yield stub
+    stub.shutdown()
+
+@pytest.mark.parametrize('mode', ['dev', 'uvicorn'])
+def test_first_reply_is_served_from_the_warmed_cache(apps_script, mode):
+    timing = first_reply_time(mode, apps_script.url)
+    print(f"{mode}: ready after {timing['ready']:.2f}s, first /pending reply after {timing['first_reply']:.2f}s "
+          f"({timing['reply'] * 1000:.0f} ms for the command)")
+    assert '*Order ID:* 100000' in timing['text']
+    assert timing['first_reply'] < FIRST_REPLY_BUDGET
+    # Any Apps Script call takes the simulator's 0.2s, so the command was answered from the cache
+    assert timing['reply'] < 0.2
+
+def test_without_warmup_the_first_command_reads_the_sheet(apps_script):
+    timing = first_reply_time('dev', apps_script.url, BOOT_WARMUP='false')
+    assert '*Order ID:* 100000' in timing['text']
+    assert timing['reply'] >= 0.2
+
+def test_warmup_runs_steps_and_reports_warming_until_done():
+    release = threading.Event()
+    ran = []
+
+    def fail():
+        raise RuntimeError('sheet down')
+
+    warmup = BootWarmup(enabled=True, timeout=30)
+    assert not warmup.warming()
+    warmup.start([('connect', fail), ('prefetch', lambda: (release.wait(5), ran.append('prefetch')))])
+    assert warmup.warming() and warmup.warming_reply()['status'] == 'warming'
+    release.set()
+    assert warmup.wait(5)
+    assert not warmup.warming()
+    assert ran == ['prefetch'] and warmup.errors == {'connect': 'sheet down'}
+    assert {'connect', 'prefetch', 'total'} <= set(warmup.timings)
+
+def test_warming_is_bounded_by_the_timeout():
+    release = threading.Event()
+    warmup = BootWarmup(enabled=True, timeout=0.05)
+    warmup.start([('prefetch', lambda: release.wait(5))])
+    assert warmup.warming()
+    threading.Event().wait(0.1)
+    assert not warmup.warming()
+    release.set()
+
+def test_disabled_warmup_runs_nothing():
+    warmup = BootWarmup(enabled=False)
+    warmup.start([('prefetch', lambda: pytest.fail('ran'))])
+    assert warmup.wait(0) and not warmup.warming()
+
+def test_async_warmup_awaits_steps():
+    ran = []
+
+    async def prefetch():
+        await asyncio.sleep(0)
+        ran.append('prefetch')
+
+    warmup = BootWarmup(enabled=True)
+    asyncio.run(warmup.run_async([('prefetch', prefetch)]))
+    assert ran == ['prefetch'] and warmup.wait(0)
@@ -0,0 +1,230 @@
+"""
+Equivalence tests for the single-pass order extraction engine.
+
+legacy_extract_order_info below is a frozen copy of the multi-regex
+extractor the engine replaced; every message in the corpus (and a seeded
+batch of random messages) must produce identical output from both.
+"""
+
+import random
+import re
+import time
+
+from backend.extraction import extract_order_info, extract_orders, ExtractionLimitError, MAX_MESSAGE_CHARS
+
+def legacy_extract_order_info(text):
+    # Extract client name
+    client_match = re.search(r'Client Name[:\-]?\s*(.+)', text, re.IGNORECASE)
+    client_name = client_match.group(1).strip() if client_match else 'UNKNOWN'
+
+    # Extract glass specifications
+    specs_match = re.search(r'Glass Specifications[:\-]?\s*(.+)', text, re.IGNORECASE)
+    glass_specs = specs_match.group(1).strip() if specs_match else ''
+
+    # Extract proforma invoice/order id if present
+    order_id_match = re.search(r'Proforma Invoice No\.?[:\-]?\s*([A-Za-z0-9\-/]+)', text, re.IGNORECASE)
+    order_id = order_id_match.group(1).strip() if order_id_match else None
+
+    # Extract all size/quantity lines with multiple patterns
+    size_qty_lines = []
+    
+    # Pattern 1: Numbered list (e.g., 1. 83 x 72 1/8 - 1)
+    size_qty_lines = re.findall(r'\d+\.\s*([\d\s\./x]+)\s*-\s*(\d+)', text)
+    
+    # Pattern 2: Without numbering (e.g., 83 x 72 1/8 - 1)
+    if not size_qty_lines:
+        size_qty_lines = re.findall(r'([\d\s\./x]+)\s*-\s*(\d+)', text)
+    
+    # Pattern 3: Look for "Sizes:" and "Quantities:" sections
+    if not size_qty_lines:
+        sizes_section = re.search(r'Sizes[:\-]?\s*(.+?)(?=Quantities|\Z)', text, re.IGNORECASE | re.DOTALL)
+        quantities_section = re.search(r'Quantities[:\-]?\s*(.+)', text, re.IGNORECASE | re.DOTALL)
+        
+        if sizes_section and quantities_section:
+            # Extract sizes and quantities, filtering out empty lines and headers
+            sizes_text = sizes_section.group(1).strip()
+            quantities_text = quantities_section.group(1).strip()
+            
+            # Split by newlines and filter out empty lines and any lines containing "Sizes:" or "Quantities:"
+            sizes_list = [s.strip() for s in sizes_text.split('\n') 
+                         if s.strip() and not re.search(r'Sizes[:\-]?', s, re.IGNORECASE)]
+            quantities_list = [q.strip() for q in quantities_text.split('\n') 
+                              if q.strip() and not re.search(r'Quantities[:\-]?', q, re.IGNORECASE)]
+            
+            print(f"Debug - Sizes list: {sizes_list}")
+            print(f"Debug - Quantities list: {quantities_list}")
+            
+            # Create pairs from the two lists
+            size_qty_lines = list(zip(sizes_list, quantities_list))
+    
+    # Pattern 4: Look for "Actual Size and Quantity:" section
+    if not size_qty_lines:
+        actual_size_qty_section = re.search(r'Actual Size and Quantity[:\-]?\s*(.+)', text, re.IGNORECASE | re.DOTALL)
+        if actual_size_qty_section:
+            section_text = actual_size_qty_section.group(1).strip()
+            # Try to find numbered list format in this section
+            numbered_items = re.findall(r'\d+\.\s*([\d\s\./x]+)\s*-\s*(\d+)', section_text)
+            if numbered_items:
+                size_qty_lines = numbered_items
+            else:
+                # Try non-numbered format
+                non_numbered_items = re.findall(r'([\d\s\./x]+)\s*-\s*(\d+)', section_text)
+                if non_numbered_items:
+                    size_qty_lines = non_numbered_items
+    
+    # Pattern 5: If glass specs is found but no sizes, use glass specs as the size
+    if not size_qty_lines and glass_specs:
+        # Look for quantity after glass specs
+        qty_match = re.search(r'Quantity[:\-]?\s*(\d+)', text, re.IGNORECASE)
+        qty = qty_match.group(1).strip() if qty_match else '1'  # Default to 1 if no quantity found
+        size_qty_lines = [(f"Glass Specifications: {glass_specs}", qty)]
+    
+    # Process the extracted lines
+    sizes = [s.strip() for s, q in size_qty_lines] if size_qty_lines else []
+    quantities = [q.strip() for s, q in size_qty_lines] if size_qty_lines else []
+    
+    # Debug print
+    print(f"Extracted sizes: {sizes}")
+    print(f"Extracted quantities: {quantities}")
+
+    return {
+        'client_name': client_name,
+        'glass_specs': glass_specs,
+        'sizes': sizes,
+        'quantities': quantities,
+        'order_id': order_id
+    }
+
+
+CORPUS = [
+    # Numbered list
+    """Client Name: ABC Glass
+Glass Specifications: 10mm Clear Toughened
+Proforma Invoice No. PI-2024/117
+1. 83 x 72 1/8 - 1
+2. 40 x 30 - 12
+3. 1200x900 - 4""",
+    # Bare size - qty lines
+    """Client Name: John Doe
+Glass Specifications: 6mm Frosted
+83 x 72 1/8 - 1
+40 x 30 - 2""",
+    # Sizes / Quantities sections
+    """
+    Client Name: Test Multiple Sizes 3
+    Glass Specifications: 10mm Clear Glass
+
+    Sizes:
+    100x100
+    200x200
+
+    Quantities:
+    2
+    3
+    """,
+    # Actual Size and Quantity section
+    """Client Name: Acme
+Glass Specifications: 8mm Tinted
+Actual Size and Quantity:
+1. 500 x 400 - 2
+2. 600 x 450 - 1""",
+    """Client Name: Acme
+Actual Size and Quantity:
+500 x 400 - 2
+600.5 x 450 - 1""",
+    # Specs-only fallback, with and without a quantity
+    """Client Name: Mary
+Glass Specifications: 12mm Laminated
+Quantity: 7""",
+    """Client Name: Mary
+Glass Specifications: 12mm Laminated""",
+    # Nothing recognizable
+    "hello there",
+    "",
+    # Label edge cases
+    "Client Name:\nJohn\nGlass Specifications -\n5mm",
+    "Client Name: ",
+    "client name- lower case\nGLASS SPECIFICATIONS: upper",
+    "Sizes:\nQuantities:\n2",
+    "Sizes: 100x100\nSizes: 200x200\nQuantities: 1\n2",
+    "Quantities:\n1\n2\nSizes:\n10x10\n20x20",
+    # Lines that run into each other
+    "Quantity: 5\n100x200 - 2",
+    "1. 2. 3x4 - 5",
+    "1. ab 2. 3 - 4",
+    "12.5.3 x 4 - 2\n7.\n - 9",
+    "1 -\n\n 2",
+    "Box x 10 - 3",
+    "1.   - 2",
+    "100x100 -\n",
+    "- 5\n10 x 10 -",
+    "Order 1. 10/20 x 30 - 1, 2. 40 x 50 - 2",
+    "١٢ x ٣ - ٤",
+    "10 x 20 - 3",
+]
+
+ALPHABET = list('0123456789  \n\t./x-:') + ['Sizes:', 'Quantities:', 'Client Name:', 'Glass Specifications:',
+                                           'Quantity:', 'Actual Size and Quantity:', 'abc', 'X', '1.', ' - ']
+
+def random_messages(count, seed=1234):
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield ''.join(rng.choice(ALPHABET) for _ in range(rng.randint(0, 60)))
+
+def test_corpus_matches_legacy():
+    for message in CORPUS:
+        assert extract_order_info(message) == legacy_extract_order_info(message), message
+
+def test_random_messages_match_legacy():
+    for message in random_messages(3000):
+        assert extract_order_info(message) == legacy_extract_order_info(message), repr(message)
+
+def test_long_numeric_paste_is_fast():
+    # The old bare-list regex backtracks quadratically on long runs with no '-'
+    message = "Client Name: Big Paste\n" + "1 2 3 4 5 6 7 8 9 0 . / x " * 700
+    start = time.perf_counter()
+    result = extract_order_info(message)
+    assert time.perf_counter() - start < 0.5
+    assert result['sizes'] == []
+
+def test_oversized_message_is_rejected():
+    try:
+        extract_order_info("1" * (MAX_MESSAGE_CHARS + 1))
+    except ExtractionLimitError:
+        return
+    raise AssertionError("expected ExtractionLimitError")
+
+def test_single_order_messages_are_not_split():
+    for message in CORPUS:
+        assert extract_orders(message) == [extract_order_info(message)]
+
+def test_pasted_invoices_are_split():
+    message = """Proforma Invoice No: PI-101
+Client Name: ABC Glass
+Glass Specifications: 10mm Clear
+1. 1200x900 - 4
+2. 600x450 - 2
+
+Proforma Invoice No: PI-102
+Client Name: John Doe
+Glass Specifications: 6mm Frosted
+1. 300x300 - 1"""
+    orders = extract_orders(message)
+    assert [order['order_id'] for order in orders] == ['PI-101', 'PI-102']
+    assert [order['client_name'] for order in orders] == ['ABC Glass', 'John Doe']
+    assert orders[0]['sizes'] == ['1200x900', '600x450'] and orders[0]['quantities'] == ['4', '2']
+    assert orders[1]['sizes'] == ['300x300'] and orders[1]['glass_specs'] == '6mm Frosted'
+
+def test_repeated_client_names_split_and_invoices_keep_the_client():
+    orders = extract_orders("Hi, two orders:\nClient Name: Acme\n100x100 - 1\nClient Name: Mary\n200x200 - 2")
+    assert [(order['client_name'], order['sizes']) for order in orders] == [('Acme', ['100x100']), ('Mary', ['200x200'])]
+
+    orders = extract_orders("Client Name: Acme\nProforma Invoice No: 7\n1x1 - 1\nProforma Invoice No: 8\n2x2 - 2")
+    assert [(order['order_id'], order['client_name']) for order in orders] == [('7', 'Acme'), ('8', 'Acme')]
+
+if __name__ == "__main__":
+    test_corpus_matches_legacy()
+    test_random_messages_match_legacy()
+    test_long_numeric_paste_is_fast()
+    test_oversized_message_is_rejected()
+    print("Extraction engine matches the legacy extractor")
@@ -0,0 +1,266 @@
+"""
+Equivalence tests and benchmarks (time and memory) for the shared order grouping engine.
+
+legacy_group_tab, legacy_group_search_tab and legacy_merge_search are
+frozen copies of the grouping loops the engine replaced (tab listings,
+per-tab search grouping and the cross-tab merge of search hits). Seeded
+random sheets must group identically with both.
+"""
+
+import gc
+import random
+import time
+import tracemalloc
+
+from backend.grouping import OrderGrouper, format_date_only, group_search_rows, group_tab_rows
+
+def legacy_group_tab(raw_data):
+    grouped_orders = {}
+    current_id = None
+    for row in raw_data:
+        # Skip header row
+        if not row or row[0] in ('ID', 'id'):
+            continue
+        row_id = row[0]
+        client_name = row[1] if len(row) > 1 else ''
+        specs = row[2] if len(row) > 2 else ''
+        size = row[3] if len(row) > 3 else ''
+        qty = row[4] if len(row) > 4 else ''
+        status = row[5] if len(row) > 5 else ''
+        notes = row[6] if len(row) > 6 else ''
+        created_at = row[7] if len(row) > 7 else ''
+        updated_at = row[8] if len(row) > 8 else ''
+
+        # If this row has an ID, start a new order
+        if row_id:
+            current_id = row_id
+            if current_id not in grouped_orders:
+                grouped_orders[current_id] = {
+                    'id': current_id,
+                    'clientName': client_name,
+                    'specifications': specs,
+                    'createdAt': created_at,
+                    'updatedAt': updated_at,
+                    'status': status,
+                    'notes': notes,
+                    'items': []
+                }
+        # Only add items if we have a current order
+        if current_id and (size or qty):
+            # Normalize size for duplicate checking
+            norm_size = str(size).strip().lower()
+            already_exists = any(str(item['sizes']).strip().lower() == norm_size for item in grouped_orders[current_id]['items'])
+            if size and qty and not already_exists:
+                grouped_orders[current_id]['items'].append({
+                    'sizes': size,
+                    'quantity': qty
+                })
+    return grouped_orders
+
+def legacy_group_search_tab(orders, raw_data):
+    grouped_orders = {}
+
+    for order in orders:
+        order_id = order.get('id', '')
+        if not order_id:  # Skip rows without an ID
+            continue
+
+        # If this is a new order ID, initialize its entry
+        if order_id not in grouped_orders:
+            grouped_orders[order_id] = {
+                'id': order_id,
+                'clientName': order.get('clientName', ''),
+                'specifications': order.get('specifications', ''),
+                'createdAt': order.get('createdAt', ''),
+                'updatedAt': order.get('updatedAt', ''),
+                'status': order.get('status', ''),
+                'notes': order.get('notes', ''),
+                'items': []
+            }
+
+        # Add size/quantity if present and not already listed
+        size = order.get('sizes', '')
+        qty = order.get('quantity', '')
+        items = grouped_orders[order_id]['items']
+        if size and qty and not any(item['sizes'] == size for item in items):
+            items.append({'sizes': size, 'quantity': qty})
+
+    # Rows without an ID continue the order above them
+    current_id = None
+    for row in raw_data:
+        # Skip header row
+        if len(row) == 0 or row[0] == 'ID' or row[0] == 'id':
+            continue
+
+        row_id = row[0]
+        size = row[3] if len(row) > 3 else ''  # SIZES column (index 3)
+        qty = row[4] if len(row) > 4 else ''   # QUANTITY column (index 4)
+
+        if row_id:
+            current_id = row_id
+            continue  # Rows with IDs were already handled above
+
+        if current_id in grouped_orders and size and qty:
+            items = grouped_orders[current_id]['items']
+            if not any(item['sizes'] == size for item in items):
+                items.append({'sizes': size, 'quantity': qty})
+
+    return grouped_orders
+
+def legacy_merge_search(hits):
+    grouped_orders = {}
+    for tab, order_id, order in hits:
+        if order_id not in grouped_orders:
+            grouped_orders[order_id] = dict(order, source_tab=tab, items=list(order['items']))
+            continue
+        items = grouped_orders[order_id]['items']
+        for item in order['items']:
+            if not any(existing['sizes'] == item['sizes'] for existing in items):
+                items.append(item)
+    return grouped_orders
+
+def merge_search(hits):
+    # Mirrors render_search_results in backend/sheets.py
+    merged = OrderGrouper()
+    for tab, order_id, order in hits:
+        merged.start_order(order_id, order.fields(), source_tab=tab)
+        for item in order.items:
+            merged.add_item(order_id, item.sizes, item.quantity)
+    return merged.orders
+
+def as_dicts(grouped_orders):
+    return {order_id: order.as_dict() for order_id, order in grouped_orders.items()}
+
+ORDER_KEYS = ['id', 'clientName', 'specifications', 'sizes', 'quantity', 'status', 'notes', 'createdAt', 'updatedAt']
+SIZES = ['', ' ', '100x200', '100X200', ' 100x200 ', '50x80', 'A', 'a', 120, 120.0, '120']
+QUANTITIES = ['', '1', '2', 0, 3]
+
+def random_rows(rng, count):
+    rows = [['ID', 'Client Name', 'Specifications', 'Sizes', 'Quantity', 'Status', 'Notes', 'Created At', 'Updated At']]
+    for _ in range(count):
+        kind = rng.random()
+        if kind < 0.03:
+            rows.append([])
+            continue
+        if kind < 0.05:
+            rows.append([rng.choice(['ID', 'id'])])
+            continue
+        row_id = str(rng.randint(1, 12)) if rng.random() < 0.5 else ''
+        row = [row_id, f'client {row_id}', f'spec {rng.randint(1, 3)}', rng.choice(SIZES), rng.choice(QUANTITIES),
+               'Pending', rng.choice(['', 'note']), '2025-06-28', rng.choice(['2025-06-28', '2025-07-01'])]
+        rows.append(row[:rng.randint(1, 8)] if rng.random() < 0.1 else row)
+    return rows
+
+def orders_from_rows(rows):
+    # What getOrdersFromSheet returns for the same sheet: one dict per row with an ID
+    return [dict(zip(ORDER_KEYS, row)) for row in rows[1:] if row and row[0] and row[0] not in ('ID', 'id')]
+
+def random_orders(rng, count):
+    # Independent of the raw rows, e.g. when the two reads saw different versions of the sheet
+    return [{key: rng.choice(SIZES) if key == 'sizes' else rng.choice(QUANTITIES) if key == 'quantity'
+             else str(rng.randint(0, 12)) if key == 'id' else f'{key} {rng.randint(1, 2)}'
+             for key in ORDER_KEYS if rng.random() < 0.95}
+            for _ in range(count)]
+
+def test_tab_grouping_matches_legacy():
+    rng = random.Random(7)
+    for _ in range(3000):
+        rows = random_rows(rng, rng.randint(0, 40))
+        assert as_dicts(group_tab_rows(rows)) == legacy_group_tab(rows), rows
+
+def test_search_grouping_matches_legacy():
+    rng = random.Random(11)
+    for _ in range(3000):
+        rows = random_rows(rng, rng.randint(0, 40))
+        orders = orders_from_rows(rows) if rng.random() < 0.7 else random_orders(rng, rng.randint(0, 20))
+        assert as_dicts(group_search_rows(orders, rows)) == legacy_group_search_tab(orders, rows), (orders, rows)
+
+def test_search_merge_matches_legacy():
+    rng = random.Random(13)
+    for _ in range(1000):
+        hits = []
+        for tab in ['Pending', 'Ready', 'Delivered', 'Completed']:
+            rows = random_rows(rng, rng.randint(0, 15))
+            for order_id, order in group_search_rows(orders_from_rows(rows), rows).items():
+                hits.append((tab, order_id, order))
+        legacy_hits = [(tab, order_id, order.as_dict()) for tab, order_id, order in hits]
+        assert as_dicts(merge_search(hits)) == legacy_merge_search(legacy_hits), hits
+
+def benchmark_rows(count=50000, sizes_per_order=25, seed=3):
+    # Orders with many continuation rows: the legacy any() scan is O(rows x items per order)
+    rng = random.Random(seed)
+    rows = [['ID', 'Client Name', 'Specifications', 'Sizes', 'Quantity', 'Status', 'Notes', 'Created At', 'Updated At']]
+    order_id = 100000
+    while len(rows) <= count:
+        order_id += 1
+        rows.append([str(order_id), f'Client {order_id % 97}', '10mm clear', '100x200', '2', 'Pending', '',
+                     '2025-06-28', '2025-06-28'])
+        for _ in range(sizes_per_order - 1):
+            rows.append(['', '', '', f'{rng.randint(10, 400)}x{rng.randint(10, 400)}', str(rng.randint(1, 9)),
+                         '', '', '', ''])
+    return rows[:count + 1]
+
+def time_call(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+def test_grouping_50k_rows():
+    rows = benchmark_rows()
+    orders = orders_from_rows(rows)
+    tab_time, tab_orders = time_call(group_tab_rows, rows)
+    search_time, search_orders = time_call(group_search_rows, orders, rows)
+    assert as_dicts(tab_orders) == legacy_group_tab(rows)
+    assert as_dicts(search_orders) == legacy_group_search_tab(orders, rows)
+    # Generous bound so slow CI machines pass; typical runs take a small fraction of it
+    assert tab_time < 2 and search_time < 2
+
+def retained_bytes(func, *args):
+    """Bytes still allocated by func's result once it returns"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = func(*args)
+        return tracemalloc.get_traced_memory()[0], result
+    finally:
+        tracemalloc.stop()
+
+def test_grouped_100k_row_tab_is_compact():
+    rows = benchmark_rows(100000, sizes_per_order=3)
+    model_bytes, orders = retained_bytes(group_tab_rows, rows)
+    legacy_bytes, legacy_orders = retained_bytes(legacy_group_tab, rows)
+    assert len(orders) == len(legacy_orders)
+    # Slotted orders and items hold well under the per-order and per-item dicts
+    assert model_bytes < legacy_bytes * 0.6, (model_bytes, legacy_bytes)
+
+def test_display_dates_are_parsed_once():
+    rows = [['1', 'A', 'spec', '100x200', '2', 'Ready', '', '2025-06-28T10:00:00Z', 'not a date']]
+    order = group_tab_rows(rows)['1']
+    assert order.created == '28 June 2025'
+    assert order.created is order.created
+    assert order.updated == 'not a date'
+    assert format_date_only('') == ''
+
+if __name__ == "__main__":
+    test_tab_grouping_matches_legacy()
+    test_search_grouping_matches_legacy()
+    test_search_merge_matches_legacy()
+    test_grouping_50k_rows()
+    test_grouped_100k_row_tab_is_compact()
+    rows = benchmark_rows()
+    orders = orders_from_rows(rows)
+    print(f"Grouping {len(rows) - 1} rows ({len(orders)} orders, 25 sizes each):")
+    for name, legacy, engine, args in [
+        ('tab listing', legacy_group_tab, group_tab_rows, (rows,)),
+        ('search', legacy_group_search_tab, group_search_rows, (orders, rows)),
+    ]:
+        legacy_time = min(time_call(legacy, *args)[0] for _ in range(3))
+        engine_time = min(time_call(engine, *args)[0] for _ in range(3))
+        print(f"  {name:<12} legacy {legacy_time * 1000:7.1f} ms   engine {engine_time * 1000:7.1f} ms   "
+              f"{legacy_time / engine_time:4.1f}x")
+    for sizes_per_order in (25, 3):
+        rows = benchmark_rows(100000, sizes_per_order=sizes_per_order)
+        legacy_bytes, _ = retained_bytes(legacy_group_tab, rows)
+        model_bytes, orders = retained_bytes(group_tab_rows, rows)
+        print(f"Memory held by a grouped 100k-row tab ({len(orders)} orders, {sizes_per_order} sizes each): "
+              f"dicts {legacy_bytes / 1e6:.1f} MB   Order/Item {model_bytes / 1e6:.1f} MB")
@@ -0,0 +1,125 @@
+"""
+Tests for the duplicate-message store in backend/message_dedupe.py, and for
+how app.py and asgi.py apply it to /update.
+"""
+
+import importlib
+import os
+import tempfile
+import threading
+import time
+
+import pytest
+from starlette.testclient import TestClient
+
+from backend.message_dedupe import MessageDedupe, message_key
+
+def new_store(**options):
+    options.setdefault('wait', 0)
+    return MessageDedupe(os.path.join(tempfile.mkdtemp(), 'dedupe.db'), **options)
+
+def test_repeat_gets_the_first_reply():
+    store = new_store()
+    assert store.claim('id:a:1', 60) == (True, None)
+    store.complete('id:a:1', '✅ Order added')
+    assert store.claim('id:a:1', 60) == (False, '✅ Order added')
+    assert store.claim('id:a:2', 60) == (True, None)
+
+def test_released_claim_runs_again():
+    store = new_store()
+    assert store.claim('k', 60)[0]
+    store.release('k')
+    assert store.claim('k', 60)[0]
+
+def test_concurrent_copies_are_handled_once():
+    store = new_store(wait=5)
+    handled = []
+    replies = []
+
+    def deliver():
+        claimed, reply = store.claim('id:a:1', 60)
+        if claimed:
+            handled.append(1)
+            time.sleep(0.2)
+            reply = 'done'
+            store.complete('id:a:1', reply)
+        replies.append(reply)
+
+    threads = [threading.Thread(target=deliver) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(handled) == 1
+    assert replies == ['done'] * 8
+
+def test_keys_expire_after_their_window():
+    store = new_store()
+    store.claim('k', 0.05)
+    store.complete('k', 'first')
+    time.sleep(0.1)
+    assert store.claim('k', 60) == (True, None)
+
+def test_abandoned_claim_is_retaken():
+    store = new_store(claim_timeout=0.05)
+    assert store.claim('k', 60)[0]
+    assert store.claim('k', 60) == (False, None)
+    time.sleep(0.1)
+    assert store.claim('k', 60)[0]
+
+def test_store_is_bounded():
+    store = new_store(max_entries=3)
+    for number in range(6):
+        store.claim(f'k{number}', 60)
+        store.complete(f'k{number}', str(number))
+    assert store.claim('k0', 60)[0]
+    assert store.claim('k5', 60) == (False, '5')
+
+def test_message_key():
+    assert message_key('971@c.us', 'hi', 'ABC')[0] == 'id:971@c.us:ABC'
+    key, _ = message_key('971@c.us', 'Client Name: A\n 10x10 - 1 ')
+    assert key == message_key('971@c.us', 'client name: a 10x10 - 1')[0]
+    assert key != message_key('972@c.us', 'Client Name: A\n 10x10 - 1 ')[0]
+    assert message_key('971@c.us', '/update 123 ready', by_content=False) is None
+    assert message_key('971@c.us', '/update 123 ready', 'ABC', by_content=False)[0] == 'id:971@c.us:ABC'
+
+@pytest.fixture(params=['app', 'asgi'])
+def send_update(request, monkeypatch):
+    """Post /update messages to app.py or asgi.py; the sheet update succeeds per the `results` list"""
+    monkeypatch.syspath_prepend(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+    server = importlib.import_module(request.param)
+    monkeypatch.setattr(server, 'message_dedupe', server.MessageDedupe(os.path.join(tempfile.mkdtemp(), 'dedupe.db'), wait=0))
+    results, applied = [], []
+    def update(params):
+        applied.append(params['status'])
+        return results.pop(0) if results else True
+    if request.param == 'app':
+        monkeypatch.setattr(server, 'update_order_status', update)
+        client = server.app.test_client()
+        reply_of = lambda response: response.get_json()['reply']
+    else:
+        async def update_async(params):
+            return update(params)
+        monkeypatch.setattr(server, 'update_order_status_async', update_async)
+        client = TestClient(server.app)
+        reply_of = lambda response: response.json()['reply']
+
+    def send(status, message_id=None):
+        body = {'body': f'/update 123 {status}', 'from': '971@c.us'}
+        if message_id:
+            body['messageId'] = message_id
+        return reply_of(client.post('/api/whatsapp_in', json=body))
+    send.results, send.applied = results, applied
+    return send
+
+def test_failed_update_is_not_remembered(send_update):
+    send_update.results.append(False)
+    assert send_update('ready', 'M1').startswith('❌ Failed to update order 123')
+    assert send_update('ready', 'M1').startswith('✅')
+    assert send_update('ready', 'M1').startswith('✅')
+    assert send_update.applied == ['ready', 'ready']
+
+def test_update_without_message_id_always_runs(send_update):
+    for status in ('ready', 'pending', 'ready'):
+        assert send_update(status).startswith('✅')
+    assert send_update.applied == ['ready', 'pending', 'ready']
@@ -0,0 +1,48 @@
+"""
+Tests for the Prometheus text exposition in backend/metrics.py and the
+extraction pattern counters it reports.
+"""
+
+from backend.extraction import extract_order_info, get_pattern_hits
+from backend.metrics import Counter, Gauge, Histogram, render_metrics
+
+def sample_lines(name):
+    return [line for line in render_metrics().splitlines() if line.startswith(name)]
+
+def test_histogram_buckets_are_cumulative():
+    latency = Histogram('test_latency_seconds', 'Test latency', ['action'], buckets=(0.1, 1))
+    for value in (0.05, 0.5, 0.5, 5):
+        latency.observe(value, action='getOrders')
+    assert sample_lines('test_latency_seconds') == [
+        'test_latency_seconds_bucket{action="getOrders",le="0.1"} 1',
+        'test_latency_seconds_bucket{action="getOrders",le="1"} 3',
+        'test_latency_seconds_bucket{action="getOrders",le="+Inf"} 4',
+        'test_latency_seconds_sum{action="getOrders"} 6.05',
+        'test_latency_seconds_count{action="getOrders"} 4',
+    ]
+    assert '# TYPE test_latency_seconds histogram' in render_metrics()
+
+def test_counter_and_gauge_samples():
+    errors = Counter('test_errors_total', 'Test errors', ['action', 'kind'])
+    errors.inc(action='batch', kind='http')
+    errors.inc(2, action='batch', kind='http')
+    in_flight = Gauge('test_in_flight', 'Test gauge')
+    with in_flight.track_in_progress():
+        assert in_flight.value() == 1
+    assert sample_lines('test_errors_total') == ['test_errors_total{action="batch",kind="http"} 3']
+    assert sample_lines('test_in_flight') == ['test_in_flight 0']
+
+def test_label_values_are_escaped():
+    counter = Counter('test_escaped_total', 'Test escaping', ['route'])
+    counter.inc(route='a"b\\c\nd')
+    assert sample_lines('test_escaped_total') == ['test_escaped_total{route="a\\"b\\\\c\\nd"} 1']
+
+def test_extraction_counts_matched_pattern():
+    before = get_pattern_hits()
+    extract_order_info('Client Name: Ann\n1. 83 x 72 - 1')
+    extract_order_info('Client Name: Ann\n83 x 72 - 1')
+    extract_order_info('Client Name: Ann\nSizes:\n83 x 72\nQuantities:\n1')
+    extract_order_info('hello')
+    after = get_pattern_hits()
+    assert {pattern: after[pattern] - before[pattern] for pattern in after} == {
+        'numbered': 1, 'bare': 1, 'sections': 1, 'glass_specs': 0, 'none': 1}
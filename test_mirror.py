@@ -0,0 +1,106 @@
+"""
+Tests for the SQLite sheet mirror in backend/mirror.py: full and delta
+syncs, staleness, order lookups and the 'Updated At' watermark.
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+
+from mirror import SheetMirror, parse_timestamp  # noqa: E402
+
+COLUMNS = ['ID', 'Client Name', 'Specifications', 'Sizes', 'Quantity', 'Status',
+           'Notes', 'Created At', 'Updated At', 'Sync Status']
+
+def row(order_id, client='', size='', updated=''):
+    return [order_id, client, '', size, '1' if size else '', '', '', '', updated, '']
+
+class FakeScript:
+    """getRawSheetData stand-in: answers with the queued replies (the last one repeats) and records updatedSince"""
+
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.since = []
+
+    def __call__(self, tab, since):
+        self.since.append(since)
+        return self.replies.pop(0) if len(self.replies) > 1 else self.replies[0]
+
+def full(*rows):
+    return {'data': [COLUMNS] + [list(values) for values in rows]}
+
+def new_mirror(script, max_staleness=60):
+    return SheetMirror(os.path.join(tempfile.mkdtemp(), 'mirror.db'), COLUMNS, script, max_staleness=max_staleness)
+
+def test_full_sync_writes_only_changed_rows():
+    script = FakeScript(
+        full(row('1', 'Ahmed', '10x10'), row('', size='20x20'), row('2', 'Sara', '30x30')),
+        full(row('1', 'Ahmed', '10x10'), row('', size='25x25')),
+    )
+    mirror = new_mirror(script)
+    assert mirror.sync('Pending') == 3
+    assert [order['id'] for order in mirror.orders('Pending')] == ['1', '2']
+    # Second sync: one row changed, the last row is gone
+    assert mirror.sync('Pending') == 1
+    assert mirror.raw_rows('Pending') == [COLUMNS, row('1', 'Ahmed', '10x10'), row('', size='25x25')]
+    assert mirror.status()['Pending']['rows'] == 2
+
+def test_delta_sync_applies_changed_rows_and_row_count():
+    script = FakeScript(
+        full(row('1', 'Ahmed', '10x10'), row('2', 'Sara', '20x20'), row('3', 'Omar', '30x30')),
+        {'changedRows': [{'row': 2, 'values': row('3', 'Omar', '30x30')}], 'rowCount': 2},
+    )
+    mirror = new_mirror(script)
+    mirror.sync('Pending')
+    assert mirror.sync('Pending') == 1
+    assert [order['id'] for order in mirror.orders('Pending')] == ['1', '3']
+
+def test_reads_sync_only_when_stale_or_marked_stale():
+    script = FakeScript(full(row('1', 'Ahmed', '10x10')))
+    mirror = new_mirror(script)
+    first = mirror.orders('Pending')
+    assert mirror.orders('Pending') is first
+    assert len(script.since) == 1
+    mirror.mark_stale('Pending')
+    assert mirror.status()['Pending']['stale']
+    mirror.orders('Pending')
+    assert len(script.since) == 2
+    assert not mirror.status()['Pending']['stale']
+
+    expired = new_mirror(FakeScript(full(row('1', 'Ahmed', '10x10'))), max_staleness=0)
+    expired.orders('Pending')
+    expired.orders('Pending')
+    assert len(expired.fetch.since) >= 2
+
+def test_tabs_containing():
+    mirror = new_mirror(FakeScript(full(row('1', 'Ahmed', '10x10'), row('', size='20x20'), row('2', 'Sara', '30x30'))))
+    mirror.sync('Pending')
+    mirror.sync('Ready')
+    assert mirror.tabs_containing('2') == {'Pending', 'Ready'}
+    assert mirror.tabs_containing(' 1 ') == {'Pending', 'Ready'}
+    assert mirror.tabs_containing('9') == set()
+
+def test_watermark_compares_hand_edited_dates_as_dates():
+    script = FakeScript(full(
+        row('1', 'Ahmed', '10x10', updated='2025-12-01 10:00:00'),
+        row('2', 'Sara', '20x20', updated='3/7/2025 9:05'),
+        row('3', 'Omar', '30x30', updated='not a date'),
+    ), full(row('1', 'Ahmed', '10x10', updated='12/24/2025 8:00')))
+    mirror = new_mirror(script)
+    mirror.sync('Pending')
+    mirror.sync('Pending')
+    mirror.sync('Pending')
+    # As text, '3/7/2025 9:05' sorts after '2025-12-01 10:00:00'
+    assert script.since == [None, '2025-12-01 10:00:00', '2025-12-24 08:00:00']
+
+def test_parse_timestamp():
+    assert str(parse_timestamp('2025-03-07 09:05:00')) == '2025-03-07 09:05:00'
+    assert str(parse_timestamp('2025-03-07T05:05:00.000Z')) == '2025-03-07 05:05:00'
+    assert str(parse_timestamp('12/24/2025 8:00')) == '2025-12-24 08:00:00'
+    assert str(parse_timestamp('24/12/2025')) == '2025-12-24 00:00:00'
+    # Either March 7 or July 3: the earlier reading, so no change is skipped
+    assert str(parse_timestamp('3/7/2025 9:05')) == '2025-03-07 09:05:00'
+    assert str(parse_timestamp('7/3/2025 9:05')) == '2025-03-07 09:05:00'
+    assert parse_timestamp('soon') is None
@@ -0,0 +1,84 @@
+"""
+Tests for the persisted order ID counter in backend/order_ids.py.
+"""
+
+import multiprocessing
+import os
+import tempfile
+
+from backend.order_ids import OrderIdAllocator
+
+def counter_path():
+    return os.path.join(tempfile.mkdtemp(), 'order_ids.counter')
+
+def test_ids_are_sequential_from_the_start():
+    allocator = OrderIdAllocator(counter_path(), start=1000000, epoch=None)
+    assert allocator.next_id() == '1000000'
+    assert allocator.allocate(3) == ['1000001', '1000002', '1000003']
+
+def test_counter_survives_a_restart():
+    path = counter_path()
+    OrderIdAllocator(path, epoch=None).allocate(5)
+    assert OrderIdAllocator(path, start=1000000, epoch=None).next_id() == '1000005'
+
+def test_shard_digit_is_appended():
+    allocator = OrderIdAllocator(counter_path(), start=1000000, shard='7', epoch=None)
+    assert allocator.allocate(2) == ['10000007', '10000017']
+    try:
+        OrderIdAllocator(counter_path(), shard='12')
+    except ValueError:
+        pass
+    else:
+        assert False, 'two-digit shard accepted'
+
+def test_lost_counter_resumes_past_issued_ids(monkeypatch):
+    monkeypatch.setattr('backend.order_ids.time.time', lambda: 60000.0)
+    path = counter_path()
+    issued = OrderIdAllocator(path, start=1000000, epoch=0).allocate(3)
+    assert issued == ['1001000', '1001001', '1001002']
+    # Redeploy an hour later on a fresh filesystem: the counter file is gone
+    os.remove(path)
+    monkeypatch.setattr('backend.order_ids.time.time', lambda: 63600.0)
+    assert OrderIdAllocator(path, start=1000000, epoch=0).next_id() == '1001060'
+
+def test_floor_keeps_ids_at_seven_digits_for_years(monkeypatch):
+    # 2040-01-01, with the default epoch and minute unit
+    monkeypatch.setattr('backend.order_ids.time.time', lambda: 2208988800.0)
+    assert len(OrderIdAllocator(counter_path(), start=1000000).next_id()) == 7
+
+def _allocate_many(path, count, queue):
+    allocator = OrderIdAllocator(path, epoch=None)
+    queue.put([allocator.next_id() for _ in range(count)])
+
+def test_processes_never_share_an_id():
+    path = counter_path()
+    queue = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=_allocate_many, args=(path, 50, queue)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    ids = [order_id for _ in workers for order_id in queue.get(timeout=30)]
+    for worker in workers:
+        worker.join()
+    assert len(set(ids)) == 200
+    assert sorted(int(order_id) for order_id in ids) == list(range(1000000, 1000200))
+
+class CountingAllocator(OrderIdAllocator):
+    def __init__(self, path):
+        super().__init__(path, start=1000000, epoch=None)
+        self.updates = 0
+
+    def allocate(self, count):
+        self.updates += 1
+        return super().allocate(count)
+
+def test_a_message_takes_its_new_ids_in_one_update(monkeypatch):
+    monkeypatch.syspath_prepend(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+    import sheets
+    allocator = CountingAllocator(counter_path())
+    monkeypatch.setattr(sheets, '_order_ids', allocator)
+    infos = [{'client_name': 'A'}, {'client_name': 'B', 'invoice_number': 'INV-9'}, {'client_name': 'C'}]
+    built = sheets.build_orders_rows(infos)
+    assert [order_id for order_id, _ in built] == ['1000000', 'INV-9', '1000001']
+    assert allocator.updates == 1
+    assert sheets.build_orders_rows([{'invoice_number': 'INV-1'}])[0][0] == 'INV-1'
+    assert allocator.updates == 1
@@ -0,0 +1,160 @@
+"""
+Tests for the write-behind order queue in backend/order_queue.py: the journal
+(append, ack, replay after a crash, compaction), orphan adoption, orders
+Sheets keeps rejecting, and the drain on stop().
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+
+from order_queue import DEAD_LETTER_FILE, OrderJournal, WriteBehindQueue  # noqa: E402
+
+def journal_path():
+    return os.path.join(tempfile.mkdtemp(), 'journal-0.jsonl')
+
+def journal_lines(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+class FakeSheet:
+    """sync_func that records rows and rejects any batch holding a row with 'bad' set"""
+
+    def __init__(self, down=False):
+        self.rows = []
+        self.calls = 0
+        self.batch_sizes = []
+        self.down = down
+
+    def __call__(self, rows):
+        self.calls += 1
+        self.batch_sizes.append(len(rows))
+        if self.down:
+            raise ConnectionError('Apps Script unreachable')
+        if any(row.get('bad') for row in rows):
+            raise RuntimeError('Apps Script error: Invalid row')
+        self.rows.extend(rows)
+
+    def order_ids(self):
+        return [row['id'] for row in self.rows]
+
+def new_queue(sheet, **options):
+    options.setdefault('flush_interval', 3600)
+    options.setdefault('retry_delay', 3600)
+    return WriteBehindQueue(tempfile.mkdtemp(), sheet, **options)
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.01)
+
+def test_replay_after_crash_keeps_unacknowledged_orders():
+    path = journal_path()
+    journal = OrderJournal(path)
+    for order_id in ('A', 'B', 'C'):
+        journal.append(order_id, [{'id': order_id}])
+    journal.ack([1])
+    journal._file.write('{"op": "add", "seq": 4, "order')  # torn write at the crash
+    journal.close()
+
+    replayed = OrderJournal(path)
+    assert [record['order_id'] for record in replayed.pending.values()] == ['B', 'C']
+    assert replayed.append('D', [])['seq'] == 4
+    replayed.close()
+
+def test_journal_is_compacted_once_acked_records_outnumber_pending():
+    path = journal_path()
+    journal = OrderJournal(path)
+    for order_id in 'ABCDE':
+        journal.append(order_id, [])
+    journal.ack([1, 2])
+    assert len(journal_lines(path)) == 6  # 2 acked < 3 pending: not yet
+    journal.ack([3])
+    assert [record['order_id'] for record in journal_lines(path)] == ['D', 'E']
+    journal.append('F', [])
+    journal.ack([4])
+    assert len(journal_lines(path)) == 4
+    journal.close()
+    assert [record['order_id'] for record in OrderJournal(path).pending.values()] == ['E', 'F']
+
+def test_orphaned_journal_is_adopted_and_synced():
+    sheet = FakeSheet()
+    queue = new_queue(sheet, flush_interval=0.01)
+    orphan = OrderJournal(os.path.join(queue.directory, 'journal-3.jsonl'))
+    orphan.append('A', [{'id': 'A'}])
+    orphan.append('B', [{'id': 'B'}])
+    orphan.ack([1])
+    orphan.close()
+
+    queue.start()
+    try:
+        wait_for(lambda: queue.status()['synced_total'] == 1)
+        assert sheet.order_ids() == ['B']
+        assert not os.path.exists(os.path.join(queue.directory, 'journal-3.jsonl'))
+    finally:
+        queue.stop()
+
+def test_rejected_order_does_not_hold_up_the_queue():
+    sheet = FakeSheet()
+    queue = new_queue(sheet, batch_size=10, max_failures=2)
+    queue.start()
+    try:
+        queue.enqueue_many([(order_id, [{'id': order_id, 'bad': order_id == 'B'}]) for order_id in 'ABCDE'])
+        wait_for(lambda: queue.status()['synced_total'] == 4)
+        assert sheet.order_ids() == ['A', 'C', 'D', 'E']
+        status = queue.status()
+        assert status['backlog'] == 1 and 'Invalid row' in status['last_error']
+
+        # Alone, B may just be meeting an Apps Script outage, so it waits for an order to compare with
+        queue.enqueue('F', [{'id': 'F'}])
+        wait_for(lambda: queue.status()['dead_lettered_total'] == 1)
+        assert sheet.order_ids() == ['A', 'C', 'D', 'E', 'F']
+        assert queue.status()['backlog'] == 0
+        dead = journal_lines(os.path.join(queue.directory, DEAD_LETTER_FILE))
+        assert [record['order_id'] for record in dead] == ['B'] and 'Invalid row' in dead[0]['error']
+    finally:
+        queue.stop()
+
+def test_outage_dead_letters_nothing():
+    sheet = FakeSheet(down=True)
+    queue = new_queue(sheet, max_failures=1, flush_interval=0.01, retry_delay=0.01)
+    queue.start()
+    try:
+        queue.enqueue_many([(order_id, [{'id': order_id}]) for order_id in 'ABCD'])
+        wait_for(lambda: sheet.calls >= 5)
+        status = queue.status()
+        assert status['backlog'] == 4 and status['dead_lettered_total'] == 0
+        assert 'unreachable' in status['last_error']
+        assert not os.path.exists(os.path.join(queue.directory, DEAD_LETTER_FILE))
+        # A network error is retried as a whole, not split order by order
+        assert set(sheet.batch_sizes) == {4}
+    finally:
+        queue.stop()
+
+def test_stop_drains_the_backlog():
+    sheet = FakeSheet()
+    queue = new_queue(sheet)
+    queue.start()
+    queue.enqueue_many([(order_id, [{'id': order_id}]) for order_id in 'ABC'])
+    assert queue.stop() == 0
+    assert sheet.order_ids() == ['A', 'B', 'C']
+
+def test_stop_leaves_unsynced_orders_for_the_next_process():
+    sheet = FakeSheet(down=True)
+    queue = new_queue(sheet)
+    queue.start()
+    queue.enqueue('A', [{'id': 'A'}])
+    assert queue.stop() == 1
+    queue.journal.close()
+    queue._lock_file.close()
+
+    sheet.down = False
+    restarted = WriteBehindQueue(queue.directory, sheet, flush_interval=3600)
+    restarted.start()
+    assert restarted.stop() == 0
+    assert sheet.order_ids() == ['A']
@@ -0,0 +1,125 @@
+"""
+Tests for tab pagination: the per-sender page cursors in
+backend/page_cursors.py and the paged /pending-style replies rendered by
+backend/sheets.py (render_tab_data).
+"""
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+
+import page_cursors  # noqa: E402
+import sheets  # noqa: E402
+from page_cursors import PageCursors  # noqa: E402
+
+def new_cursors(ttl=1800):
+    return PageCursors(os.path.join(tempfile.mkdtemp(), 'cursors.db'), ttl=ttl)
+
+def row(order_id, client='', size='', qty='', created=''):
+    return [order_id, client, '6mm clear' if client else '', size, qty, 'Pending' if client else '', '', created, '', '']
+
+def pending_tab(count):
+    """A Pending tab of count orders (100001, 100002, ...) with one size each"""
+    return [list(sheets.COLUMNS)] + [row(str(100000 + n), f'Client {n}', f'{n}x{n}', '1', '2025-03-01 10:00:00')
+                                      for n in range(1, count + 1)]
+
+@pytest.fixture
+def paged(monkeypatch):
+    """render_tab_data with 2 orders per page and a fresh cursor store"""
+    monkeypatch.setattr(sheets, 'TAB_PAGE_SIZE', 2)
+    monkeypatch.setattr(sheets, '_page_cursors', new_cursors())
+    def render(raw_data, page=None, sender='971@c.us'):
+        return sheets.render_tab_data('Pending', [{}], raw_data, page, sender)
+    return render
+
+def order_ids(reply):
+    return [line.split()[-1] for line in reply.splitlines() if line.startswith('*Order ID:*')]
+
+def test_next_and_prev_without_a_cursor_start_at_page_one():
+    cursors = new_cursors()
+    assert cursors.resolve('a', 'Pending', 'next', 5) == 1
+    assert cursors.resolve('b', 'Pending', 'prev', 5) == 1
+
+def test_next_and_prev_move_from_the_stored_cursor():
+    cursors = new_cursors()
+    assert cursors.resolve('a', 'Pending', 3, 5) == 3
+    assert cursors.resolve('a', 'Pending', 'next', 5) == 4
+    assert cursors.resolve('a', 'Pending', 'prev', 5) == 3
+    assert cursors.resolve('a', 'Pending', 'prev', 5) == 2
+    # Cursors are per sender and per tab
+    assert cursors.resolve('a', 'Ready', 'next', 5) == 1
+    assert cursors.resolve('b', 'Pending', 'next', 5) == 1
+
+def test_pages_are_clamped():
+    cursors = new_cursors()
+    assert cursors.resolve('a', 'Pending', 9, 3) == 3
+    assert cursors.resolve('a', 'Pending', 'next', 3) == 3
+    assert cursors.resolve('a', 'Pending', 0, 3) == 1
+    assert cursors.resolve('a', 'Pending', 'prev', 3) == 1
+    assert cursors.resolve('a', 'Pending', -2, 3) == 1
+    # The tab shrank since the cursor was stored
+    cursors.resolve('b', 'Pending', 5, 5)
+    assert cursors.resolve('b', 'Pending', 'next', 2) == 2
+
+def test_without_a_sender_nothing_is_stored():
+    cursors = new_cursors()
+    assert cursors.resolve(None, 'Pending', 2, 5) == 2
+    assert cursors.resolve(None, 'Pending', 'next', 5) == 1
+
+def test_cursor_expires(monkeypatch):
+    cursors = new_cursors(ttl=60)
+    now = [1000.0]
+    monkeypatch.setattr(page_cursors.time, 'time', lambda: now[0])
+    cursors.resolve('a', 'Pending', 3, 5)
+    now[0] += 59
+    assert cursors.get('a', 'Pending') == 3
+    now[0] += 2
+    assert cursors.get('a', 'Pending') is None
+    assert cursors.resolve('a', 'Pending', 'next', 5) == 1
+
+def test_page_header_and_footer(paged):
+    raw_data = pending_tab(5)
+    first = paged(raw_data)
+    assert first.startswith('*Pending Orders - 5 orders (page 1 of 3)*\n')
+    assert order_ids(first) == ['100001', '100002']
+    assert first.endswith('Send `/pending next` for page 2 or `/pending [page]` to jump.\n')
+
+    second = paged(raw_data, 'next')
+    assert second.startswith('*Pending Orders - 5 orders (page 2 of 3)*\n')
+    assert order_ids(second) == ['100003', '100004']
+    assert 'for page 3' in second
+
+    last = paged(raw_data, 'next')
+    assert last.startswith('*Pending Orders - 5 orders (page 3 of 3)*\n')
+    assert order_ids(last) == ['100005']
+    assert 'next`' not in last
+    assert order_ids(paged(raw_data, 'next')) == ['100005']
+    assert order_ids(paged(raw_data, 'prev')) == ['100003', '100004']
+
+def test_single_page_has_no_page_label_or_footer(paged):
+    reply = paged(pending_tab(2))
+    assert reply.startswith('*Pending Orders - 2 orders*\n')
+    assert order_ids(reply) == ['100001', '100002'] and 'Send `' not in reply
+
+def test_order_in_several_row_runs_is_one_order_with_all_its_sizes(paged):
+    raw_data = [
+        list(sheets.COLUMNS),
+        row('A', 'Ahmed', '100x200', '2', '2025-03-01 10:00:00'),
+        row('', size='50x60', qty='4'),
+        row('B', 'Sara', '30x40', '1'),
+        # A's rows continue further down the sheet
+        row('A', size='70x80', qty='3'),
+        row('C', 'Omar', '1x1', '1'),
+    ]
+    first = paged(raw_data)
+    assert first.startswith('*Pending Orders - 3 orders (page 1 of 2)*\n')
+    assert order_ids(first) == ['A', 'B']
+    order_a = first.split('*Order ID:* B')[0]
+    assert '*Client:* Ahmed' in order_a
+    assert [line.strip() for line in order_a.splitlines() if line.strip().startswith('•')] == [
+        '• 100x200 - Qty: 2', '• 50x60 - Qty: 4', '• 70x80 - Qty: 3']
+    assert order_ids(paged(raw_data, 2)) == ['C']
@@ -0,0 +1,42 @@
+"""
+Tests for the per-sender token bucket in backend/rate_limit.py.
+"""
+
+import time
+
+from backend.rate_limit import SenderRateLimiter, slow_down_reply
+
+def test_burst_then_refused():
+    limiter = SenderRateLimiter(rate=1, burst=3)
+    assert [limiter.allow('a')[0] for _ in range(4)] == [True, True, True, False]
+    allowed, retry_after = limiter.allow('a')
+    assert not allowed and 0 < retry_after <= 1
+
+def test_senders_have_their_own_buckets():
+    limiter = SenderRateLimiter(rate=1, burst=1)
+    assert limiter.allow('a')[0]
+    assert not limiter.allow('a')[0]
+    assert limiter.allow('b')[0]
+
+def test_tokens_refill_over_time():
+    limiter = SenderRateLimiter(rate=20, burst=1)
+    assert limiter.allow('a')[0]
+    assert not limiter.allow('a')[0]
+    time.sleep(0.06)
+    assert limiter.allow('a')[0]
+
+def test_zero_rate_disables_limiting():
+    limiter = SenderRateLimiter(rate=0, burst=1)
+    assert all(limiter.allow('a')[0] for _ in range(100))
+
+def test_only_recent_senders_are_kept():
+    limiter = SenderRateLimiter(rate=1, burst=1, max_senders=2)
+    for sender in 'abc':
+        limiter.allow(sender)
+    # 'a' was forgotten, so it starts again with a full bucket
+    assert limiter.allow('a')[0]
+    assert not limiter.allow('c')[0]
+
+def test_slow_down_reply_rounds_up_to_a_second():
+    assert '1s' in slow_down_reply(0.2)
+    assert '3s' in slow_down_reply(2.6)
@@ -0,0 +1,83 @@
+"""
+Tests for /search: the inverted index in backend/search_index.py (word-prefix
+matching, ID lookups, field filters) and the query parser in
+backend/extraction.py (parse_search_query).
+"""
+
+import pytest
+
+from backend.extraction import parse_command, parse_search_query
+from backend.grouping import Order
+from backend.search_index import OrderIndex, tokenize
+
+ORDERS = [
+    # (id, client, specifications, tab)
+    ('123456', 'John Doe', '10mm Clear Tempered', 'Pending'),
+    ('123789', 'Johnny Walker', '6mm Frosted', 'Ready'),
+    ('PI-2024/17', 'Sara Ahmed', '10mm Frosted', 'Ready'),
+    ('777000', 'Ajohn Trading', '8mm Clear', 'Delivered'),
+]
+
+@pytest.fixture
+def index():
+    index = OrderIndex()
+    for order_id, client, spec, tab in ORDERS:
+        index.add(order_id, Order(order_id, (client, spec, '', '', '', '')), tab)
+    return index
+
+def test_tokenize():
+    assert tokenize('PI-2024/17') == ['pi', '2024', '17']
+    assert tokenize(' John  DOE ') == ['john', 'doe']
+    assert tokenize(None) == []
+
+def test_terms_match_the_start_of_a_word(index):
+    assert index.search(terms=['jo']) == ['123456', '123789']
+    assert index.search(terms=['doe']) == ['123456']
+    assert index.search(terms=['frost']) == ['123789', 'PI-2024/17']
+
+def test_middle_of_word_does_not_match(index):
+    # A substring search would find 'Johnny', 'Ajohn' and '123456' here
+    assert index.search(terms=['ohn']) == []
+    assert index.search(terms=['345']) == []
+    assert index.search(terms=['rosted']) == []
+
+def test_id_prefix_matches(index):
+    assert index.search(terms=['123']) == ['123456', '123789']
+    assert index.search(terms=['1234']) == ['123456']
+    # The whole ID matches as typed, separators included
+    assert index.search(terms=['PI-2024/17']) == ['PI-2024/17']
+    assert index.search(terms=['pi-2024']) == ['PI-2024/17']
+
+def test_every_term_must_match(index):
+    assert index.search(terms=['john', 'clear']) == ['123456']
+    assert index.search(terms=['john', 'sara']) == []
+    # Words of one term may match different fields
+    assert index.search(terms=['sara 10mm']) == ['PI-2024/17']
+
+def test_field_filters(index):
+    assert index.search(filters={'client': ['john']}) == ['123456', '123789']
+    assert index.search(filters={'client': ['ahmed'], 'spec': ['10mm']}) == ['PI-2024/17']
+    assert index.search(filters={'spec': ['john']}) == []
+    assert index.search(filters={'id': ['777']}) == ['777000']
+    assert index.search(filters={'tab': ['ready']}, terms=['frosted']) == ['123789', 'PI-2024/17']
+
+def test_no_query_matches_everything_in_index_order(index):
+    assert index.search() == [order_id for order_id, *_ in ORDERS]
+
+def test_parse_search_query():
+    assert parse_search_query('john') == ({}, ['john'])
+    assert parse_search_query('client:"John Doe" tab:pending spec:clear') == (
+        {'client': ['John Doe'], 'tab': ['pending'], 'spec': ['clear']}, [])
+    assert parse_search_query('specs:10mm specs:clear "sara ahmed" 777') == (
+        {'spec': ['10mm', 'clear']}, ['sara ahmed', '777'])
+    assert parse_search_query('id:PI-2024/17') == ({'id': ['PI-2024/17']}, [])
+
+def test_parse_search_query_keeps_unknown_fields_as_terms():
+    assert parse_search_query('10:30 note:"urgent job"') == ({}, ['10:30', 'note:urgent job'])
+    assert parse_search_query('"" john') == ({}, ['john'])
+
+def test_search_command_carries_filters_and_terms():
+    command = parse_command('/search client:john clear')
+    assert command['action'] == 'search_all_tabs'
+    assert command['params'] == {'search_term': 'client:john clear', 'filters': {'client': ['john']}, 'terms': ['clear']}
+    assert parse_command('/search')['action'] == 'show_search_help'
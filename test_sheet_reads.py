@@ -0,0 +1,240 @@
+"""
+Tests for tab reads in backend/sheets.py: reads in flight during a write must
+not be cached (in this or another worker), the mirror's sync state is reported in the client stats, and
+malformed batch responses fall back to individual calls, and the async client
+counts the connections it opens.
+Apps Script is replaced by a fake that holds the first read until the test
+releases it.
+"""
+
+import asyncio
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend')
+sys.path.insert(0, BACKEND_DIR)
+
+import sheets  # noqa: E402
+import sheets_async  # noqa: E402
+from tab_generations import TabGenerations  # noqa: E402
+
+class HeldAppsScript:
+    """Answers reads with the tab's current rows; the first read waits for release"""
+
+    def __init__(self):
+        self.rows = [{'id': 'before-write'}]
+        self.calls = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def answer(self):
+        self.calls += 1
+        rows = list(self.rows)
+        if self.calls == 1:
+            self.started.set()
+            assert self.release.wait(5)
+        return {'success': True, 'data': rows}
+
+    def __call__(self, action, data=None):
+        return self.answer()
+
+@pytest.fixture
+def apps_script(monkeypatch):
+    fake = HeldAppsScript()
+    monkeypatch.setattr(sheets, 'call_apps_script', fake)
+    monkeypatch.setattr(sheets, 'sheet_mirror', None)
+    monkeypatch.setattr(sheets._tab_cache, 'ttl', 30)
+    sheets._tab_cache.clear()
+    yield fake
+    sheets._tab_cache.clear()
+
+def write_during_first_read(fake, read):
+    results = []
+    reader = threading.Thread(target=lambda: results.append(read()))
+    reader.start()
+    assert fake.started.wait(5)
+    # A write lands while the read that started before it is still in flight
+    fake.rows = [{'id': 'after-write'}]
+    sheets.invalidate_tabs('Pending')
+    fake.release.set()
+    reader.join(5)
+    return results
+
+def test_read_in_flight_during_a_write_is_not_cached(apps_script):
+    results = write_during_first_read(apps_script, lambda: sheets.fetch_orders('Pending'))
+    assert results == [[{'id': 'before-write'}]]
+    assert sheets.fetch_orders('Pending') == [{'id': 'after-write'}]
+    assert apps_script.calls == 2
+
+def test_async_read_in_flight_during_a_write_is_not_cached(apps_script, monkeypatch):
+    async def call_async(action, data=None):
+        return await asyncio.to_thread(apps_script.answer)
+
+    monkeypatch.setattr(sheets_async, 'call_apps_script_async', call_async)
+    results = write_during_first_read(apps_script, lambda: asyncio.run(sheets_async.fetch_orders_async('Pending')))
+    assert results == [[{'id': 'before-write'}]]
+    assert asyncio.run(sheets_async.fetch_orders_async('Pending')) == [{'id': 'after-write'}]
+    assert apps_script.calls == 2
+
+def test_reads_without_a_write_are_cached(apps_script):
+    apps_script.release.set()
+    assert sheets.fetch_orders('Pending') == [{'id': 'before-write'}]
+    assert sheets.fetch_orders('Pending') == [{'id': 'before-write'}]
+    assert apps_script.calls == 1
+
+def test_stats_report_mirror_sync_state(monkeypatch, tmp_path):
+    def fetch(tab, since):
+        return {'data': [sheets.COLUMNS, ['1000001', 'Ahmed'] + [''] * (len(sheets.COLUMNS) - 2)]}
+
+    mirror = sheets.SheetMirror(str(tmp_path / 'mirror.db'), sheets.COLUMNS, fetch)
+    monkeypatch.setattr(sheets, 'sheet_mirror', mirror)
+    assert sheets.get_apps_script_stats()['mirror'] == {}
+    mirror.orders('Pending')
+    sheets.invalidate_tabs('Pending')
+    state = sheets.get_apps_script_stats()['mirror']['Pending']
+    assert state['rows'] == 1 and state['version'] == 1 and state['stale']
+    monkeypatch.setattr(sheets, 'sheet_mirror', None)
+    assert 'mirror' not in sheets.get_apps_script_stats()
+
+@pytest.mark.parametrize('data', [
+    {'orders': []},
+    [{'success': True, 'data': []}],
+    [{'success': True, 'data': []}, 'error page'],
+    [{'success': True, 'data': []}, {'data': []}],
+])
+def test_malformed_batch_falls_back_without_disabling_batching(monkeypatch, data):
+    sent = []
+    def call(action, payload=None):
+        sent.append(action)
+        return {'success': True, 'data': data} if action == 'batch' else {'success': True, 'data': action}
+
+    monkeypatch.setattr(sheets, 'call_apps_script', call)
+    monkeypatch.setattr(sheets, '_batch_supported', None)
+    monkeypatch.setattr(sheets, '_batch_failures', 0)
+    results = sheets.call_apps_script_batch([('getOrders', {}), ('getRawSheetData', {})])
+    assert [result['data'] for result in results] == ['getOrders', 'getRawSheetData']
+    assert sent == ['batch', 'getOrders', 'getRawSheetData']
+    assert sheets._batch_supported is None
+
+def test_well_formed_batch_turns_batching_on(monkeypatch):
+    monkeypatch.setattr(sheets, 'call_apps_script', lambda action, payload=None: {
+        'success': True, 'data': [{'success': True, 'data': 1}, {'success': False, 'message': 'No such tab'}]})
+    monkeypatch.setattr(sheets, '_batch_supported', None)
+    monkeypatch.setattr(sheets, '_batch_failures', 2)
+    ok, failed = sheets.call_apps_script_batch([('getOrders', {}), ('getOrders', {})])
+    assert ok['data'] == 1 and 'No such tab' in str(failed)
+    assert sheets._batch_supported is True and sheets._batch_failures == 0
+
+def script_without_batch(error):
+    sent = []
+    def call(action, payload=None):
+        sent.append(action)
+        if action == 'batch':
+            raise error
+        return {'success': True, 'data': action}
+    return call, sent
+
+def test_non_json_batch_reply_falls_back_then_switches_batching_off(monkeypatch):
+    # e.g. the HTML "script completed but did not return anything" page of a script without 'batch'
+    call, sent = script_without_batch(json.JSONDecodeError('Expecting value', '<html>', 0))
+    monkeypatch.setattr(sheets, 'call_apps_script', call)
+    monkeypatch.setattr(sheets, '_batch_supported', None)
+    monkeypatch.setattr(sheets, '_batch_failures', 0)
+    calls = [('getOrders', {}), ('getRawSheetData', {})]
+    for _ in range(sheets.BATCH_MAX_FAILURES):
+        assert [result['data'] for result in sheets.call_apps_script_batch(calls)] == ['getOrders', 'getRawSheetData']
+    assert sheets._batch_supported is False
+    assert sent.count('batch') == sheets.BATCH_MAX_FAILURES
+    sheets.call_apps_script_batch(calls)
+    assert sent.count('batch') == sheets.BATCH_MAX_FAILURES
+
+def test_unknown_batch_action_switches_batching_off_at_once(monkeypatch):
+    call, sent = script_without_batch(sheets.AppsScriptError('Apps Script error: Unknown action: batch'))
+    monkeypatch.setattr(sheets, 'call_apps_script', call)
+    monkeypatch.setattr(sheets, '_batch_supported', None)
+    monkeypatch.setattr(sheets, '_batch_failures', 0)
+    assert len(sheets.call_apps_script_batch([('getOrders', {}), ('getOrders', {})])) == 2
+    assert sheets._batch_supported is False
+
+def test_network_failure_of_a_batch_is_raised(monkeypatch):
+    call, sent = script_without_batch(requests.ConnectionError('connection refused'))
+    monkeypatch.setattr(sheets, 'call_apps_script', call)
+    monkeypatch.setattr(sheets, '_batch_supported', None)
+    monkeypatch.setattr(sheets, '_batch_failures', 0)
+    with pytest.raises(requests.ConnectionError):
+        sheets.call_apps_script_batch([('getOrders', {}), ('getOrders', {})])
+    assert sent == ['batch'] and sheets._batch_supported is None
+
+def test_async_non_json_batch_reply_falls_back(monkeypatch):
+    async def call_async(action, data=None):
+        if action == 'batch':
+            raise json.JSONDecodeError('Expecting value', '<html>', 0)
+        return {'success': True, 'data': action}
+
+    monkeypatch.setattr(sheets_async, 'call_apps_script_async', call_async)
+    monkeypatch.setattr(sheets, '_batch_supported', None)
+    monkeypatch.setattr(sheets, '_batch_failures', 0)
+    results = asyncio.run(sheets_async.call_apps_script_batch_async([('getOrders', {}), ('getRawSheetData', {})]))
+    assert [result['data'] for result in results] == ['getOrders', 'getRawSheetData']
+
+def test_write_in_one_worker_invalidates_the_others(tmp_path):
+    # Two worker processes' caches, sharing the counters file
+    worker_a = sheets.TabCache(30, 8, TabGenerations(str(tmp_path / 'cache.db')))
+    worker_b = sheets.TabCache(30, 8, TabGenerations(str(tmp_path / 'cache.db')))
+    for cache in (worker_a, worker_b):
+        cache.set(('orders', 'Pending'), ['before-write'], cache.generation('Pending'))
+        cache.set(('orders', 'Ready'), ['ready'], cache.generation('Ready'))
+    in_flight = worker_b.generation('Pending')
+    worker_a.invalidate_tab('Pending')
+    assert worker_b.get(('orders', 'Pending')) == (False, None)
+    assert worker_b.get(('orders', 'Ready')) == (True, ['ready'])
+    # A read worker B started before the write is not cached either
+    worker_b.set(('orders', 'Pending'), ['before-write'], in_flight)
+    assert worker_b.get(('orders', 'Pending')) == (False, None)
+
+def test_unreadable_shared_counters_stop_caching(tmp_path):
+    cache = sheets.TabCache(30, 8, TabGenerations(str(tmp_path / 'missing-dir' / 'cache.db')))
+    cache.set(('orders', 'Pending'), ['rows'], cache.generation('Pending'))
+    assert cache.get(('orders', 'Pending')) == (False, None)
+
+class ScriptHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        body = b'{"success": true, "data": []}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def test_async_client_counts_new_connections(monkeypatch):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ScriptHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(sheets, 'APPS_SCRIPT_URL', f'http://127.0.0.1:{server.server_port}/exec')
+    monkeypatch.setattr(sheets, '_client_stats', {'requests': 0, 'connections_opened': 0, 'retries': 0})
+
+    async def three_calls():
+        try:
+            for _ in range(3):
+                await sheets_async.call_apps_script_async('getAvailableSheets')
+        finally:
+            await sheets_async.close_async_client()
+
+    try:
+        asyncio.run(three_calls())
+    finally:
+        server.shutdown()
+        server.server_close()
+    stats = sheets.get_client_stats()
+    assert stats['requests'] == 3 and stats['connections_opened'] == 1 and stats['handshakes_saved'] == 2
@@ -0,0 +1,43 @@
+"""
+Tests for the per-request stage timings in backend/timing.py.
+"""
+
+import contextvars
+import threading
+
+from backend.timing import record_stage, stage, start_request_timing
+
+def test_untimed_request_records_nothing():
+    assert start_request_timing() is None
+    with stage('parse'):
+        pass
+    record_stage('apps_script.getOrders', 0.5)
+
+def test_server_timing_header():
+    timings = start_request_timing(requested=True)
+    with stage('parse'):
+        pass
+    record_stage('apps_script.getOrders', 0.25)
+    record_stage('apps_script.getOrders', 0.125)
+    header = timings.server_timing()
+    entries = header.split(', ')
+    assert entries[0].startswith('parse;dur=')
+    assert entries[1] == 'apps_script.getOrders;dur=375.0;desc="2 calls"'
+    assert entries[-1].startswith('total;dur=')
+    assert timings.summary()['apps_script.getOrders'] == 375.0
+    start_request_timing()
+
+def test_stages_from_fanout_threads_are_recorded():
+    timings = start_request_timing(requested=True)
+
+    def fetch():
+        record_stage('apps_script.getRawSheetData', 0.1)
+
+    # run_concurrently runs each task in a copy of the request's context
+    threads = [threading.Thread(target=contextvars.copy_context().run, args=(fetch,)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert timings.stages['apps_script.getRawSheetData'][1] == 4
+    start_request_timing()
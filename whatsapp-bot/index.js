@@ -54,6 +54,20 @@ Just send your order details as text!
 
 Type \`/help\` for detailed help anytime.`;
 
+// One retry on a network error or 5xx; the backend answers a repeated messageId from its dedupe store
+async function postMessage(payload) {
+    try {
+        return await axios.post(`${BACKEND_API_URL}/api/whatsapp_in`, payload);
+    } catch (e) {
+        if (e.response && e.response.status < 500) {
+            throw e;
+        }
+        console.log('Backend request failed, retrying once:', e.message);
+        await new Promise(resolve => setTimeout(resolve, 2000));
+        return await axios.post(`${BACKEND_API_URL}/api/whatsapp_in`, payload);
+    }
+}
+
 client.on('message', async msg => {
     console.log('=== NEW MESSAGE RECEIVED ===');
     console.log('From:', msg.from);
@@ -80,10 +94,12 @@ client.on('message', async msg => {
     if (msg.body && msg.body.trim()) {
         try {
             console.log('=== PROCESSING TEXT MESSAGE ===');
-            const response = await axios.post(`${BACKEND_API_URL}/api/whatsapp_in`, {
+            const response = await postMessage({
                 from: msg.from,
                 body: msg.body,
-                hasMedia: false
+                hasMedia: false,
+                // Lets the backend recognise a retried or redelivered message and not add the order twice
+                messageId: msg.id && msg.id._serialized
             });
             
             if (response.data.reply) {